@@ -0,0 +1,80 @@
+"""
+Compare the memory of worker processes loading a roster from JSON against mapping it as a `Dataset`, on synthetic
+members. Each worker looks up every member once and reports its private memory (Linux only).
+
+Usage::
+
+    python benchmarks/bench_dataset.py [members] [workers]
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import multiprocessing
+
+from rsi.dataset import Dataset, write_dataset
+
+
+def members(count, seed=0):
+    rng = random.Random(seed)
+    ranks = ['Recruit', 'Member', 'Officer', 'Director', 'Founder']
+    return [{'handle': 'member{}'.format(i), 'name': 'Member {}'.format(rng.randint(0, 10 ** 6)),
+             'rank': rng.choice(ranks), 'stars': rng.randint(0, 5), 'roles': rng.sample(ranks, 2),
+             'avatar': 'https://example.com/media/{:x}.jpg'.format(rng.getrandbits(64))} for i in range(count)]
+
+
+def private_memory():
+    """ Private (unshared) memory of this process in MiB """
+    total = 0
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total += int(line.split()[1])
+    return total / 1024
+
+
+def worker(kind, path, handles, results):
+    baseline = private_memory()
+    start = time.perf_counter()
+    if kind == 'json':
+        with open(path) as f:
+            roster = {_['handle']: _ for _ in json.load(f)}
+        ranks = [roster[_]['rank'] for _ in handles]
+    else:
+        roster = Dataset(path)
+        ranks = [roster[_]['rank'] for _ in handles]
+    results.put((private_memory() - baseline, time.perf_counter() - start, len(ranks)))
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 200000
+    workers = int(argv[1]) if len(argv) > 1 else 4
+    rows = members(count)
+    directory = tempfile.mkdtemp()
+    paths = {'json': os.path.join(directory, 'members.json'), 'dataset': os.path.join(directory, 'members.rsids')}
+    with open(paths['json'], 'w') as f:
+        json.dump(rows, f)
+    write_dataset(paths['dataset'], rows, key='handle')
+    handles = [_['handle'] for _ in rows]
+    print(f'{count} members, json {os.path.getsize(paths["json"]) / 2 ** 20:.1f} MiB, '
+          f'dataset {os.path.getsize(paths["dataset"]) / 2 ** 20:.1f} MiB')
+
+    ctx = multiprocessing.get_context('spawn')
+    print(f'{"kind":<10}{"workers":>8}{"MiB/worker":>12}{"total MiB":>11}{"s/worker":>10}')
+    for kind, path in paths.items():
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(kind, path, handles, results)) for _ in range(workers)]
+        for proc in procs:
+            proc.start()
+        measured = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+        memory = sum(_[0] for _ in measured)
+        seconds = sum(_[1] for _ in measured) / workers
+        print(f'{kind:<10}{workers:>8}{memory / workers:>12.1f}{memory:>11.1f}{seconds:>10.2f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
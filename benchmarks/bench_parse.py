@@ -0,0 +1,90 @@
+"""
+Compare parsing stored RSI pages in full against parsing only the scraped subtrees.
+
+Usage::
+
+    python benchmarks/bench_parse.py
+    python benchmarks/bench_parse.py citizen=citizen.html citizen_orgs=orgs.html org=org.html members=members.html
+    python benchmarks/bench_parse.py --write-fixtures
+
+Without arguments the pages stored in `benchmarks/fixtures` (generated by the stand-in server) are parsed. Otherwise
+every argument is a `kind=path` pair of a page saved from the site (for `members` the html from the getOrgMembers
+API response). `--write-fixtures` regenerates the stored pages.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from rsi.citizen import CITIZEN_PROFILE_STRAINER, CITIZEN_ORGS_STRAINER
+from rsi.org import ORG_DETAILS_STRAINER, ORG_MEMBER_STRAINER
+from rsi.pledge_store import SKU_STRAINER
+from rsi.standin import StandinServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+STRAINERS = {
+    'citizen': CITIZEN_PROFILE_STRAINER,
+    'citizen_orgs': CITIZEN_ORGS_STRAINER,
+    'org': ORG_DETAILS_STRAINER,
+    'members': ORG_MEMBER_STRAINER,
+    'skus': SKU_STRAINER,
+}
+
+
+def fixture_pages(standin):
+    """ Pages of every kind from the stand-in server, by kind """
+    return {
+        'citizen': standin.citizen_page('standin'),
+        'citizen_orgs': standin.citizen_orgs_page('org7_12'),
+        'org': standin.org_page('ORG7'),
+        'members': standin.org_members({'symbol': 'ORG7', 'page': 1})['data']['html'],
+        'skus': standin.skus({'page': 1})['data']['html'],
+    }
+
+
+def write_fixtures(directory=FIXTURES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    with StandinServer() as standin:
+        pages = fixture_pages(standin)
+    for kind, html in pages.items():
+        with open(os.path.join(directory, kind + '.html'), 'w', encoding='utf-8') as f:
+            f.write(html)
+
+
+def measure(html, strainer, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        BeautifulSoup(html, features='html.parser', parse_only=strainer)
+    elapsed = (time.perf_counter() - start) / rounds
+
+    tracemalloc.start()
+    soup = BeautifulSoup(html, features='html.parser', parse_only=strainer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del soup
+    return elapsed, peak
+
+
+def main(argv):
+    if argv == ['--write-fixtures']:
+        write_fixtures()
+        return
+    if not argv:
+        argv = ['{}={}'.format(kind, os.path.join(FIXTURES_DIR, kind + '.html')) for kind in STRAINERS]
+    rounds = 20
+    print(f'{"page":<14}{"full ms":>10}{"partial ms":>12}{"speedup":>9}{"full KiB":>10}{"partial KiB":>13}')
+    for arg in argv:
+        kind, path = arg.split('=', 1)
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        full_time, full_mem = measure(html, None, rounds)
+        part_time, part_mem = measure(html, STRAINERS[kind], rounds)
+        print(f'{kind:<14}{full_time * 1000:>10.2f}{part_time * 1000:>12.2f}{full_time / part_time:>8.1f}x'
+              f'{full_mem / 1024:>10.0f}{part_mem / 1024:>13.0f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,83 @@
+"""
+Measure how org roster parsing throughput scales with the number of parser processes of a `ParseExecutor`.
+
+Usage::
+
+    python benchmarks/bench_parse_pool.py [pages] [page size]
+
+The roster pages are synthetic getOrgMembers responses from `rsi.standin`, parsed in-process first and then on
+pools of 1, 2, 4, ... processes up to the number of CPUs. The second table shows the per-payload cost of parsing
+in-process against shipping the payload to a process at different payload sizes, which is what
+`DEFAULT_INLINE_THRESHOLD` is picked from.
+"""
+import os
+import sys
+import time
+
+from rsi.org import parse_members
+from rsi.standin import StandinServer
+from rsi.parse_executor import ParseExecutor
+
+
+def roster_pages(pages, page_size):
+    server = StandinServer(roster_size=pages * page_size, page_size=page_size)
+    try:
+        return [server.org_members({'symbol': 'BENCH', 'page': _, 'admin_mode': 1})['data']['html']
+                for _ in range(1, pages + 1)]
+    finally:
+        server.httpd.server_close()
+
+
+def measure(pages, workers):
+    start = time.perf_counter()
+    if workers:
+        with ParseExecutor(max_workers=workers, inline_threshold=0) as executor:
+            list(executor.map(parse_members, pages, admin_mode=True))
+    else:
+        for page in pages:
+            parse_members(page, admin_mode=True)
+    return time.perf_counter() - start
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 400
+    page_size = int(argv[1]) if len(argv) > 1 else 32
+    pages = roster_pages(count, page_size)
+
+    levels = [0]
+    while levels[-1] < (os.cpu_count() or 1):
+        levels.append(max(1, levels[-1] * 2))
+
+    print(f'{count} pages of {page_size} members, {sum(map(len, pages)) / 1024:.0f} KiB')
+    print(f'{"workers":<10}{"seconds":>10}{"pages/s":>10}{"members/s":>12}{"speedup":>9}')
+    baseline = None
+    for workers in levels:
+        elapsed = measure(pages, workers)
+        baseline = baseline or elapsed
+        print(f'{workers or "inline":<10}{elapsed:>10.2f}{count / elapsed:>10.0f}{count * page_size / elapsed:>12.0f}'
+              f'{baseline / elapsed:>8.1f}x')
+
+    print()
+    print(f'{"payload KiB":<12}{"inline ms":>10}{"pooled ms":>11}')
+    members = roster_pages(page_size * 4, 1)
+    with ParseExecutor(max_workers=1, inline_threshold=0) as executor:
+        executor.parse(parse_members, pages[0])     # start the worker process
+        for size in (1, 2, 4, 8, 16, 32):
+            payload = ''
+            for member in members:
+                if len(payload) >= size * 1024:
+                    break
+                payload += member
+            start = time.perf_counter()
+            for _ in range(20):
+                parse_members(payload)
+            inline = (time.perf_counter() - start) / 20
+            start = time.perf_counter()
+            for _ in range(20):
+                executor.parse(parse_members, payload)
+            pooled = (time.perf_counter() - start) / 20
+            print(f'{size:<12}{inline * 1000:>10.2f}{pooled * 1000:>11.2f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,59 @@
+"""
+Compare `SearchIndex` queries against running fuzzywuzzy over every title, on synthetic documents.
+
+Usage::
+
+    python benchmarks/bench_search.py [documents] [body words]
+"""
+import sys
+import time
+import random
+
+from fuzzywuzzy import process
+
+from rsi.search import SearchIndex
+
+
+def documents(count, body_words, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 9)))
+                  for _ in range(max(100, count // 10))]
+    return [(i, ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(2, 5))),
+             ' '.join(rng.choice(vocabulary) for _ in range(body_words)), None) for i in range(count)]
+
+
+def measure(func, queries):
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def main(argv):
+    count = int(argv[0]) if argv else 30000
+    body_words = int(argv[1]) if len(argv) > 1 else 10
+    docs = documents(count, body_words)
+    rng = random.Random(1)
+    titles = [_[1] for _ in rng.sample(docs, 200)]
+    queries = {
+        'whole title': titles,
+        'partial title': [_[:max(3, len(_) * 2 // 3)] for _ in titles],
+        'prefix': [_.split()[0][:4] for _ in titles],
+        'typo': [_[:3] + ('x' if _[3] != 'x' else 'y') + _[4:] for _ in titles],
+    }
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    index.update('doc', docs)
+    print(f'indexed {count} documents in {time.perf_counter() - start:.2f}s')
+
+    choices = {_[0]: _[1] for _ in docs}
+    print(f'{"query":<16}{"index ms":>10}{"fuzzy ms":>10}')
+    for name, batch in queries.items():
+        indexed = measure(index.search, batch)
+        fuzzy = measure(lambda q: process.extractBests(q, choices, limit=10), batch[:3])
+        print(f'{name:<16}{indexed * 1000:>10.3f}{fuzzy * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -8,7 +8,6 @@ __version__ = '0.1.16'
 
 
 # TODO: future endpoints to check out
-# https://robertsspaceindustries.com/api/stats/getCrowdfundStats
 # https://robertsspaceindustries.com/api/account/badge/getBadges
 
 from .rsi import RSISite
@@ -0,0 +1,407 @@
+"""
+Cache backends shared between processes, so one worker's refresh of the ship matrix or an org roster serves all of
+the others::
+
+    backend = SQLiteBackend('/var/cache/pyrsi.db')      # or RedisBackend('redis://cache:6379/0')
+    ships = ShipMatrixAPI(cache_backend=backend)
+    org = OrgAPI('PROTECTORA', cache_backend=backend)
+
+Values are pickled and zlib compressed. Each API keeps what it read in a small in-process cache for `local_ttl`
+seconds so repeated property accesses don't round trip to the backend and unpickle every time.
+
+When a value expires only one worker refreshes it, holding a short lease key in the backend, while the others keep
+serving the expired value for up to `stale_ttl` seconds (or wait for the refresh if there is none).
+"""
+import os
+import time
+import zlib
+import pickle
+import socket
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from urllib.parse import urlparse
+from cachetools import TTLCache
+
+from rsi.exceptions import RSIException
+from rsi.deadline import sleep
+
+DEFAULT_LOCAL_TTL = 5
+DEFAULT_COMPRESS_LEVEL = 1
+# seconds a worker may take to refresh a value before another one takes over
+DEFAULT_LEASE_TTL = 60
+DEFAULT_LEASE_POLL = 0.1
+
+
+def dumps(value, level=DEFAULT_COMPRESS_LEVEL):
+    """ Serialize a parsed result for a cache backend """
+    return zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), level)
+
+
+def loads(data):
+    return pickle.loads(zlib.decompress(data))
+
+
+class CacheBackend(object):
+    """ Interface of the cache backends, storing bytes values under string keys with a time to live """
+
+    def get(self, key):
+        """ The bytes stored under `key`, or None if missing or expired """
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        """ Store `value` under `key` for `ttl` seconds (forever if None) """
+        raise NotImplementedError
+
+    def add(self, key, value, ttl=None):
+        """ Atomically store `value` under `key` only if it is missing or expired, returning whether it was stored """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """ Remove `key`, returning whether it existed """
+        raise NotImplementedError
+
+    def keys(self, prefix=''):
+        """ List of the unexpired keys starting with `prefix` """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    def __init__(self):
+        """ In-process backend, shared by the API objects of one process (and a stand-in for the others in tests) """
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key, now):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        with self._lock:
+            entry = self._live(key, time.time())
+            return None if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (bytes(value), None if ttl is None else time.time() + ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            now = time.time()
+            if self._live(key, now) is not None:
+                return False
+            self._data[key] = (bytes(value), None if ttl is None else now + ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def keys(self, prefix=''):
+        now = time.time()
+        with self._lock:
+            return [_ for _ in list(self._data) if _.startswith(prefix) and self._live(_, now) is not None]
+
+
+class SQLiteBackend(CacheBackend):
+    def __init__(self, path, timeout=30):
+        """ Backend storing the values in an SQLite file, shared by every process on the host that opens it.
+
+        :argument path SQLite file to use, it is created if needed
+        :argument timeout Seconds to wait for another process's write to finish
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._db() as db:
+            db.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)')
+
+    def _db(self):
+        # one connection per thread and process, connections must not cross a fork
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def get(self, key):
+        row = self._db().execute('SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                                 (key, time.time())).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        with self._db() as db:
+            db.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                       (key, sqlite3.Binary(value), None if ttl is None else now + ttl))
+            db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+
+    def add(self, key, value, ttl=None):
+        now = time.time()
+        with self._db() as db:
+            db.execute('DELETE FROM cache WHERE key = ? AND expires <= ?', (key, now))
+            return db.execute('INSERT OR IGNORE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                              (key, sqlite3.Binary(value), None if ttl is None else now + ttl)).rowcount > 0
+
+    def delete(self, key):
+        with self._db() as db:
+            return db.execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def keys(self, prefix=''):
+        rows = self._db().execute('SELECT key FROM cache WHERE substr(key, 1, ?) = ? AND '
+                                  '(expires IS NULL OR expires > ?)', (len(prefix), prefix, time.time()))
+        return [_[0] for _ in rows]
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+class RedisBackend(CacheBackend):
+    def __init__(self, url='redis://localhost:6379/0', timeout=5):
+        """ Backend storing the values in Redis (or anything speaking its protocol), shared across hosts.
+
+        :argument url redis://[:password@]host[:port][/db]
+        :argument timeout Socket timeout in seconds
+        """
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip('/') or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile('rb')
+        self._pid = os.getpid()
+        if self.password:
+            self._call('AUTH', self.password)
+        if self.db:
+            self._call('SELECT', self.db)
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._file.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._file = None
+
+    def _read_reply(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('Connection closed by the redis server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RSIException('Redis error: {}'.format(rest.decode()))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise RSIException('Unexpected redis reply: {!r}'.format(line))
+
+    def _call(self, *args):
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%b\r\n' % (len(arg), arg))
+        self._sock.sendall(b''.join(parts))
+        return self._read_reply()
+
+    def execute(self, *args):
+        """ Run a redis command, reconnecting once if the connection was lost """
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None or self._pid != os.getpid():
+                        self._connect()
+                    return self._call(*args)
+                except (OSError, ConnectionError):
+                    self._disconnect()
+                    if attempt:
+                        raise
+
+    def get(self, key):
+        return self.execute('GET', key)
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            self.execute('SET', key, value)
+        else:
+            self.execute('SET', key, value, 'PX', max(1, int(ttl * 1000)))
+
+    def add(self, key, value, ttl=None):
+        args = ('SET', key, value, 'NX') + (() if ttl is None else ('PX', max(1, int(ttl * 1000))))
+        return self.execute(*args) is not None
+
+    def delete(self, key):
+        return self.execute('DEL', key) > 0
+
+    def keys(self, prefix=''):
+        pattern = ''.join('\\' + _ if _ in '*?[]\\' else _ for _ in prefix) + '*'
+        keys, cursor = [], b'0'
+        while True:
+            cursor, batch = self.execute('SCAN', cursor, 'MATCH', pattern, 'COUNT', 1000)
+            keys.extend(_.decode() for _ in batch)
+            if cursor == b'0':
+                return keys
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+class SharedCache(MutableMapping):
+    def __init__(self, backend, namespace, ttl, local_ttl=DEFAULT_LOCAL_TTL, local_maxsize=16, stale_ttl=None,
+                 lease_ttl=DEFAULT_LEASE_TTL):
+        """ Mapping over the keys of one namespace of a `CacheBackend`, usable in place of a `TTLCache`.
+
+        Expired values are kept in the backend for another `stale_ttl` seconds, for `get_or_update` to serve while
+        one worker refreshes them. Reading an expired value as a mapping raises KeyError like a missing one.
+
+        :argument namespace Prefix of the keys, identifying the object being cached
+        :argument ttl Seconds values live in the backend
+        :argument local_ttl Seconds values read from the backend are also kept deserialized in this process
+        :argument stale_ttl Seconds expired values are still served during a refresh, defaults to `ttl`
+        :argument lease_ttl Seconds a worker may take to refresh a value before another one takes over
+        """
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = ttl if stale_ttl is None else stale_ttl
+        self.lease_ttl = lease_ttl
+        self._local = TTLCache(maxsize=local_maxsize, ttl=min(local_ttl, ttl)) if local_ttl and ttl else None
+        self._lock = threading.Lock()
+
+    def _key(self, key):
+        return '{}:{}'.format(self.namespace, key)
+
+    def _entry(self, key):
+        """ (expires, value) of `key` even if expired, or None """
+        if self._local is not None:
+            with self._lock:
+                entry = self._local.get(key)
+            if self._fresh(entry):
+                return entry
+        # an expired local copy may have been refreshed by another worker
+        data = self.backend.get(self._key(key))
+        if data is None:
+            return None
+        entry = loads(data)
+        if self._local is not None:
+            with self._lock:
+                self._local[key] = entry
+        return entry
+
+    @staticmethod
+    def _fresh(entry):
+        return entry is not None and (entry[0] is None or entry[0] > time.time())
+
+    def __getitem__(self, key):
+        entry = self._entry(key)
+        if not self._fresh(entry):
+            raise KeyError(key)
+        return entry[1]
+
+    def __contains__(self, key):
+        return self._fresh(self._entry(key))
+
+    def __setitem__(self, key, value):
+        entry = (None if self.ttl is None else time.time() + self.ttl, value)
+        self.backend.set(self._key(key), dumps(entry), ttl=None if self.ttl is None else self.ttl + self.stale_ttl)
+        if self._local is not None:
+            with self._lock:
+                self._local[key] = entry
+
+    def __delitem__(self, key):
+        if self._local is not None:
+            with self._lock:
+                self._local.pop(key, None)
+        if not self.backend.delete(self._key(key)):
+            raise KeyError(key)
+
+    def __iter__(self):
+        prefix = self._key('')
+        return iter([_[len(prefix):] for _ in self.backend.keys(prefix) if not _.endswith(':lease')])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def clear(self):
+        for key in list(self):
+            self.pop(key, None)
+
+    def get_or_update(self, key, update_func, poll=DEFAULT_LEASE_POLL):
+        """
+        The value of `key`, refreshed with `update_func()` by one worker at a time when missing or expired.
+
+        The worker holding the refresh lease calls `update_func` and stores the result, the others return the expired
+        value meanwhile, or wait for the refresh if there is none (taking over if the lease runs out).
+        """
+        lease = self._key(key) + ':lease'
+        while True:
+            entry = self._entry(key)
+            if self._fresh(entry):
+                return entry[1]
+            if self.backend.add(lease, b'1', ttl=self.lease_ttl):
+                try:
+                    entry = self._entry(key)
+                    if self._fresh(entry):
+                        return entry[1]     # refreshed by the previous holder of the lease
+                    value = update_func()
+                    self[key] = value
+                    return value
+                finally:
+                    self.backend.delete(lease)
+            if entry is not None:
+                return entry[1]
+            sleep(poll)
+
+
+def get_or_update(cache, key, update_func):
+    """
+    `cache[key]`, computed with `update_func()` and stored if missing.
+
+    With a `SharedCache` only one worker refreshes the value at a time, see `SharedCache.get_or_update`.
+    """
+    if isinstance(cache, SharedCache):
+        return cache.get_or_update(key, update_func)
+    try:
+        return cache[key]
+    except KeyError:
+        value = cache[key] = update_func()
+        return value
+
+
+def make_cache(cache_backend, namespace, maxsize, ttl):
+    """ A `SharedCache` over `cache_backend` if one is given, otherwise a per-instance `TTLCache` """
+    if cache_backend is None:
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    return SharedCache(cache_backend, namespace, ttl)
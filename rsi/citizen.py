@@ -1,77 +1,306 @@
 import re as _re
+import threading as _threading
+
+from cachetools import TTLCache
+from requests import HTTPError
 
 from bs4 import BeautifulSoup as _bs
-from rsi.utils import get_item
+from rsi.utils import get_item, class_strainer
 from rsi.conf import DEFAULT_RSI_URL
 from rsi.session import RSISession
+from rsi.tracing import span, traced
+from rsi.parse_cache import cached_parse
+from rsi.deadline import with_deadline
+from rsi.exceptions import DeadlineExceeded
+from rsi.org import ORG_MEMBER_STRAINER
+
+# only the parts of the citizen pages that are scraped get parsed
+CITIZEN_PROFILE_STRAINER = class_strainer('profile', 'profile-content', 'citizen-record', 'info')
+CITIZEN_ORGS_STRAINER = class_strainer('orgs-content')
+
+DEFAULT_CITIZEN_CACHE_SIZE = 1024
+DEFAULT_PROFILE_TTL = 600
+DEFAULT_ORGS_TTL = 300
+DEFAULT_NOT_FOUND_TTL = 60
+
+
+@traced('parse_profile')
+def parse_citizen_profile(html, url=DEFAULT_RSI_URL):
+    """ Parse the fields of a citizen's profile page """
+    url = url.rstrip('/')
+    result = {}
+    soup = _bs(html, features='html.parser', parse_only=CITIZEN_PROFILE_STRAINER)
+    _ = [_.text for _ in soup.select(".info .value")[:3]]
+    result['username'] = get_item(_, 0, '')
+    result['handle'] = get_item(_, 1, '')
+    result['title'] = get_item(_, 2, '')
+    result['title_icon'] = get_item(soup.select(".info .icon img"), 0, '')
+    if result['title_icon']:
+        result['title_icon'] = '{}/{}'.format(url, result['title_icon']['src'])
+    result['avatar'] = "{}/{}".format(url, soup.select('.profile .thumb img')[0]['src'].lstrip('/'))
 
+    if soup.select('.profile-content .bio'):
+        result['bio'] = soup.select('.profile-content .bio')[0].text.strip('\nBio').strip()
+    else:
+        result['bio'] = ''
+    result['citizen_record'] = soup.select('.citizen-record .value')[0].text
+    try:
+        result['citizen_record'] = int(result['citizen_record'][1:])
+    except:
+        pass
 
-def fetch_citizen(name, url=DEFAULT_RSI_URL, endpoint='/citizens', skip_orgs=False, session=None):
+    _ = {_.select_one('span').text:
+         _re.sub(r'\s+', ' ', _.select_one('.value').text.strip()).replace(' ,', ',')
+         for _ in soup.select('.profile-content > .left-col .entry')}
+    result['enlisted'] = get_item(_, 'Enlisted', '')
+    result['location'] = get_item(_, 'Location', '')
+    result['languages'] = get_item(_, 'Fluency', '')
+    result['languages'] = result['languages'].replace(',', '').split()
+    return result
+
+
+@traced('parse_orgs')
+def parse_citizen_orgs(html, url=DEFAULT_RSI_URL):
+    """ Parse the orgs listed on a citizen's organizations page, without their roles """
+    url = url.rstrip('/')
+    orgs = []
+    orgsoup = _bs(html, features='html.parser', parse_only=CITIZEN_ORGS_STRAINER)
+    for org in orgsoup.select('.orgs-content .org'):
+        orgname, sid, rank = [_.text for _ in org.select('.info .entry .value')]
+        if orgname[0] == '\xa0':
+            orgname = sid = rank = 'REDACTED'
+
+        orgdata = {
+            'name': orgname,
+            'sid': sid,
+            'rank': rank,
+            'roles': [],
+        }
+        try:
+            orgdata['icon'] = '{}/{}'.format(url, org.select('.thumb img')[0]['src'].lstrip('/'))
+        except IndexError:
+            pass
+        orgs.append(orgdata)
+    return orgs
+
+
+@traced('parse_roles')
+def parse_member_roles(html):
+    """ Parse the roles out of a getOrgMembers search result """
+    apisoup = _bs(html, features='html.parser', parse_only=ORG_MEMBER_STRAINER)
+    return [_.text for _ in apisoup.select('.rolelist .role')]
+
+
+def _citizen_url(name, url, endpoint):
+    return "{}/{}/{}".format(url.rstrip('/'), endpoint.strip('/'), name)
+
+
+@with_deadline
+def fetch_citizen_orgs(name, url=DEFAULT_RSI_URL, endpoint='/citizens', session=None, parse_executor=None,
+                       rosters=None):
+    """
+    Fetch the orgs of a citizen along with their roles in each.
+
+    :param rosters: Optional `RosterRegistry`, the rank and roles in tracked orgs are read from their cached rosters
+                    instead of searching the org's members on the site
+
+    :return: list of org dicts, or None if the organizations page could not be fetched. `DeadlineExceeded.partial`
+             holds the orgs if the deadline passes while looking up the roles.
+    """
+    session = session or RSISession()
+    url = url.rstrip('/')
+    orgapiurl = '{}/{}'.format(url, 'api/orgs/getOrgMembers')
+
+    orgs_page = session.get("{}/organizations".format(_citizen_url(name, url, endpoint)))
+    if orgs_page.status_code != 200:
+        return None
+
+    orgs = cached_parse(session, orgs_page.url, orgs_page.text, parse_citizen_orgs, url=url,
+                        parse_executor=parse_executor)
+    for orgdata in orgs:
+        member = rosters.member(orgdata['sid'], name) if rosters is not None else None
+        if member is not None:
+            orgdata.update(rank=member['rank'], roles=list(member['roles']))
+            continue
+        with span('org_roles', sid=orgdata['sid']):
+            try:
+                r = session.post(orgapiurl, data={'symbol': orgdata['sid'], 'search': name})
+            except DeadlineExceeded as e:
+                e.partial = orgs
+                raise
+            if r.status_code == 200:
+                with span('json_decode'):
+                    r = r.json()
+                if r['success'] == 1:
+                    orgdata['roles'] = cached_parse(session, (orgapiurl, orgdata['sid'], name), r['data']['html'],
+                                                    parse_member_roles)
+    return orgs
+
+
+@traced('fetch_citizen')
+@with_deadline
+def fetch_citizen(name, url=DEFAULT_RSI_URL, endpoint='/citizens', skip_orgs=False, session=None,
+                  parse_executor=None, rosters=None):
+    """
+    Fetch and parse a citizen's profile and orgs.
+
+    :param parse_executor: Optional `ParseExecutor`, the profile is then parsed while the orgs page is fetched
+    :param rosters: Optional `RosterRegistry` of tracked orgs to read the citizen's rank and roles from
+    :param deadline: Optional seconds or `Deadline` for the whole lookup, if it passes once the profile is fetched
+                     `DeadlineExceeded.partial` holds the profile and whatever orgs were fetched
+    """
     session = session or RSISession()
     result = {}
     url = url.rstrip('/')
-    citizen_url = "{}/{}/{}".format(url.rstrip('/'), endpoint.strip('/'), name)
-    orgapiurl = '{}/{}'.format(url.rstrip('/'), 'api/orgs/getOrgMembers')
+    citizen_url = _citizen_url(name, url, endpoint)
 
     page = session.get(citizen_url)
     if page.status_code == 200:
-        soup = _bs(page.text, features='html.parser')
-        _ = [_.text for _ in soup.select(".info .value")[:3]]
-        result['username'] = get_item(_, 0, '')
-        result['handle'] = get_item(_, 1, '')
-        result['title'] = get_item(_, 2, '')
-        result['title_icon'] = get_item(soup.select(".info .icon img"), 0, '')
-        if result['title_icon']:
-            result['title_icon'] = '{}/{}'.format(url, result['title_icon']['src'])
-        result['avatar'] = "{}/{}".format(url, soup.select('.profile .thumb img')[0]['src'].lstrip('/'))
+        profile = None
+        # with a parse cache unchanged profiles cost nothing to parse, so there's no point overlapping them
+        if parse_executor is not None and getattr(session, 'parse_cache', None) is None:
+            profile = parse_executor.submit(parse_citizen_profile, page.text, url=url)
+        else:
+            result = cached_parse(session, citizen_url, page.text, parse_citizen_profile, url=url,
+                                  parse_executor=parse_executor)
+
+        orgs = exceeded = None
+        if not skip_orgs:
+            try:
+                orgs = fetch_citizen_orgs(name, url=url, endpoint=endpoint, session=session,
+                                          parse_executor=parse_executor, rosters=rosters)
+            except DeadlineExceeded as e:
+                orgs, exceeded = e.partial, e
+
+        if profile is not None:
+            result = profile.result()
         result['url'] = citizen_url
+        if orgs is not None:
+            result['orgs'] = orgs
+        if exceeded is not None:
+            exceeded.partial = result
+            raise exceeded
+    return result
 
-        if soup.select('.profile-content .bio'):
-            result['bio'] = soup.select('.profile-content .bio')[0].text.strip('\nBio').strip()
-        else:
-            result['bio'] = ''
-        result['citizen_record'] = soup.select('.citizen-record .value')[0].text
-        try:
-            result['citizen_record'] = int(result['citizen_record'][1:])
-        except:
-            pass
 
-        _ = {_.select_one('span').text:
-             _re.sub(r'\s+', ' ', _.select_one('.value').text.strip()).replace(' ,', ',')
-             for _ in soup.select('.profile-content > .left-col .entry')}
-        result['enlisted'] = get_item(_, 'Enlisted', '')
-        result['location'] = get_item(_, 'Location', '')
-        result['languages'] = get_item(_, 'Fluency', '')
-        result['languages'] = result['languages'].replace(',', '').split()
+class CitizenCache(object):
+    def __init__(self, session=None, url=DEFAULT_RSI_URL, endpoint='/citizens', maxsize=DEFAULT_CITIZEN_CACHE_SIZE,
+                 profile_ttl=DEFAULT_PROFILE_TTL, orgs_ttl=DEFAULT_ORGS_TTL, not_found_ttl=DEFAULT_NOT_FOUND_TTL,
+                 parse_executor=None, rosters=None):
+        """ Bounded LRU cache of citizen lookups, keyed case-insensitively by handle.
 
+        Profiles and org memberships are cached separately as orgs change more often than profiles. Handles that
+        don't exist (the profile page returns a 404) are remembered for `not_found_ttl` seconds so repeated lookups
+        of typos don't hit the site, any other error is returned as `{}` without being cached.
+
+        :argument maxsize Maximum number of handles kept in each of the caches, least recently used are evicted
+        :argument profile_ttl Seconds to cache a citizen's profile
+        :argument orgs_ttl Seconds to cache a citizen's orgs and roles
+        :argument not_found_ttl Seconds to cache that a handle does not exist
+        :argument rosters Optional `RosterRegistry` of tracked orgs to read the roles from, see `fetch_citizen_orgs`
+        """
+        self.session = session or RSISession(url=url)
+        self.url = url.rstrip('/')
+        self.endpoint = endpoint
+        self.parse_executor = parse_executor
+        self.rosters = rosters
+        self._profiles = TTLCache(maxsize=maxsize, ttl=profile_ttl)
+        self._orgs = TTLCache(maxsize=maxsize, ttl=orgs_ttl)
+        self._not_found = TTLCache(maxsize=maxsize, ttl=not_found_ttl)
+        self._lock = _threading.Lock()
+        self._stats = {'profile_hits': 0, 'profile_misses': 0, 'orgs_hits': 0, 'orgs_misses': 0,
+                       'not_found_hits': 0, 'errors': 0}
+
+    def _get(self, cache, key, stat):
+        with self._lock:
+            value = cache.get(key)
+            self._stats['{}_{}'.format(stat, 'misses' if value is None else 'hits')] += 1
+            return value
+
+    def _put(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+
+    def _fetch_profile(self, handle):
+        citizen_url = _citizen_url(handle, self.url, self.endpoint)
+        page = self.session.get(citizen_url)
+        if page.status_code == 404:
+            return None
+        page.raise_for_status()
+        profile = cached_parse(self.session, citizen_url, page.text, parse_citizen_profile, url=self.url,
+                               parse_executor=self.parse_executor)
+        profile['url'] = citizen_url
+        return profile
+
+    @with_deadline
+    def get(self, handle, skip_orgs=False, refresh=False):
+        """
+        The citizen as returned by `fetch_citizen`, from the cache when possible.
+
+        :param handle: Citizen handle (case-insensitive)
+        :param skip_orgs: Do not look up the citizen's orgs
+        :param refresh: Ignore and replace anything cached for the handle
+        :param deadline: Optional seconds or `Deadline` for the lookup, see `fetch_citizen`
+        :return: dict of the citizen, or `{}` if it does not exist or could not be fetched
+        """
+        key = handle.lower()
+        if refresh:
+            self.invalidate(handle)
+
+        with self._lock:
+            if key in self._not_found:
+                self._stats['not_found_hits'] += 1
+                return {}
+
+        profile = self._get(self._profiles, key, 'profile')
+        if profile is None:
+            try:
+                profile = self._fetch_profile(handle)
+            except HTTPError:
+                with self._lock:
+                    self._stats['errors'] += 1
+                return {}
+            if profile is None:
+                self._put(self._not_found, key, True)
+                return {}
+            self._put(self._profiles, key, profile)
+
+        result = dict(profile)
         if not skip_orgs:
-            orgs_page = session.get("{}/organizations".format(citizen_url))
-            if orgs_page.status_code == 200:
-                orgsoup = _bs(orgs_page.text, features='html.parser')
-                result['orgs'] = []
-                for org in orgsoup.select('.orgs-content .org'):
-                    orgname, sid, rank = [_.text for _ in org.select('.info .entry .value')]
-                    if orgname[0] == '\xa0':
-                        orgname = sid = rank = 'REDACTED'
-
-                    roles = []
-                    r = session.post(orgapiurl, data={'symbol': sid, 'search': name})
-                    if r.status_code == 200:
-                        r = r.json()
-                        if r['success'] == 1:
-                            apisoup = _bs(r['data']['html'], features='html.parser')
-                            roles = [_.text for _ in apisoup.select('.rolelist .role')]
-
-                    orgdata = {
-                        'name': orgname,
-                        'sid': sid,
-                        'rank': rank,
-                        'roles': roles,
-                    }
-                    try:
-                        orgdata['icon'] = '{}/{}'.format(url, org.select('.thumb img')[0]['src'].lstrip('/'))
-                    except IndexError:
-                        pass
-
-                    result['orgs'].append(orgdata)
-    return result
+            orgs = self._get(self._orgs, key, 'orgs')
+            if orgs is None:
+                try:
+                    orgs = fetch_citizen_orgs(handle, url=self.url, endpoint=self.endpoint, session=self.session,
+                                              parse_executor=self.parse_executor, rosters=self.rosters)
+                except DeadlineExceeded as e:
+                    # the profile is cached already, partial orgs are not
+                    if e.partial is not None:
+                        result['orgs'] = e.partial
+                    e.partial = result
+                    raise
+                if orgs is not None:
+                    self._put(self._orgs, key, orgs)
+            if orgs is not None:
+                result['orgs'] = [dict(_, roles=list(_['roles'])) for _ in orgs]
+        return result
+
+    def invalidate(self, handle=None):
+        """ Drop everything cached for `handle` (case-insensitive), or for every handle if None """
+        with self._lock:
+            caches = (self._profiles, self._orgs, self._not_found)
+            if handle is None:
+                for cache in caches:
+                    cache.clear()
+                return
+            for cache in caches:
+                cache.pop(handle.lower(), None)
+
+    def stats(self):
+        """ Dict of the hit and miss counters, the number of cached handles and the overall hit rate """
+        with self._lock:
+            stats = dict(self._stats, profiles=len(self._profiles), orgs=len(self._orgs),
+                         not_found=len(self._not_found))
+        hits = stats['profile_hits'] + stats['orgs_hits'] + stats['not_found_hits']
+        lookups = hits + stats['profile_misses'] + stats['orgs_misses']
+        stats['hit_rate'] = hits / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,364 @@
+import sys
+import csv
+import json
+import queue
+import time
+import argparse
+import getpass
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+from rsi.session import RSISession, DEFAULT_REQUEST_TIMEOUT
+from rsi.org import OrgAPI, RosterRegistry
+from rsi.citizen import fetch_citizen
+from rsi.shipmatrix import ShipMatrixAPI
+from rsi.pledge_store import PledgeStore
+from rsi.roadmap import Roadmap, DATE_STR_FMT
+from rsi.status import Status
+from rsi.parse_executor import ParseExecutor
+from rsi.member_activity import MemberActivity, DEFAULT_MEMBER_ACTIVITY_FILE
+from rsi.dataset import DatasetStore
+from rsi.tracing import Tracer
+
+OUTPUT_FORMATS = ('ndjson', 'csv')
+
+
+class NDJSONWriter(object):
+    """ Writes one JSON document per line, flushing after every record """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record):
+        self.stream.write(json.dumps(record, default=str))
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class CSVWriter(object):
+    """ Writes records as CSV rows, the header is taken from the first record and nested values are JSON encoded """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._writer = None
+
+    def write(self, record):
+        if self._writer is None:
+            self._writer = csv.DictWriter(self.stream, fieldnames=list(record.keys()), restval='',
+                                          extrasaction='ignore')
+            self._writer.writeheader()
+        self._writer.writerow({k: json.dumps(v, default=str) if isinstance(v, (dict, list, tuple)) else v
+                               for k, v in record.items()})
+        self.stream.flush()
+
+
+class Stats(object):
+    """ Collects request timings from a session's response hook, and parse timings from the spans of `tracer` """
+
+    def __init__(self):
+        self.tracer = Tracer()
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.request_time = 0.0
+        self.records = 0
+        self._lock = threading.Lock()
+
+    def hook(self, response, *args, **kwargs):
+        with self._lock:
+            self.requests += 1
+            self.request_time += response.elapsed.total_seconds()
+            if response.status_code >= 400:
+                self.errors += 1
+
+    def summary(self):
+        wall = time.perf_counter() - self.started
+        return {
+            'records': self.records,
+            'requests': self.requests,
+            'request_errors': self.errors,
+            'wall_time': round(wall, 3),
+            'request_time': round(self.request_time, 3),
+            'avg_request_time': round(self.request_time / self.requests, 3) if self.requests else 0,
+            # summed over the threads like the request time, parses run on --parse-workers aren't traced
+            'parse_time': round(self.parse_time(), 3),
+        }
+
+    def parse_time(self):
+        """ Total time spent in the parse and JSON decode spans, while `tracer` was active """
+        total = 0.0
+        for record in self.tracer.spans:
+            if _is_parse_span(record['name']) and not any(_is_parse_span(_) for _ in record['stack'][:-1]):
+                total += record['duration']
+        return total
+
+
+def _is_parse_span(name):
+    return name.startswith('parse_') or name == 'json_decode'
+
+
+def _merge_streams(funcs, concurrency, buffer=1000, poll=0.1):
+    """
+    Runs each generator function in a thread pool and yields their items through a bounded queue.
+
+    If the consumer stops early (the generator is closed, or writing a record failed) the workers are told to stop
+    and the queue is drained so none of them stays blocked on it.
+    """
+    items = queue.Queue(maxsize=buffer)
+    done = object()
+    stop = threading.Event()
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=poll)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(func):
+        try:
+            for item in func():
+                if not _put(item):
+                    return
+        finally:
+            _put(done)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_run, _) for _ in funcs]
+        remaining = len(futures)
+        try:
+            while remaining:
+                item = items.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            if remaining:
+                stop.set()
+                for future in futures:
+                    future.cancel()
+                while not all(_.done() for _ in futures):
+                    try:
+                        items.get(timeout=poll)
+                    except queue.Empty:
+                        pass
+        for future in futures:
+            future.result()     # re-raise anything that failed
+
+
+def _org_members(args, session):
+    activity = MemberActivity(args.activity_db) if args.activity_db and args.admin else None
+    datasets = DatasetStore(args.dataset_dir) if args.dataset_dir else None
+
+    def _members(symbol):
+        def _iter():
+            org = OrgAPI(symbol, session=session, admin_mode=args.admin, cache_ttl=args.cache_ttl,
+                         parse_executor=args.parse_executor, stream_parse=args.stream_parse)
+            if activity is None and datasets is None:
+                # nothing needs the whole roster, keep memory flat however large it is
+                for member in org.iter_members():
+                    yield dict(org=org.symbol, **member)
+                return
+            members = []
+            for member in org.iter_members():
+                members.append(member)
+                yield dict(org=org.symbol, **member)
+            if activity is not None:
+                activity.record(org.symbol, members)
+            if datasets is not None:
+                datasets.export_org(org, members)
+        return _iter
+
+    try:
+        yield from _merge_streams([_members(_) for _ in args.symbols], args.concurrency)
+    finally:
+        if activity is not None:
+            activity.close()
+
+
+def _inactive(args, session):
+    activity = MemberActivity(args.activity_db)
+    try:
+        for symbol in args.symbols:
+            yield from activity.inactive(symbol, days=args.days)
+    finally:
+        activity.close()
+
+
+def _org_details(args, session):
+    def _fetch(symbol):
+        org = OrgAPI(symbol, session=session, cache_ttl=args.cache_ttl, stream_parse=args.stream_parse)
+        return dict(symbol=symbol, **org.details)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        yield from pool.map(_fetch, args.symbols)
+
+
+def _citizens(args, session):
+    rosters = None
+    if args.orgs:
+        # each roster is fetched on the first lookup of one of its members
+        rosters = RosterRegistry(fetch_rosters=True)
+        for symbol in args.orgs:
+            rosters.track(OrgAPI(symbol, session=session, cache_ttl=args.cache_ttl,
+                                 parse_executor=args.parse_executor))
+
+    def _fetch(handle):
+        return fetch_citizen(handle, skip_orgs=args.skip_orgs, session=session,
+                             parse_executor=args.parse_executor, rosters=rosters)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for citizen in pool.map(_fetch, args.handles):
+            if citizen:
+                yield citizen
+
+
+def _ships(args, session):
+    api = ShipMatrixAPI(session=session, cache_ttl=args.cache_ttl, enable_pledges=not args.no_pledges,
+                        enable_ship_models=args.ship_models)
+    yield from api.ships.values()
+    if args.dataset_dir:
+        DatasetStore(args.dataset_dir).export_ship_matrix(api)
+
+
+def _skus(args, session):
+    store = PledgeStore(session=session, cache_ttl=args.cache_ttl, parse_executor=args.parse_executor)
+    for _, sku in store.skus(product_id=args.product_id, search=args.search, type=args.type):
+        yield sku
+
+
+def _roadmap(args, session):
+    for team in Roadmap(session=session).fetch_roadmap(args.start, args.end):
+        for deliverable in team.get('deliverables', []):
+            yield {
+                'team': team.get('title', ''),
+                'title': deliverable.get('title', ''),
+                'description': deliverable.get('description', ''),
+                'start_date': deliverable.get('startDate', ''),
+                'end_date': deliverable.get('endDate', ''),
+                'projects': [_.get('title', '') for _ in deliverable.get('projects', [])],
+            }
+
+
+def _status(args, session):
+    status = Status(language=args.language)
+    data = status.timeline() if args.timeline else status.system()
+    if isinstance(data, list):
+        yield from data
+    else:
+        yield data
+
+
+def _date(value):
+    return datetime.strptime(value, DATE_STR_FMT)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='pyrsi', description='Export data from the Roberts Space Industries site')
+    parser.add_argument('-f', '--format', choices=OUTPUT_FORMATS, default='ndjson', help='output format')
+    parser.add_argument('-o', '--output', default='-', help='file to write to, defaults to stdout')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='number of concurrent fetches')
+    parser.add_argument('--rate-limit', type=float, default=None, help='maximum requests per second')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_REQUEST_TIMEOUT, help='seconds each request may take')
+    parser.add_argument('--operation-timeout', type=float, default=None,
+                        help='seconds each multi-request operation (an org roster, the ship matrix, ...) may take')
+    parser.add_argument('--cache-ttl', type=int, default=300, help='seconds to cache API results')
+    parser.add_argument('--session-file', default='.pyrsi_session', help='file to persist the RSI session to')
+    parser.add_argument('--no-persist', action='store_true', help='do not persist the RSI session')
+    parser.add_argument('-u', '--username', default=None, help='RSI account to authenticate with')
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help='number of processes to parse pages on, 0 parses in the fetching threads')
+    parser.add_argument('--stats', action='store_true', help='print a summary of request timings to stderr')
+    sub = parser.add_subparsers(dest='command', metavar='command')
+    sub.required = True
+
+    p = sub.add_parser('org', help='export org member rosters')
+    p.add_argument('symbols', nargs='+')
+    p.add_argument('--admin', action='store_true', help='use admin mode (requires authentication)')
+    p.add_argument('--stream-parse', action='store_true', help='parse member pages while they download')
+    p.add_argument('--activity-db', default=None, help='record when members were last online (requires --admin)')
+    p.add_argument('--dataset-dir', default=None, help='also write the rosters as datasets workers can map')
+    p.set_defaults(func=_org_members)
+
+    p = sub.add_parser('inactive', help='export members not online for a while, from recorded admin rosters')
+    p.add_argument('symbols', nargs='+')
+    p.add_argument('--days', type=float, default=30, help='days without being online')
+    p.add_argument('--activity-db', default=DEFAULT_MEMBER_ACTIVITY_FILE, help='database written by org --activity-db')
+    p.set_defaults(func=_inactive)
+
+    p = sub.add_parser('org-details', help='export org details')
+    p.add_argument('symbols', nargs='+')
+    p.add_argument('--stream-parse', action='store_true', help='parse org pages while they download')
+    p.set_defaults(func=_org_details)
+
+    p = sub.add_parser('citizen', help='export citizen profiles')
+    p.add_argument('handles', nargs='+')
+    p.add_argument('--skip-orgs', action='store_true', help='do not look up the orgs of each citizen')
+    p.add_argument('--orgs', nargs='+', default=[], metavar='SYMBOL',
+                   help='orgs to fetch the roster of and read member roles from, when many citizens are in them')
+    p.set_defaults(func=_citizens)
+
+    p = sub.add_parser('ships', help='export the ship matrix')
+    p.add_argument('--no-pledges', action='store_true', help='do not merge in pledge store prices')
+    p.add_argument('--ship-models', action='store_true', help='look up the 3d model of every ship')
+    p.add_argument('--dataset-dir', default=None, help='also write the ships and loaners as datasets workers can map')
+    p.set_defaults(func=_ships)
+
+    p = sub.add_parser('skus', help='export pledge store SKUs')
+    p.add_argument('--product-id', default='')
+    p.add_argument('--search', default='')
+    p.add_argument('--type', default='')
+    p.set_defaults(func=_skus)
+
+    p = sub.add_parser('roadmap', help='export roadmap deliverables')
+    p.add_argument('--start', type=_date, default=datetime.now(), help='start date (YYYY-MM-DD)')
+    p.add_argument('--end', type=_date, default=datetime.now() + timedelta(days=90), help='end date (YYYY-MM-DD)')
+    p.set_defaults(func=_roadmap)
+
+    p = sub.add_parser('status', help='export the RSI system status')
+    p.add_argument('--timeline', action='store_true', help='export the incident timeline instead')
+    p.add_argument('--language', default='en')
+    p.set_defaults(func=_status)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    session = RSISession(session_file=args.session_file, persist_session=not args.no_persist,
+                         rate_limit=args.rate_limit, timeout=args.timeout, operation_timeout=args.operation_timeout)
+    session.mount('https://', HTTPAdapter(pool_maxsize=max(10, args.concurrency)))
+
+    stats = Stats()
+    session.hooks['response'].append(stats.hook)
+
+    if args.username:
+        session.authenticate(args.username, getpass.getpass('RSI Password: '))
+
+    args.parse_executor = ParseExecutor(max_workers=args.parse_workers) if args.parse_workers > 0 else None
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='')
+    writer = (CSVWriter if args.format == 'csv' else NDJSONWriter)(out)
+    try:
+        # the spans are only recorded when they are asked for
+        with stats.tracer if args.stats else nullcontext():
+            for record in args.func(args, session):
+                writer.write(record)
+                stats.records += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if args.parse_executor is not None:
+            args.parse_executor.shutdown()
+        if args.stats:
+            print(json.dumps(stats.summary()), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import json
+import math
+import time
+import heapq
+import queue
+import sqlite3
+import threading
+
+from rsi.conf import DEFAULT_RSI_URL
+from rsi.session import RSISession
+from rsi.utils import RateLimiter, notify_listeners
+from rsi.org import fetch_members_page, DEFAULT_MEMBERS_ENDPOINT
+
+DEFAULT_CRAWL_CHECKPOINT_FILE = '.pyrsi_crawl.db'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_orgs (
+    symbol TEXT PRIMARY KEY,
+    totalrows INTEGER,
+    page_size INTEGER,
+    pages INTEGER,
+    started_at REAL,
+    completed_at REAL
+);
+CREATE TABLE IF NOT EXISTS crawl_pages (
+    symbol TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    scanned INTEGER NOT NULL,
+    members TEXT NOT NULL,
+    PRIMARY KEY (symbol, page)
+);
+"""
+
+
+class OrgCrawler(object):
+    def __init__(self, symbols, session=None, workers=8, rate_limit=4, checkpoint_file=DEFAULT_CRAWL_CHECKPOINT_FILE,
+                 admin_mode=False, max_age=None, retries=3, retry_backoff=2, url=DEFAULT_RSI_URL,
+                 members_endpoint=DEFAULT_MEMBERS_ENDPOINT, on_complete=None, parse_executor=None):
+        """ Crawls the member rosters of many orgs over a shared pool of workers.
+
+        Page fetches of every org are scheduled on one worker pool under a single requests-per-second budget. Every
+        fetched page is checkpointed, so a crawl that is interrupted resumes from the pages it had not fetched yet.
+        Orgs that were partially crawled go first, followed by the ones whose last complete crawl is the oldest.
+
+        :argument symbols Org symbols to crawl
+        :argument workers Number of worker threads fetching pages
+        :argument rate_limit Requests per second allowed across all workers
+        :argument checkpoint_file SQLite file the progress is stored in, use ':memory:' to not persist it
+        :argument max_age Orgs which completed a crawl less than this many seconds ago are skipped
+        :argument retries How many times a failing page is retried before the org is given up on for this run
+        :argument retry_backoff Seconds before the first retry of a page, doubling with every further one
+        :argument on_complete Called with (symbol, members) every time an org finishes, errors it raises are reported
+        :argument parse_executor Optional `ParseExecutor` the pages are parsed on, so parsing isn't bound to one core
+        """
+        self.symbols = [_.upper() for _ in symbols]
+        self.session = session or RSISession(url=url)
+        self.workers = workers
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.admin_mode = admin_mode
+        self.max_age = max_age
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.url = url.rstrip('/')
+        self.members_endpoint = members_endpoint
+        self.on_complete = on_complete
+        self.parse_executor = parse_executor
+
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(checkpoint_file, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._queue = queue.PriorityQueue()
+        # (not before, priority, symbol, page, attempt) of the retries waiting out their backoff
+        self._delayed = []
+        self._seq = 0
+        self._outstanding = 0
+        self._done = threading.Condition(self._lock)
+        self._failed = {}
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, params).fetchall()
+
+    def _org(self, symbol):
+        rows = self._execute('SELECT * FROM crawl_orgs WHERE symbol = ?', (symbol,))
+        return dict(rows[0]) if rows else None
+
+    def _pages_done(self, symbol):
+        return {_['page'] for _ in self._execute('SELECT page FROM crawl_pages WHERE symbol = ?', (symbol,))}
+
+    def _schedule(self, priority, symbol, page, attempt=0):
+        with self._lock:
+            self._outstanding += 1
+            self._put(priority, symbol, page, attempt)
+
+    def _put(self, priority, symbol, page, attempt):
+        with self._lock:
+            self._seq += 1
+            self._queue.put((priority, self._seq, symbol, page, attempt))
+
+    def _retry(self, priority, symbol, page, attempt, error):
+        """ Schedule a failed page again once its backoff is over, or give up on the org """
+        with self._lock:
+            if attempt >= self.retries:
+                self._failed[symbol] = repr(error)
+                return
+            self._outstanding += 1
+            heapq.heappush(self._delayed, (time.monotonic() + self.retry_backoff * (2 ** attempt), priority, symbol,
+                                           page, attempt + 1))
+            self._done.notify_all()
+
+    def _release_delayed(self):
+        """ Queue the retries whose backoff is over, returning the seconds until the next one is due (or None) """
+        with self._lock:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._put(*heapq.heappop(self._delayed)[1:])
+            return max(0.0, self._delayed[0][0] - now) if self._delayed else None
+
+    def _plan(self):
+        """ Returns the (priority, symbol) of every org that needs crawling, most urgent first """
+        now = time.time()
+        plan = []
+        for symbol in self.symbols:
+            org = self._org(symbol)
+            if org is None:
+                plan.append((0, symbol))
+            elif org['completed_at'] is None:
+                plan.append((-1, symbol))   # resume partially crawled orgs first
+            elif self.max_age is None or now - org['completed_at'] >= self.max_age:
+                plan.append((org['completed_at'], symbol))
+        return sorted(plan)
+
+    def _start_org(self, priority, symbol):
+        org = self._org(symbol)
+        if org is None or org['completed_at'] is not None:
+            # a fresh crawl, drop the pages of the previous one
+            self._execute('DELETE FROM crawl_pages WHERE symbol = ?', (symbol,))
+            self._execute('INSERT OR REPLACE INTO crawl_orgs (symbol, started_at) VALUES (?, ?)',
+                          (symbol, time.time()))
+            org = self._org(symbol)
+
+        if org['pages'] is None:
+            # the first page tells us how many more there are
+            self._schedule(priority, symbol, 1)
+        else:
+            done = self._pages_done(symbol)
+            for page in range(1, org['pages'] + 1):
+                if page not in done:
+                    self._schedule(priority, symbol, page)
+            self._check_complete(symbol)
+
+    def _fetch(self, priority, symbol, page):
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait()
+        result = fetch_members_page(self.session, symbol, page, admin_mode=self.admin_mode, url=self.url,
+                                    members_endpoint=self.members_endpoint, parse_executor=self.parse_executor)
+        if result is None:
+            raise ValueError('Empty response fetching page {} of {}'.format(page, symbol))
+        members, scanned, totalrows = result
+
+        self._execute('INSERT OR REPLACE INTO crawl_pages (symbol, page, fetched_at, scanned, members) '
+                      'VALUES (?, ?, ?, ?, ?)', (symbol, page, time.time(), scanned, json.dumps(members)))
+
+        if page == 1:
+            totalrows = totalrows or 0
+            pages = int(math.ceil(totalrows / scanned)) if scanned else 1
+            self._execute('UPDATE crawl_orgs SET totalrows = ?, page_size = ?, pages = ? WHERE symbol = ?',
+                          (totalrows, scanned, pages, symbol))
+            for next_page in range(2, pages + 1):
+                self._schedule(priority, symbol, next_page)
+
+    def _check_complete(self, symbol):
+        with self._lock:
+            org = self._org(symbol)
+            if org['pages'] is None or org['completed_at'] is not None:
+                return
+            if len(self._pages_done(symbol)) < org['pages']:
+                return
+            self._execute('UPDATE crawl_orgs SET completed_at = ? WHERE symbol = ?', (time.time(), symbol))
+        if self.on_complete is not None:
+            notify_listeners([self.on_complete], symbol, self.members(symbol))
+
+    def _worker(self):
+        while True:
+            priority, _, symbol, page, attempt = self._queue.get()
+            if symbol is None:
+                return
+            try:
+                if symbol in self._failed:
+                    continue
+                try:
+                    self._fetch(priority, symbol, page)
+                except Exception as e:
+                    # retried without holding up the worker, which goes on with the next page meanwhile
+                    self._retry(priority, symbol, page, attempt, e)
+                    continue
+                self._check_complete(symbol)
+            finally:
+                with self._lock:
+                    self._outstanding -= 1
+                    self._done.notify_all()
+
+    def run(self):
+        """
+        Crawl every org that needs it, blocking until all pages are fetched or given up on.
+
+        :return: the result of `progress`
+        """
+        self._failed = {}
+        self._delayed = []
+        threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        try:
+            for priority, symbol in self._plan():
+                self._start_org(priority, symbol)
+            with self._lock:
+                while self._outstanding:
+                    self._done.wait(self._release_delayed())
+        finally:
+            for _ in threads:
+                self._queue.put((float('inf'), float('inf'), None, None, None))
+            for t in threads:
+                t.join()
+        return self.progress()
+
+    def progress(self):
+        """
+        Per org crawl progress.
+
+        :return: dict of symbol to a dict with the pages done, total pages (None until the first page is fetched),
+                 members found, whether the last crawl completed and when, and the error if it was given up on
+        """
+        report = {}
+        for symbol in self.symbols:
+            org = self._org(symbol) or {}
+            rows = self._execute('SELECT COUNT(*) AS pages, SUM(scanned) AS scanned FROM crawl_pages '
+                                 'WHERE symbol = ?', (symbol,))[0]
+            report[symbol] = {
+                'pages_done': rows['pages'],
+                'pages_total': org.get('pages'),
+                'totalrows': org.get('totalrows'),
+                'scanned': rows['scanned'] or 0,
+                'completed': org.get('completed_at') is not None,
+                'completed_at': org.get('completed_at'),
+                'error': self._failed.get(symbol),
+            }
+        return report
+
+    def members(self, symbol):
+        """ Members of the given org found by the crawl so far, in roster order """
+        rows = self._execute('SELECT members FROM crawl_pages WHERE symbol = ? ORDER BY page', (symbol.upper(),))
+        return [member for row in rows for member in json.loads(row['members'])]
@@ -0,0 +1,306 @@
+import time
+import bisect
+import threading
+from array import array
+from itertools import accumulate
+from datetime import datetime, timedelta, timezone
+from cachetools import TTLCache
+
+from rsi.conf import DEFAULT_RSI_URL
+from rsi.session import RSISession
+from rsi.exceptions import RSIException
+
+CROWDFUND_STATS_ENDPOINT = '/api/stats/getCrowdfundStats'
+CROWDFUND_COUNTERS = ('funds', 'fans', 'fleet')
+DEFAULT_POLL_INTERVAL = 60
+# 30 days of samples at the default poll interval
+DEFAULT_CAPACITY = 30 * 24 * 60
+
+
+class _Timestamps(object):
+    """ Read-only sequence view of the ring buffer's timestamps in logical (oldest first) order, for bisect """
+    def __init__(self, series):
+        self._series = series
+
+    def __len__(self):
+        return self._series.count
+
+    def __getitem__(self, i):
+        return self._series._times[self._series._physical(i)]
+
+
+class CrowdfundSeries(object):
+    def __init__(self, capacity=DEFAULT_CAPACITY, counters=CROWDFUND_COUNTERS):
+        """ Fixed size ring buffer of crowdfund samples.
+
+        Every counter is stored as the delta from the previous sample in a preallocated 32 bit `array` (widened to
+        64 bit if a delta ever doesn't fit), along with the value before the oldest sample and after the newest, so
+        the memory used is fixed by `capacity` and windowed queries are sums over array slices instead of loops over
+        Python objects. Once full the oldest sample is overwritten.
+
+        :argument capacity Number of samples kept
+        :argument counters Names of the counters every sample has
+        """
+        self.capacity = capacity
+        self.counters = tuple(counters)
+        self.count = 0
+        self._start = 0
+        self._times = array('I', bytes(4 * capacity))
+        self._deltas = {_: array('i', bytes(4 * capacity)) for _ in self.counters}
+        self._base = {_: 0 for _ in self.counters}
+        self._last = {_: 0 for _ in self.counters}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self.count
+
+    def _physical(self, i):
+        return (self._start + i) % self.capacity
+
+    def _slices(self, values, start, stop):
+        """ The physical slices of `values` covering logical samples [start, stop) """
+        if start >= stop:
+            return []
+        first, last = self._physical(start), self._physical(stop - 1) + 1
+        if first < last:
+            return [values[first:last]]
+        return [values[first:], values[:last]]
+
+    def _sum(self, counter, start, stop):
+        return sum(sum(_) for _ in self._slices(self._deltas[counter], start, stop))
+
+    def _value(self, counter, i):
+        """ Value of the counter at logical sample i, summed from whichever end is closer """
+        if i < self.count // 2:
+            return self._base[counter] + self._sum(counter, 0, i + 1)
+        return self._last[counter] - self._sum(counter, i + 1, self.count)
+
+    def append(self, timestamp, values):
+        """
+        Add a sample.
+
+        :param timestamp: Unix time of the sample, samples must be appended in time order
+        :param values: dict of counter name to its (integer) value
+        """
+        timestamp = int(timestamp)
+        with self._lock:
+            if self.count and timestamp < self._times[self._physical(self.count - 1)]:
+                raise ValueError('Samples must be appended in time order')
+
+            if self.count == self.capacity:
+                # drop the oldest sample, folding its delta into the base
+                for counter in self.counters:
+                    self._base[counter] += self._deltas[counter][self._start]
+                self._start = (self._start + 1) % self.capacity
+                self.count -= 1
+            elif self.count == 0:
+                for counter in self.counters:
+                    self._base[counter] = self._last[counter] = int(values[counter])
+
+            slot = self._physical(self.count)
+            self._times[slot] = timestamp
+            for counter in self.counters:
+                value = int(values[counter])
+                delta = value - self._last[counter]
+                try:
+                    self._deltas[counter][slot] = delta
+                except OverflowError:
+                    self._deltas[counter] = array('q', self._deltas[counter])
+                    self._deltas[counter][slot] = delta
+                self._last[counter] = value
+            self.count += 1
+
+    def _index(self, timestamp):
+        """ Logical index of the last sample at or before `timestamp`, -1 if there is none """
+        return bisect.bisect_right(_Timestamps(self), timestamp) - 1
+
+    def latest(self):
+        """ (timestamp, dict of counter values) of the newest sample, or None """
+        with self._lock:
+            if not self.count:
+                return None
+            return self._times[self._physical(self.count - 1)], dict(self._last)
+
+    def value_at(self, timestamp):
+        """ dict of the counter values of the last sample at or before `timestamp`, or None """
+        with self._lock:
+            i = self._index(timestamp)
+            if i < 0:
+                return None
+            return {_: self._value(_, i) for _ in self.counters}
+
+    def increase(self, counter, start, end):
+        """ How much the counter grew between the samples at or before `start` and `end` (unix times) """
+        with self._lock:
+            first, last = max(self._index(start), 0), self._index(end)
+            if last <= first:
+                return 0
+            return self._sum(counter, first + 1, last + 1)
+
+    def rate_per_hour(self, counter, window=3600, now=None):
+        """
+        Average growth per hour of the counter over the last `window` seconds.
+
+        :param now: Unix time the window ends at, defaults to the newest sample
+        """
+        with self._lock:
+            if self.count < 2:
+                return 0.0
+            now = self._times[self._physical(self.count - 1)] if now is None else now
+            first, last = max(self._index(now - window), 0), self._index(now)
+            if last <= first:
+                return 0.0
+            elapsed = self._times[self._physical(last)] - self._times[self._physical(first)]
+            if not elapsed:
+                return 0.0
+            return self._sum(counter, first + 1, last + 1) * 3600 / elapsed
+
+    def daily_totals(self, counter, days=30, now=None, tz=timezone.utc):
+        """
+        Growth of the counter per calendar day.
+
+        :param days: Number of days to return, ending with the day of `now`
+        :param now: Unix time, defaults to the newest sample
+        :param tz: Timezone the days are in
+        :return: list of (date, increase) oldest first
+        """
+        with self._lock:
+            if not self.count:
+                return []
+            now = self._times[self._physical(self.count - 1)] if now is None else now
+            day = datetime.fromtimestamp(now, tz).replace(hour=0, minute=0, second=0, microsecond=0)
+            totals = []
+            for _ in range(days):
+                start = day.timestamp()
+                totals.append((day.date(), self.increase(counter, start - 1, start + 86400 - 1)))
+                day = (day - timedelta(hours=12)).replace(hour=0)
+            return totals[::-1]
+
+    def downsample(self, counter, start=None, end=None, points=500):
+        """
+        The counter between two times reduced to at most `points` evenly spaced samples, e.g. for charting.
+
+        :param start: Unix time to start at, defaults to the oldest sample
+        :param end: Unix time to end at, defaults to the newest sample
+        :return: list of (timestamp, value), the last sample in each bucket
+        """
+        with self._lock:
+            if not self.count:
+                return []
+            first = 0 if start is None else max(bisect.bisect_left(_Timestamps(self), start), 0)
+            last = self.count - 1 if end is None else self._index(end)
+            if last < first:
+                return []
+            times = array('I')
+            deltas = array(self._deltas[counter].typecode)
+            for _ in self._slices(self._times, first, last + 1):
+                times.extend(_)
+            for _ in self._slices(self._deltas[counter], first, last + 1):
+                deltas.extend(_)
+            initial = self._value(counter, first) - deltas[0]
+
+        values = array('q', accumulate(deltas, initial=initial))[1:]
+        n = len(times)
+        step = max(1, -(-n // points))
+        indexes = list(range(step - 1, n, step))
+        if indexes[-1] != n - 1:
+            indexes.append(n - 1)
+        return [(times[_], values[_]) for _ in indexes]
+
+
+class CrowdfundStats(object):
+    def __init__(self, session=None, rsi_url=DEFAULT_RSI_URL, endpoint=CROWDFUND_STATS_ENDPOINT,
+                 cache_ttl=DEFAULT_POLL_INTERVAL, capacity=DEFAULT_CAPACITY):
+        """ Queries and records the crowdfunding stats (funds raised, fans and fleet size).
+
+        Every fetch is added to `series`, so charts and rates are served from memory. Fetches are cached for
+        `cache_ttl` so any number of callers polling share one request per interval.
+
+        :argument cache_ttl How long to cache the current stats before re-querying
+        :argument capacity Number of samples kept in `series`, the default keeps 30 days of minutely polls
+        """
+        self.session = session or RSISession(url=rsi_url)
+        self.rsi_url = rsi_url.rstrip('/')
+        self.endpoint = '{}/{}'.format(self.rsi_url, endpoint.lstrip('/'))
+        self.series = CrowdfundSeries(capacity)
+        self._ttlcache = TTLCache(maxsize=1, ttl=cache_ttl)
+        self._lock = threading.Lock()
+        self._poller = None
+        self._stop = threading.Event()
+
+    def clear_cache(self):
+        """ Resets the cache """
+        self._ttlcache.clear()
+
+    def _fetch(self):
+        # only the counters, skipping the chart data the site's widget asks for
+        r = self.session.post(self.endpoint, json={_: True for _ in CROWDFUND_COUNTERS})
+        r.raise_for_status()
+        r = r.json()
+        if r.get('success') != 1:
+            raise RSIException(repr(r))
+        stats = {_: int(r['data'][_]) for _ in CROWDFUND_COUNTERS}
+        self.series.append(time.time(), stats)
+        return stats
+
+    def current(self):
+        """ dict of the current funds (in cents), fans and fleet, fetching them if the cached ones are stale """
+        with self._lock:
+            stats = self._ttlcache.get('stats')
+            if stats is None:
+                stats = self._ttlcache['stats'] = self._fetch()
+            return dict(stats)
+
+    def poll(self, interval=DEFAULT_POLL_INTERVAL):
+        """ Start a daemon thread fetching the stats every `interval` seconds into `series` """
+        if self._poller is not None and self._poller.is_alive():
+            return
+        self._stop.clear()
+        self._poller = threading.Thread(target=self._poll, args=(interval,), daemon=True)
+        self._poller.start()
+
+    def _poll(self, interval):
+        next_poll = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.clear_cache()
+                self.current()
+            except Exception as e:
+                print(f'WARNING [crowdfund] could not fetch crowdfund stats: {e!r}')
+            # schedule from the previous poll so the interval doesn't drift by the request time
+            next_poll += interval
+            self._stop.wait(max(0.0, next_poll - time.monotonic()))
+
+    def stop(self):
+        """ Stop the poller started by `poll` """
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join()
+            self._poller = None
+
+    @property
+    def funds(self):
+        return self.current()['funds']
+
+    @property
+    def fans(self):
+        return self.current()['fans']
+
+    @property
+    def fleet(self):
+        return self.current()['fleet']
+
+    def rate_per_hour(self, counter='funds', window=3600):
+        """ Average growth per hour of the counter over the last `window` seconds of recorded samples """
+        return self.series.rate_per_hour(counter, window=window)
+
+    def daily_totals(self, counter='funds', days=30):
+        """ list of (date, increase) of the counter per UTC day from the recorded samples """
+        return self.series.daily_totals(counter, days=days)
+
+    def chart(self, counter='funds', days=30, points=500):
+        """ The recorded counter over the last `days` days downsampled to at most `points` (timestamp, value) """
+        latest = self.series.latest()
+        if latest is None:
+            return []
+        return self.series.downsample(counter, start=latest[0] - days * 86400, points=points)
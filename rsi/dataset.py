@@ -0,0 +1,461 @@
+"""
+Parsed datasets (the ship matrix, loaners and org rosters) exported to files that any number of processes can map
+read-only, so pre-forked workers share one copy of the data in the page cache instead of each holding its own Python
+objects::
+
+    # in the process that refreshes the data
+    store = DatasetStore('/var/cache/pyrsi')
+    store.export_ship_matrix(ShipMatrixAPI())
+    store.export_org(OrgAPI('PROTECTORA'))
+
+    # in every worker
+    store = DatasetStore('/var/cache/pyrsi')
+    store.get('ships')[7]['name']
+    store.get('loaners')['Carrack']['loaners']
+    store.get('org-PROTECTORA-members').get('handle')['rank']
+
+A file holds one table: a header, a directory of the columns, the fixed-width columns, the hash index of the row keys
+and a table of the UTF-8 strings they refer to. Rows are returned as `RowView`s reading their values out of the
+mapping when accessed. Files are replaced atomically, `DatasetStore.get` picks up the new file while readers of the
+old one keep their mapping.
+"""
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import zlib
+import tempfile
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+
+from rsi.exceptions import RSIException
+
+DATASET_FORMAT_VERSION = 1
+DATASET_SUFFIX = '.rsids'
+DEFAULT_CHECK_INTERVAL = 1.0
+
+_MAGIC = b'PYRSIDS' + (b'L' if sys.byteorder == 'little' else b'B')
+# magic, format version, columns, rows, created, meta (offset, length), strings (offset, length)
+_HEADER = struct.Struct('=8sIIQdQQQQ')
+# name (offset, length) in the string table, type, data offset
+_COLUMN = struct.Struct('=QI1s3xQ')
+_ALIGN = 8
+
+_INT_MIN, _INT_MAX = -2 ** 63, 2 ** 63 - 1
+_NULL_INT = _INT_MIN
+_NULL_BOOL = 2
+_NULL_LENGTH = 0xFFFFFFFF
+
+KEY_COLUMN = '_key'
+
+# column type -> array typecode of its values, strings and json are (offset, length) references into the string table
+_TYPECODES = {'i': 'q', 'f': 'd', 'b': 'B'}
+
+
+def _column_type(values):
+    kinds = {type(_) for _ in values if _ is not None}
+    if not kinds or kinds == {str}:
+        return 's'
+    if kinds == {bool}:
+        return 'b'
+    if kinds == {int}:
+        return 'i' if all(_ is None or _INT_MIN < _ <= _INT_MAX for _ in values) else 'j'
+    if kinds <= {int, float}:
+        return 'f'
+    return 'j'
+
+
+class _StringTable(object):
+    def __init__(self):
+        self.data = bytearray()
+        self._refs = {}
+
+    def add(self, value):
+        """ (offset, length) of `value` in the table, each distinct string is stored once """
+        ref = self._refs.get(value)
+        if ref is None:
+            encoded = value.encode('utf-8')
+            ref = self._refs[value] = (len(self.data), len(encoded))
+            self.data += encoded
+        return ref
+
+
+def _pad(size):
+    return -size % _ALIGN
+
+
+def _key_hash(key):
+    # the same in every process, unlike hash()
+    return zlib.crc32(key.encode('utf-8') if isinstance(key, str) else struct.pack('=q', key))
+
+
+def _key_index(keys):
+    """ Open addressing hash table of the keys to their row, with at least twice as many slots as keys """
+    size = 1 << max(2 * len(keys) - 1, 1).bit_length()
+    slots = array('q', [-1]) * size
+    for row, key in enumerate(keys):
+        slot = _key_hash(key) & (size - 1)
+        while slots[slot] != -1:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = row
+    return slots
+
+
+def write_dataset(path, rows, key=None, meta=None):
+    """
+    Write rows to a dataset file, atomically replacing any existing one.
+
+    Column types are inferred from the values: int, float, bool and str columns are stored natively, anything else
+    (dicts, lists, mixed types) as JSON. Missing values and None are read back as None.
+
+    :param path: file to write
+    :param rows: iterable of dicts
+    :param key: optional field name or callable giving each row's unique key (all int or all str), rows are stored
+                sorted by it with a hash index for lookups with `Dataset.get`
+    :param meta: optional JSON serializable dict stored with the data, e.g. where it came from
+    :return: number of rows written
+    """
+    rows = list(rows)
+    columns = []
+    for row in rows:
+        for name in row:
+            if name not in columns:
+                columns.append(name)
+    values = {name: [_.get(name) for _ in rows] for name in columns}
+    if key is not None:
+        keys = [key(_) if callable(key) else _[key] for _ in rows]
+        if not all(isinstance(_, str) for _ in keys) and not all(type(_) is int for _ in keys):
+            raise ValueError('Dataset keys must all be str or all be int')
+        if len(set(keys)) != len(keys):
+            raise ValueError('Dataset keys are not unique')
+        order = sorted(range(len(rows)), key=keys.__getitem__)
+        values = {name: [column[_] for _ in order] for name, column in values.items()}
+        values[KEY_COLUMN] = [keys[_] for _ in order]
+        columns.append(KEY_COLUMN)
+
+    strings = _StringTable()
+    blocks = []
+    directory = []
+    offset = _HEADER.size + _COLUMN.size * len(columns)
+    offset += _pad(offset)
+    for name in columns:
+        column = values[name]
+        kind = _column_type(column)
+        if kind == 'i':
+            block = array('q', (_NULL_INT if _ is None else _ for _ in column)).tobytes()
+        elif kind == 'f':
+            block = array('d', (float('nan') if _ is None else _ for _ in column)).tobytes()
+        elif kind == 'b':
+            block = array('B', (_NULL_BOOL if _ is None else int(_) for _ in column)).tobytes()
+        else:
+            offsets, lengths = array('Q'), array('I')
+            for value in column:
+                if value is None:
+                    offsets.append(0)
+                    lengths.append(_NULL_LENGTH)
+                    continue
+                if kind == 'j':
+                    value = json.dumps(value, separators=(',', ':'), default=str)
+                elif not isinstance(value, str):
+                    value = str(value)
+                ref = strings.add(value)
+                offsets.append(ref[0])
+                lengths.append(ref[1])
+            block = offsets.tobytes() + lengths.tobytes()
+        directory.append((strings.add(name), kind.encode(), offset))
+        block += b'\0' * _pad(len(block))
+        blocks.append(block)
+        offset += len(block)
+
+    meta = dict(meta or {}, key=None, index=None)
+    if key is not None:
+        index = _key_index(values[KEY_COLUMN])
+        meta.update(key=KEY_COLUMN, index=[offset, len(index)])
+        blocks.append(index.tobytes())
+        offset += len(blocks[-1])
+    meta_ref = strings.add(json.dumps(meta, default=str))
+    header = _HEADER.pack(_MAGIC, DATASET_FORMAT_VERSION, len(columns), len(rows), time.time(), meta_ref[0],
+                          meta_ref[1], offset, len(strings.data))
+
+    directory_path = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory_path, prefix='.{}.'.format(os.path.basename(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            for (name_offset, name_length), kind, data_offset in directory:
+                f.write(_COLUMN.pack(name_offset, name_length, kind, data_offset))
+            f.write(b'\0' * _pad(_HEADER.size + _COLUMN.size * len(columns)))
+            for block in blocks:
+                f.write(block)
+            f.write(strings.data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)
+        # readers either see the old file or the complete new one
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return len(rows)
+
+
+class _StringColumn(Sequence):
+    """ A string or JSON column, decoding values as they are accessed """
+
+    def __init__(self, dataset, offsets, lengths, json_values):
+        self._strings = dataset._strings
+        self._offsets = offsets
+        self._lengths = lengths
+        self._json = json_values
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[_] for _ in range(*i.indices(len(self)))]
+        length = self._lengths[i]
+        if length == _NULL_LENGTH:
+            return None
+        offset = self._offsets[i]
+        value = str(self._strings[offset:offset + length], 'utf-8')
+        return json.loads(value) if self._json else value
+
+
+class _NullableColumn(Sequence):
+    """ A fixed-width column returning None for its null marker """
+
+    def __init__(self, values, kind):
+        self._values = values
+        self._kind = kind
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[_] for _ in range(*i.indices(len(self)))]
+        value = self._values[i]
+        if self._kind == 'i':
+            return None if value == _NULL_INT else value
+        if self._kind == 'f':
+            return None if value != value else value
+        return None if value == _NULL_BOOL else bool(value)
+
+
+class RowView(Mapping):
+    """ Read-only mapping over one row of a `Dataset`, values are read from the file when accessed """
+    __slots__ = ('_dataset', '_index')
+
+    def __init__(self, dataset, index):
+        self._dataset = dataset
+        self._index = index
+
+    def __getitem__(self, name):
+        return self._dataset.column(name)[self._index]
+
+    def __iter__(self):
+        return iter(self._dataset.columns)
+
+    def __len__(self):
+        return len(self._dataset.columns)
+
+    def __repr__(self):
+        return 'RowView({!r})'.format(dict(self))
+
+    def to_dict(self):
+        return dict(self)
+
+
+class Dataset(object):
+    def __init__(self, path):
+        """ A dataset file mapped read-only, see `write_dataset`.
+
+        Nothing is copied out of the mapping until it is accessed, so the pages are shared by every process with the
+        file open. The file is kept mapped until `close` (or the object is garbage collected), replacing it on disk
+        doesn't affect an open `Dataset`.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.file_id = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        # every view handed to the columns, released on `close` so the mapping can be closed while they are referenced
+        self._views = []
+
+        if len(self._view) < _HEADER.size:
+            raise RSIException('Not a dataset file: {}'.format(path))
+        (magic, version, ncolumns, self.rows, self.created, meta_offset, meta_length, strings_offset,
+         strings_length) = _HEADER.unpack_from(self._view)
+        if magic[:7] != _MAGIC[:7]:
+            raise RSIException('Not a dataset file: {}'.format(path))
+        if magic != _MAGIC:
+            raise RSIException('Dataset {} was written on a machine of the other byte order'.format(path))
+        if version != DATASET_FORMAT_VERSION:
+            raise RSIException('Unsupported dataset format version {} in {}'.format(version, path))
+        self.version = version
+
+        self._strings = self._slice(strings_offset, strings_length)
+        self.meta = json.loads(str(self._strings[meta_offset:meta_offset + meta_length], 'utf-8'))
+        self._columns = {}
+        for i in range(ncolumns):
+            name_offset, name_length, kind, offset = _COLUMN.unpack_from(self._view, _HEADER.size + i * _COLUMN.size)
+            name = str(self._strings[name_offset:name_offset + name_length], 'utf-8')
+            kind = kind.decode()
+            if kind in _TYPECODES:
+                size = array(_TYPECODES[kind]).itemsize * self.rows
+                column = _NullableColumn(self._slice(offset, size, _TYPECODES[kind]), kind)
+            else:
+                offsets = self._slice(offset, 8 * self.rows, 'Q')
+                lengths = self._slice(offset + 8 * self.rows, 4 * self.rows, 'I')
+                column = _StringColumn(self, offsets, lengths, kind == 'j')
+            self._columns[name] = column
+        self.columns = [_ for _ in self._columns if _ != KEY_COLUMN]
+        self._keys = self._columns.get(self.meta['key']) if self.meta.get('key') else None
+        if self.meta.get('index'):
+            offset, size = self.meta['index']
+            self._index = self._slice(offset, 8 * size, 'q')
+        else:
+            self._index = None
+
+    def _slice(self, offset, size, typecode=None):
+        view = self._view[offset:offset + size]
+        if typecode is not None:
+            view = view.cast(typecode)
+        self._views.append(view)
+        return view
+
+    def close(self):
+        """ Unmap the file, columns and rows of it raise ValueError if used afterwards """
+        if self._mmap.closed:
+            return
+        for view in self._views:
+            view.release()
+        self._view.release()
+        self._mmap.close()
+        self._views = []
+        self._columns = {}
+        self._keys = self._index = self._strings = None
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        return (RowView(self, _) for _ in range(self.rows))
+
+    def row(self, index):
+        """ `RowView` of the row at `index` """
+        if not -self.rows <= index < self.rows:
+            raise IndexError(index)
+        return RowView(self, index % self.rows if self.rows else index)
+
+    def column(self, name):
+        """ Sequence of the values of a column, read from the file as they are accessed """
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise KeyError('No column {!r} in {}'.format(name, self.path))
+
+    def keys(self):
+        """ Sequence of the row keys, sorted """
+        if self._keys is None:
+            raise RSIException('Dataset {} has no key'.format(self.path))
+        return self._keys
+
+    def get(self, key, default=None):
+        """ `RowView` of the row with the given key (looked up in the hash index stored with the keys), or `default` """
+        keys = self.keys()
+        if not isinstance(key, (str, int)):
+            return default
+        mask = len(self._index) - 1
+        slot = _key_hash(key) & mask
+        while True:
+            row = self._index[slot]
+            if row == -1:
+                return default
+            if keys[row] == key:
+                return RowView(self, row)
+            slot = (slot + 1) & mask
+
+    def __getitem__(self, key):
+        row = self.get(key)
+        if row is None:
+            raise KeyError(key)
+        return row
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class DatasetStore(object):
+    def __init__(self, directory, check_interval=DEFAULT_CHECK_INTERVAL):
+        """ A directory of named dataset files, written by one process and read by many.
+
+        :argument check_interval Seconds between checks of whether a dataset file was replaced, in `get`
+        """
+        self.directory = directory
+        self.check_interval = check_interval
+        self._open = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name + DATASET_SUFFIX)
+
+    def write(self, name, rows, key=None, meta=None):
+        """ Write (or atomically replace) a dataset, see `write_dataset` """
+        return write_dataset(self.path(name), rows, key=key, meta=meta)
+
+    def get(self, name):
+        """
+        The current version of a dataset, or None if it hasn't been written.
+
+        The open `Dataset` is reused until the file is replaced, the replaced one is left to be unmapped once nothing
+        uses it anymore.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._open.get(name)
+            if entry is not None and now - entry[1] < self.check_interval:
+                return entry[0]
+        try:
+            stat = os.stat(self.path(name))
+        except FileNotFoundError:
+            return None
+        file_id = (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._open.get(name)
+            if entry is None or entry[0].file_id != file_id:
+                entry = (Dataset(self.path(name)), now)
+            else:
+                entry = (entry[0], now)
+            self._open[name] = entry
+            return entry[0]
+
+    def names(self):
+        """ Names of the datasets in the store """
+        return sorted(_[:-len(DATASET_SUFFIX)] for _ in os.listdir(self.directory)
+                      if _.endswith(DATASET_SUFFIX) and not _.startswith('.'))
+
+    def export_ship_matrix(self, api, loaners=True):
+        """ Write the `ships` (keyed by id) and `loaners` (keyed by ship name) of a `ShipMatrixAPI` """
+        meta = {'source': api.api_endpoint}
+        self.write('ships', api.ships.values(), key=lambda _: int(_['id']), meta=meta)
+        if loaners:
+            self.write('loaners', ({'ship': k, 'loaners': v} for k, v in api.loaners.items()), key='ship', meta=meta)
+
+    def export_org(self, org, members=None):
+        """
+        Write the members of an `OrgAPI` as `org-<SYMBOL>-members`, keyed by lowercased handle.
+
+        :param members: the members if already fetched (e.g. by `OrgAPI.iter_members`), defaults to `OrgAPI.members`
+        """
+        members = org.members if members is None else members
+        # a member moving between pages while the roster was fetched is listed twice, the last one is kept
+        members = {_['handle'].lower(): _ for _ in members}.values()
+        self.write('org-{}-members'.format(org.symbol.upper()), members, key=lambda _: _['handle'].lower(),
+                   meta={'source': org.org_url, 'hidden_members': org.hidden_members})
@@ -0,0 +1,187 @@
+"""
+Time budgets for operations made of many requests.
+
+A `Deadline` is active for the block (or decorated call) it wraps, and every request made through an `RSISession`
+inside it gets the time left as its timeout, so the operation as a whole can't take longer than the budget::
+
+    with Deadline(10):
+        org.members             # raises DeadlineExceeded with the members fetched so far as `partial`
+
+    fetch_citizen('handle', deadline=5)
+
+Deadlines nest, the inner one only ever shortens the budget. `Deadline.cancel` stops the operation at its next
+request or page. A session can also give every operation run with it a default budget::
+
+    session = RSISession(operation_timeout=60)
+    ShipMatrixAPI(session=session).ships        # at most a minute, ship models and all
+"""
+import time
+import inspect
+import functools
+import threading
+import contextvars
+
+from rsi.exceptions import DeadlineExceeded
+
+_current = contextvars.ContextVar('rsi_deadline', default=None)
+
+
+class Deadline(object):
+    def __init__(self, seconds=None, at=None):
+        """ A point in time operations must be done by.
+
+        :argument seconds Time budget from now, None for no limit (useful to only allow cancelling)
+        :argument at `time.monotonic()` value of the deadline, instead of `seconds`
+        """
+        if at is None and seconds is not None:
+            at = time.monotonic() + seconds
+        self.at = at
+        # `at`, or the earlier deadline of the one this is entered under while it is active
+        self._effective = at
+        self._cancelled = threading.Event()
+        self._parent = None
+        self._tokens = []
+
+    def __repr__(self):
+        return 'Deadline(remaining={})'.format(self.remaining())
+
+    def remaining(self):
+        """ Seconds left, None if there is no limit """
+        if self._effective is None:
+            return None
+        return max(0.0, self._effective - time.monotonic())
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set() or (self._parent is not None and self._parent.cancelled)
+
+    @property
+    def expired(self):
+        return self.cancelled or (self._effective is not None and time.monotonic() >= self._effective)
+
+    def cancel(self):
+        """ Make everything running under this deadline stop at its next check """
+        self._cancelled.set()
+
+    def check(self):
+        """ Raise `DeadlineExceeded` if the deadline passed or was cancelled """
+        if self.cancelled:
+            raise DeadlineExceeded('Cancelled')
+        if self.expired:
+            raise DeadlineExceeded()
+
+    def timeout(self, timeout=None):
+        """ `timeout` (seconds or a requests (connect, read) tuple) shortened to the time left, raising
+        `DeadlineExceeded` if none is """
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if isinstance(timeout, tuple):
+            return tuple(remaining if _ is None else min(_, remaining) for _ in timeout)
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def sleep(self, seconds):
+        """ Sleep for `seconds`, waking up early and raising if the deadline passes or is cancelled meanwhile """
+        remaining = self.remaining()
+        self._cancelled.wait(seconds if remaining is None else min(seconds, remaining))
+        self.check()
+
+    def __enter__(self):
+        outer = _current.get()
+        self._tokens.append((_current.set(self), self._parent, self._effective))
+        self._parent = outer
+        # a nested deadline never extends the one it runs under, only for as long as it runs under it
+        effective = self.at
+        if outer is not None and outer._effective is not None and (effective is None or outer._effective < effective):
+            effective = outer._effective
+        self._effective = effective
+        return self
+
+    def __exit__(self, *args):
+        token, self._parent, self._effective = self._tokens.pop()
+        _current.reset(token)
+        return False
+
+
+def as_deadline(deadline):
+    """ A `Deadline` from a Deadline, a number of seconds or None """
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline)
+
+
+def current_deadline():
+    """ The innermost active `Deadline`, or None """
+    return _current.get()
+
+
+def check_deadline():
+    """ Raise `DeadlineExceeded` if the active deadline (if any) has passed, for loops between requests """
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def request_timeout(timeout=None):
+    """ `timeout` shortened to the active deadline, raising `DeadlineExceeded` if it has passed """
+    deadline = _current.get()
+    if deadline is None:
+        return timeout
+    return deadline.timeout(timeout)
+
+
+def sleep(seconds):
+    """ `time.sleep` that is cut short by the active deadline """
+    deadline = _current.get()
+    if deadline is None:
+        time.sleep(seconds)
+    else:
+        deadline.sleep(seconds)
+
+
+def _default_deadline(args, kwargs):
+    # the `operation_timeout` of the session the call runs with (its `session` argument, its first argument or the
+    # session of the object it is a method of), unless it runs under a deadline already
+    if _current.get() is not None:
+        return None
+    for candidate in (kwargs.get('session'),) + tuple(args[:1]):
+        seconds = getattr(getattr(candidate, 'session', candidate), 'operation_timeout', None)
+        if seconds is not None:
+            return Deadline(seconds)
+    return None
+
+
+def with_deadline(func):
+    """
+    Decorator adding a `deadline` keyword argument (seconds or `Deadline`) the call runs under.
+
+    Without one, and when no deadline is active, the call runs under the `operation_timeout` of its session if it has
+    one.
+    """
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, deadline=None, **kwargs):
+            deadline = as_deadline(deadline) or _default_deadline(args, kwargs)
+            if deadline is None:
+                yield from func(*args, **kwargs)
+                return
+            # the deadline is only active while the generator runs, not while the caller handles its items
+            gen = func(*args, **kwargs)
+            while True:
+                with deadline:
+                    try:
+                        item = next(gen)
+                    except StopIteration:
+                        return
+                yield item
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, deadline=None, **kwargs):
+        deadline = as_deadline(deadline) or _default_deadline(args, kwargs)
+        if deadline is None:
+            return func(*args, **kwargs)
+        with deadline:
+            return func(*args, **kwargs)
+    return wrapper
@@ -1,3 +1,11 @@
 
 class RSIException(Exception):
     pass
+
+
+class DeadlineExceeded(RSIException):
+    """ An operation ran out of its time budget or was cancelled, `partial` holds what it got done, if anything """
+
+    def __init__(self, message='Deadline exceeded', partial=None):
+        super(DeadlineExceeded, self).__init__(message)
+        self.partial = partial
@@ -0,0 +1,117 @@
+"""
+Parsing html while it downloads.
+
+`iter_element_html` feeds the chunks of a response into an incremental `html.parser.HTMLParser` and hands out the
+markup of the elements being scraped as soon as they close, so they can be parsed while the rest of the page is still
+on the wire and the full page is never held in memory::
+
+    with session.get(url, stream=True) as r:
+        for html in iter_element_html(iter_text(r.iter_content(DEFAULT_CHUNK_SIZE)), ['member-item']):
+            parse_members(html)
+"""
+import codecs
+from html.parser import HTMLParser
+
+from rsi.jsonstream import DEFAULT_CHUNK_SIZE
+
+VOID_ELEMENTS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+                           'source', 'track', 'wbr'))
+
+
+def iter_text(chunks, encoding='utf-8'):
+    """ Incrementally decode an iterable of bytes into str pieces """
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+class _ElementCollector(HTMLParser):
+    """ Collects the markup of the outermost elements having one of `classes` """
+
+    def __init__(self, classes):
+        super(_ElementCollector, self).__init__(convert_charrefs=False)
+        self.classes = frozenset(classes)
+        self.completed = []
+        self._parts = []
+        self._open = []
+
+    def _matches(self, attrs):
+        for name, value in attrs:
+            if name == 'class' and value and not self.classes.isdisjoint(value.split()):
+                return True
+        return False
+
+    def _complete(self):
+        self.completed.append(''.join(self._parts))
+        self._parts = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._open:
+            self._parts.append(self.get_starttag_text())
+            if tag not in VOID_ELEMENTS:
+                self._open.append(tag)
+        elif self._matches(attrs):
+            self._parts = [self.get_starttag_text()]
+            if tag in VOID_ELEMENTS:
+                self._complete()
+            else:
+                self._open.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if self._open:
+            self._parts.append(self.get_starttag_text())
+        elif self._matches(attrs):
+            self._parts = [self.get_starttag_text()]
+            self._complete()
+
+    def handle_endtag(self, tag):
+        if not self._open:
+            return
+        self._parts.append('</{}>'.format(tag))
+        if tag in self._open:
+            # like browsers, an end tag closes anything left open inside its element
+            while self._open.pop() != tag:
+                pass
+            if not self._open:
+                self._complete()
+
+    def handle_data(self, data):
+        if self._open:
+            self._parts.append(data)
+
+    def handle_entityref(self, name):
+        if self._open:
+            self._parts.append('&{};'.format(name))
+
+    def handle_charref(self, name):
+        if self._open:
+            self._parts.append('&#{};'.format(name))
+
+
+def iter_element_html(text_chunks, classes):
+    """
+    Markup of the outermost elements with any of the given classes, emitted as the chunks complete them.
+
+    :param text_chunks: iterable of str pieces of the page, e.g. from `iter_text` or `iter_json_string`
+    :param classes: class names of the elements to extract
+    :return: generator of html strings, each holding every element completed by one chunk
+    """
+    collector = _ElementCollector(classes)
+    for text in text_chunks:
+        collector.feed(text)
+        if collector.completed:
+            yield ''.join(collector.completed)
+            collector.completed = []
+    collector.close()
+    if collector.completed:
+        yield ''.join(collector.completed)
+
+
+def stream_elements(response, classes, chunk_size=DEFAULT_CHUNK_SIZE):
+    """ `iter_element_html` over the body of a `stream=True` response, decoded with its encoding """
+    return iter_element_html(iter_text(response.iter_content(chunk_size), response.encoding), classes)
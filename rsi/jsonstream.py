@@ -0,0 +1,165 @@
+import re
+import json
+import codecs
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+class _ChunkReader(object):
+    """ Decodes JSON values out of an iterable of byte chunks, only keeping the undecoded remainder in memory """
+
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        if self.eof:
+            return False
+        text = ''
+        while not text:
+            try:
+                text = self._decoder.decode(next(self._chunks))
+            except StopIteration:
+                text = self._decoder.decode(b'', final=True)
+                self.eof = True
+                break
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Skips whitespace and returns the next character without consuming it, or None at the end """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, chars):
+        c = self.peek()
+        if c is None or c not in chars:
+            raise ValueError('Expected one of {!r} at offset {}, got {!r}'.format(chars, self.pos, c))
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            if end == len(self.buf) and not self.eof:
+                # a number could continue in the next chunk, make sure it does not
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(chunks, key, meta=None, encoding='utf-8'):
+    """
+    Incrementally decode the items of the array stored under `key` in a top level JSON object.
+
+    Only one item (plus the read buffer) is held in memory at a time, the other members of the top level object
+    are decoded normally and stored in `meta`.
+
+    :param chunks: iterable of bytes, for example `response.iter_content(DEFAULT_CHUNK_SIZE)`
+    :param key: top level key of the array to iterate over
+    :param meta: optional dict the other top level members are stored in as they are decoded
+    :param encoding: encoding of the chunks
+    :return: generator of the array items
+    """
+    meta = {} if meta is None else meta
+    reader = _ChunkReader(chunks, encoding=encoding)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            meta[name] = reader.value()
+        if reader.expect(',}') == '}':
+            return
+
+
+# the longest run of complete characters and escapes inside a JSON string
+_STRING_RUN = re.compile(r'(?:[^"\\]+|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*')
+_HIGH_SURROGATE = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}$')
+
+
+def _iter_string(reader):
+    """ Yields the decoded pieces of the JSON string starting at the reader's position """
+    reader.expect('"')
+    while True:
+        end = _STRING_RUN.match(reader.buf, reader.pos).end()
+        closed = end < len(reader.buf) and reader.buf[end] == '"'
+        if not closed and _HIGH_SURROGATE.search(reader.buf, reader.pos, end):
+            end -= 6    # keep surrogate pairs together
+        if end > reader.pos:
+            yield json.loads('"{}"'.format(reader.buf[reader.pos:end]))
+            reader.pos = end
+        if closed:
+            reader.pos += 1
+            return
+        if not reader.fill():
+            raise ValueError('Unterminated string at offset {}'.format(reader.pos))
+
+
+def _iter_object_string(reader, path, meta):
+    reader.expect('{')
+    if reader.peek() == '}':
+        reader.pos += 1
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == path[0] and len(path) == 1 and reader.peek() == '"':
+            yield from _iter_string(reader)
+        elif name == path[0] and len(path) > 1 and reader.peek() == '{':
+            meta[name] = {}
+            yield from _iter_object_string(reader, path[1:], meta[name])
+        else:
+            meta[name] = reader.value()
+        if reader.expect(',}') == '}':
+            return
+
+
+def iter_json_string(chunks, path, meta=None, encoding='utf-8'):
+    """
+    Incrementally decode a (large) string value of a JSON object, such as the html of a getOrgMembers response.
+
+    :param chunks: iterable of bytes, for example `response.iter_content(DEFAULT_CHUNK_SIZE)`
+    :param path: tuple of the keys leading to the string, e.g. ('data', 'html')
+    :param meta: optional dict the other members of the objects along the path are stored in, it is complete once
+                 the generator is exhausted
+    :param encoding: encoding of the chunks
+    :return: generator of the pieces of the string as they are decoded, nothing is yielded (and `meta` is left empty)
+             for a `null` document
+    """
+    meta = {} if meta is None else meta
+    reader = _ChunkReader(chunks, encoding=encoding)
+    if reader.peek() == 'n':
+        reader.value()
+        return
+    yield from _iter_object_string(reader, tuple(path), meta)
@@ -1,3 +1,11 @@
+import json
+import hashlib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from cachetools import TTLCache
+
 from .session import RSISession
 
 DEFAULT_LAUNCHER_API_ENDPOINTS = {
@@ -8,10 +16,38 @@ DEFAULT_LAUNCHER_API_ENDPOINTS = {
     'patch_notes': '/api/launcher/v3/content/patchNotes',
 }
 
+DEFAULT_CACHE_TTL = 300
+DEFAULT_CHANNELS = ('LIVE', 'PTU', 'EPTU')
+
+# default of `LauncherAPI.release`'s claims, telling them to be looked up (None is a valid value)
+_LOOKUP = object()
+
+
+def _digest(data):
+    return hashlib.blake2b(json.dumps(data, sort_keys=True, default=str).encode(), digest_size=8).hexdigest()
+
+
+def _news_items(data):
+    # the news feed is either a bare list of items or an object holding them under `items`
+    if isinstance(data, dict):
+        return data.get('items', [])
+    return data or []
+
 
 class LauncherAPI:
-    def __init__(self, session: RSISession, **kwargs):
+    def __init__(self, session: RSISession, cache_ttl=DEFAULT_CACHE_TTL, **kwargs):
+        """ Queries the RSI launcher APIs.
+
+        The content feeds (`news`, `patch_notes` and `release`) are cached per game and channel for `cache_ttl`
+        seconds, so repeated calls within that time do not hit the network.
+
+        :argument cache_ttl How long to cache the content feeds before re-querying
+        """
         self.session = session
+        self._ttlcache = TTLCache(maxsize=64, ttl=cache_ttl)
+        self._lock = threading.Lock()
+        # key -> lock held while the key is fetched, so concurrent misses of a feed fetch it once
+        self._fetching = {}
 
         def _kwargs_or_default(key):
             endpoint = kwargs[key] if key in kwargs else DEFAULT_LAUNCHER_API_ENDPOINTS[key]
@@ -46,22 +82,120 @@ class LauncherAPI:
             return self._games_library
         return None
 
-    def news(self, game_id="SC"):
-        success, info = self.session.query_api(self._content_news, json={"game_id": game_id})
+    def clear_cache(self):
+        """ Resets the cache """
+        with self._lock:
+            self._ttlcache.clear()
+
+    def _cache(self, key, update_func, *args, **kwargs):
+        with self._lock:
+            if key in self._ttlcache:
+                return self._ttlcache[key]
+            fetching = self._fetching.setdefault(key, threading.Lock())
+        with fetching:
+            with self._lock:
+                if key in self._ttlcache:
+                    return self._ttlcache[key]     # fetched while waiting for the lock
+            value = update_func(*args, **kwargs)
+            with self._lock:
+                self._ttlcache[key] = value
+                self._fetching.pop(key, None)
+        return value
+
+    def _query_content(self, api, json):
+        success, info = self.session.query_api(api, json=json)
         if success:
             return info['data']
         raise ValueError(f'{info}')
 
+    def news(self, game_id="SC"):
+        return self._cache(('news', game_id), self._query_content, self._content_news, {"game_id": game_id})
+
     def patch_notes(self, game_id="SC", channel_id="LIVE"):
-        success, info = self.session.query_api(self._content_patch_notes,
-                                               json={"game_id": game_id, "channel_id": channel_id})
-        if success:
-            return info['data']
-        raise ValueError(f'{info}')
+        return self._cache(('patch_notes', game_id, channel_id), self._query_content, self._content_patch_notes,
+                           {"game_id": game_id, "channel_id": channel_id})
 
-    def release(self, game_id="SC", channel_id="LIVE"):
-        success, info = self.session.query_api(self._games_release,
-                                               json={"claims": self.claims, "gameId": game_id, "channelId": channel_id})
-        if success:
-            return info['data']
-        raise ValueError(f'{info}')
+    def release(self, game_id="SC", channel_id="LIVE", claims=_LOOKUP):
+        """
+        Release manifest of a channel, requires an authenticated session.
+
+        :param claims: `claims` if already known, otherwise they are looked up when the release isn't cached
+        """
+        return self._cache(('release', game_id, channel_id), lambda: self._query_content(
+            self._games_release, {"claims": self.claims if claims is _LOOKUP else claims, "gameId": game_id,
+                                  "channelId": channel_id}))
+
+    def _release_claims(self, game_id, channels):
+        # `claims` checks the session with a request every time it is read, so calls fetching several releases look
+        # them up once for all of them, and not at all if every release is cached
+        with self._lock:
+            if all(('release', game_id, _) in self._ttlcache for _ in channels):
+                return _LOOKUP
+        return self.claims
+
+    def prefetch(self, game_id="SC", channels=DEFAULT_CHANNELS, include_release=True, max_workers=None):
+        """
+        Concurrently fetch (and cache) the news and the patch notes and release of every channel.
+
+        :param game_id: Game to fetch the content for
+        :param channels: Channels to fetch the patch notes and releases of
+        :param include_release: Also fetch the releases, which requires an authenticated session
+        :param max_workers: Number of concurrent requests, defaults to one per feed
+        :return: dict with `news`, `patch_notes` and `release` (the latter two keyed by channel) and `errors` holding
+                 the exception of any feed that could not be fetched keyed by (feed, channel)
+        """
+        jobs = [('news', None, self.news, (game_id,))]
+        claims = self._release_claims(game_id, channels) if include_release else _LOOKUP
+        for channel in channels:
+            jobs.append(('patch_notes', channel, self.patch_notes, (game_id, channel)))
+            if include_release:
+                jobs.append(('release', channel, self.release, (game_id, channel, claims)))
+
+        result = {'news': None, 'patch_notes': {}, 'release': {}, 'errors': {}}
+        with ThreadPoolExecutor(max_workers=max_workers or len(jobs)) as pool:
+            # each feed runs in a copy of the caller's context so an active `Deadline` applies to it as well
+            futures = [(feed, channel, pool.submit(contextvars.copy_context().run, func, *args))
+                       for feed, channel, func, args in jobs]
+            for feed, channel, future in futures:
+                try:
+                    value = future.result()
+                except Exception as e:
+                    result['errors'][(feed, channel)] = e
+                    continue
+                if channel is None:
+                    result[feed] = value
+                else:
+                    result[feed][channel] = value
+        return result
+
+    def news_since(self, cursor=None, game_id="SC"):
+        """
+        News items which were not in the feed when `cursor` was returned.
+
+        :param cursor: Cursor returned by a previous call, None returns every item
+        :param game_id: Game to fetch the news for
+        :return: tuple of (list of new items, cursor to pass to the next call)
+        """
+        seen = set(cursor.split(',')) if cursor else set()
+        items = [(_digest(_), _) for _ in _news_items(self.news(game_id))]
+        return [item for digest, item in items if digest not in seen], ','.join(sorted(_[0] for _ in items))
+
+    def release_changes(self, cursor=None, game_id="SC", channels=DEFAULT_CHANNELS):
+        """
+        Release manifests which changed since `cursor` was returned.
+
+        :param cursor: Cursor returned by a previous call, None returns every release
+        :param game_id: Game to fetch the releases for
+        :param channels: Channels to check
+        :return: tuple of (dict of channel to changed release manifest, cursor to pass to the next call)
+        """
+        known = dict(_.split(':', 1) for _ in cursor.split(',')) if cursor else {}
+        changed = {}
+        claims = self._release_claims(game_id, channels)
+        for channel in channels:
+            release = self.release(game_id, channel, claims)
+            digest = _digest(release)
+            if known.get(channel) != digest:
+                changed[channel] = release
+            known[channel] = digest
+        return changed, ','.join(f'{k}:{v}' for k, v in sorted(known.items()))
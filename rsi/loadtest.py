@@ -0,0 +1,173 @@
+"""
+Load test driver running every API class against a `StandinServer` at different concurrency levels.
+
+Usage::
+
+    python -m rsi.loadtest --concurrency 1,4,16 --operations 200 --latency 0.02 --throttle-rate 0.01
+"""
+import sys
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from rsi.session import RSISessionPool
+from rsi.citizen import fetch_citizen
+from rsi.org import OrgAPI, fetch_members_page
+from rsi.shipmatrix import ShipMatrixAPI
+from rsi.pledge_store import PledgeStore
+from rsi.roadmap import Roadmap
+from rsi.launcher import LauncherAPI
+from rsi.status import Status
+from rsi.standin import StandinServer
+
+
+def _citizen(server, session, rng):
+    return fetch_citizen('citizen_{}'.format(rng.randint(1, 10000)), url=server.url, session=session)
+
+
+def _org_details(server, session, rng):
+    return OrgAPI('ORG{}'.format(rng.randint(1, 50)), url=server.url, session=session).details
+
+
+def _org_members_page(server, session, rng):
+    pages = max(1, server.roster_size // server.page_size)
+    return fetch_members_page(session, 'ORG{}'.format(rng.randint(1, 50)), rng.randint(1, pages), url=server.url)
+
+
+def _ship_matrix(server, session, rng):
+    return ShipMatrixAPI(session=session, rsi_url=server.url, enable_pledges=False, enable_ship_models=False).ships
+
+
+def _skus(server, session, rng):
+    return list(PledgeStore(session=session, rsi_url=server.url).skus())
+
+
+def _ship_upgrades(server, session, rng):
+    return PledgeStore(session=session, rsi_url=server.url).ship_upgrades()
+
+
+def _roadmap(server, session, rng):
+    now = datetime.now()
+    return Roadmap(session=session, rsi_url=server.url).fetch_roadmap(now - timedelta(days=30), now)
+
+
+def _launcher(server, session, rng):
+    return LauncherAPI(session, cache_ttl=0).news()
+
+
+def _status(server, session, rng):
+    return Status(status_api_url=server.status_url).system()
+
+
+SCENARIOS = {
+    'citizen': _citizen,
+    'org_details': _org_details,
+    'org_members_page': _org_members_page,
+    'ship_matrix': _ship_matrix,
+    'skus': _skus,
+    'ship_upgrades': _ship_upgrades,
+    'roadmap': _roadmap,
+    'launcher': _launcher,
+    'status': _status,
+}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(server, scenario, concurrency, operations, seed=0):
+    """
+    Run `operations` calls of a scenario spread over `concurrency` threads sharing one session pool.
+
+    :return: dict with the throughput (operations per second), error count and latency percentiles in seconds
+    """
+    func = SCENARIOS[scenario]
+    pool = RSISessionPool(size=concurrency, url=server.url, persist_session=False)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    remaining = [operations]
+
+    def _worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        with pool.session() as session:
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                start = time.perf_counter()
+                try:
+                    func(server, session, rng)
+                except Exception as e:
+                    with lock:
+                        errors.append(repr(e))
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(_worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    pool.close()
+
+    latencies.sort()
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'operations': len(latencies),
+        'errors': len(errors),
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 50),
+        'p90': percentile(latencies, 90),
+        'p99': percentile(latencies, 99),
+        'max': latencies[-1] if latencies else 0.0,
+    }
+
+
+def run_load_test(server, scenarios=None, concurrency_levels=(1, 4, 16), operations=100):
+    """ Run every scenario at every concurrency level, yielding the result of each run """
+    for scenario in scenarios or SCENARIOS:
+        for concurrency in concurrency_levels:
+            yield run_scenario(server, scenario, concurrency, operations)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m rsi.loadtest', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='comma separated scenarios to run')
+    parser.add_argument('--concurrency', default='1,4,16', help='comma separated concurrency levels')
+    parser.add_argument('--operations', type=int, default=100, help='operations per scenario and concurrency level')
+    parser.add_argument('--roster-size', type=int, default=1000)
+    parser.add_argument('--page-size', type=int, default=32)
+    parser.add_argument('--hidden-ratio', type=float, default=0.1)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of latency added to every response')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of responses that are a 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of responses that are a 429')
+    args = parser.parse_args(argv)
+
+    server = StandinServer(roster_size=args.roster_size, page_size=args.page_size, hidden_ratio=args.hidden_ratio,
+                           latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate,
+                           throttle_rate=args.throttle_rate)
+    print('{:<18}{:>6}{:>8}{:>8}{:>10}{:>10}{:>10}{:>10}'.format(
+        'scenario', 'conc', 'ops', 'errors', 'ops/s', 'p50 ms', 'p90 ms', 'p99 ms'))
+    with server:
+        for result in run_load_test(server, scenarios=args.scenarios.split(','),
+                                    concurrency_levels=[int(_) for _ in args.concurrency.split(',')],
+                                    operations=args.operations):
+            print('{scenario:<18}{concurrency:>6}{operations:>8}{errors:>8}{throughput:>10.1f}'.format(**result) +
+                  ''.join('{:>10.1f}'.format(result[_] * 1000) for _ in ('p50', 'p90', 'p99')))
+            sys.stdout.flush()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
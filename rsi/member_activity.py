@@ -0,0 +1,229 @@
+import re
+import time
+import sqlite3
+import threading
+
+DEFAULT_MEMBER_ACTIVITY_FILE = '.pyrsi_member_activity.db'
+# seconds of leeway when comparing observations, a roster is stamped with one time but takes a while to fetch
+OBSERVATION_SLACK = 300
+
+LAST_ONLINE_UNITS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+    'month': 30 * 86400,
+    'year': 365 * 86400,
+}
+
+_AMOUNT = r'(\d+|an?|one)'
+_UNIT = r'(second|minute|hour|day|week|month|year)s?'
+_LESS_THAN_RE = re.compile(r'less than {} {}'.format(_AMOUNT, _UNIT))
+_MORE_THAN_RE = re.compile(r'(?:more|over) than {} {}'.format(_AMOUNT, _UNIT))
+_AGO_RE = re.compile(r'{} {} ago'.format(_AMOUNT, _UNIT))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS member_state (
+    org TEXT NOT NULL,
+    member_id TEXT NOT NULL,
+    handle TEXT NOT NULL,
+    name TEXT,
+    rank TEXT,
+    visibility TEXT,
+    last_online REAL,
+    resolution REAL,
+    last_online_str TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (org, member_id)
+);
+CREATE INDEX IF NOT EXISTS member_state_last_online ON member_state (org, last_online);
+CREATE TABLE IF NOT EXISTS member_activity (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    org TEXT NOT NULL,
+    member_id TEXT NOT NULL,
+    observed_at REAL NOT NULL,
+    last_online REAL NOT NULL,
+    resolution REAL
+);
+CREATE INDEX IF NOT EXISTS member_activity_member ON member_activity (org, member_id, observed_at);
+CREATE INDEX IF NOT EXISTS member_activity_time ON member_activity (org, last_online);
+"""
+
+
+def _amount(value):
+    return 1 if value in ('a', 'an', 'one') else int(value)
+
+
+def parse_last_online(text, now=None):
+    """
+    Turn the relative `last_online` string shown to org admins ('less than an hour ago', '3 days ago', ...) into a
+    timestamp.
+
+    The site rounds down, '3 days ago' means somewhere between 3 and 4 days ago, so the timestamp returned is the
+    most recent the member could have been online and `resolution` is how much earlier it may really have been.
+
+    :param text: the string scraped from the members page
+    :param now: timestamp the string was scraped at, defaults to now
+    :return: tuple of (timestamp, resolution in seconds or None if open ended), or None if it can't be parsed
+    """
+    now = time.time() if now is None else now
+    text = ' '.join((text or '').lower().split())
+    if not text or 'never' in text:
+        return None
+    if 'just now' in text or 'online now' in text:
+        return now, LAST_ONLINE_UNITS['minute']
+    if 'today' in text:
+        return now, LAST_ONLINE_UNITS['day']
+    if 'yesterday' in text:
+        return now - LAST_ONLINE_UNITS['day'], LAST_ONLINE_UNITS['day']
+
+    m = _LESS_THAN_RE.search(text)
+    if m:
+        return now, _amount(m.group(1)) * LAST_ONLINE_UNITS[m.group(2)]
+    m = _MORE_THAN_RE.search(text)
+    if m:
+        return now - _amount(m.group(1)) * LAST_ONLINE_UNITS[m.group(2)], None
+    m = _AGO_RE.search(text)
+    if m:
+        unit = LAST_ONLINE_UNITS[m.group(2)]
+        return now - _amount(m.group(1)) * unit, unit
+    return None
+
+
+class MemberActivity(object):
+    def __init__(self, path=DEFAULT_MEMBER_ACTIVITY_FILE):
+        """ Local SQLite backed index of when org members were last online, built from admin mode rosters.
+
+        The current state of every member is kept in `member_state`, indexed by org and last online time for
+        inactivity queries. Every time a refresh shows a member has been online again since the previous one an
+        observation is added to `member_activity`, which gives the activity history and trends.
+
+        :argument path Path to the SQLite database, use ':memory:' for a throwaway store
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._state = {(row['org'], row['member_id']): (row['last_online'], row['resolution'])
+                       for row in self._db.execute('SELECT org, member_id, last_online, resolution FROM member_state')}
+
+    def close(self):
+        self._db.close()
+
+    def record(self, org, members, observed_at=None):
+        """
+        Record the members of an org as returned by `OrgAPI.members` in admin mode.
+
+        Members without an id or a `last_online` (as in non admin rosters) are skipped.
+
+        :param org: org symbol
+        :param members: iterable of member dicts
+        :param observed_at: timestamp the members were fetched at, defaults to now
+        :return: list of the member dicts that have been online since their previous observation
+        """
+        org = org.upper()
+        observed_at = time.time() if observed_at is None else observed_at
+        active, states, observations = [], [], []
+        with self._lock:
+            for member in members:
+                member_id = str(member.get('id') or '')
+                parsed = parse_last_online(member.get('last_online'), now=observed_at)
+                if not member_id or parsed is None:
+                    continue
+                last_online, resolution = parsed
+                states.append((org, member_id, member['handle'], member.get('name', ''), member.get('rank', ''),
+                               member.get('visibility', ''), last_online, resolution, member['last_online'],
+                               observed_at, observed_at))
+
+                previous = self._state.get((org, member_id))
+                self._state[(org, member_id)] = parsed
+                # the estimate drifts between refreshes without the member logging in, they only did for sure if
+                # the earliest they could have been online is after the latest they could have been before
+                if previous is not None and (resolution is None or
+                                             last_online - resolution <= previous[0] + OBSERVATION_SLACK):
+                    continue
+                active.append(member)
+                observations.append((org, member_id, observed_at, last_online, resolution))
+
+            with self._db:
+                self._db.executemany(
+                    'INSERT INTO member_state (org, member_id, handle, name, rank, visibility, last_online, '
+                    'resolution, last_online_str, first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT(org, member_id) DO UPDATE SET handle=excluded.handle, name=excluded.name, '
+                    'rank=excluded.rank, visibility=excluded.visibility, last_online=excluded.last_online, '
+                    'resolution=excluded.resolution, last_online_str=excluded.last_online_str, '
+                    'last_seen=excluded.last_seen', states)
+                self._db.executemany(
+                    'INSERT INTO member_activity (org, member_id, observed_at, last_online, resolution) '
+                    'VALUES (?, ?, ?, ?, ?)', observations)
+        return active
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(_) for _ in self._db.execute(sql, params)]
+
+    def inactive(self, org, days=30, now=None, current=True):
+        """
+        Members of the org that have not been online for at least `days` days, longest inactive first.
+
+        :param org: org symbol
+        :param days: number of days without being online
+        :param now: timestamp to measure from, defaults to now
+        :param current: only members that were in the org's most recently recorded roster
+        """
+        org = org.upper()
+        now = time.time() if now is None else now
+        sql = 'SELECT * FROM member_state WHERE org = ? AND last_online <= ?'
+        params = [org, now - days * LAST_ONLINE_UNITS['day']]
+        if current:
+            sql += ' AND last_seen >= (SELECT MAX(last_seen) FROM member_state WHERE org = ?)'
+            params.append(org)
+        return self._query(sql + ' ORDER BY last_online', params)
+
+    def active_between(self, org, start, end=None):
+        """
+        Members of the org last online between the `start` and `end` timestamps, most recent first.
+
+        :param org: org symbol
+        :param start: timestamp
+        :param end: timestamp, defaults to now
+        """
+        return self._query('SELECT * FROM member_state WHERE org = ? AND last_online >= ? AND last_online <= ? '
+                           'ORDER BY last_online DESC', (org.upper(), start, time.time() if end is None else end))
+
+    def history(self, org, member_id, since=None):
+        """
+        The recorded logins of a member, oldest first.
+
+        :param org: org symbol
+        :param member_id: member id as returned in admin mode
+        :param since: only return observations made after this timestamp
+        """
+        return self._query('SELECT * FROM member_activity WHERE org = ? AND member_id = ? AND observed_at >= ? '
+                           'ORDER BY observed_at', (org.upper(), str(member_id), since or 0))
+
+    def trend(self, org, since=None, bucket_days=1):
+        """
+        Number of distinct members online in each bucket of `bucket_days` days, from the recorded logins.
+
+        Logins only known to a coarser resolution than the bucket (e.g. '2 months ago' for daily buckets) are left
+        out as they can't be placed in one.
+
+        :param org: org symbol
+        :param since: timestamp to start at, defaults to 30 buckets ago
+        :param bucket_days: size of the buckets in days
+        :return: list of (bucket start timestamp, members online) tuples, oldest first
+        """
+        bucket = bucket_days * LAST_ONLINE_UNITS['day']
+        since = time.time() - 30 * bucket if since is None else since
+        rows = self._query('SELECT CAST(last_online / ? AS INTEGER) * ? AS bucket, COUNT(DISTINCT member_id) AS online '
+                           'FROM member_activity WHERE org = ? AND last_online >= ? AND resolution <= ? '
+                           'GROUP BY 1 ORDER BY 1', (bucket, bucket, org.upper(), since, bucket))
+        return [(_['bucket'], _['online']) for _ in rows]
+
+    def orgs(self):
+        """ Symbols of all orgs that have been recorded """
+        return sorted({_[0] for _ in self._state})
@@ -1,121 +1,450 @@
-import time
+import json
+import asyncio
+import threading
+import contextvars
+from collections import defaultdict
 from fuzzywuzzy import process
-from cachetools import TTLCache
 from bs4 import BeautifulSoup
 
 from rsi.conf import DEFAULT_RSI_URL
+from rsi.utils import class_strainer
 from .session import RSISession
+from .tracing import span, traced
+from .parse_cache import cached_parse
+from .parse_executor import run_parse
+from .deadline import with_deadline, check_deadline, sleep
+from .exceptions import DeadlineExceeded
+from .cache import make_cache, get_or_update
+from .jsonstream import iter_json_string, DEFAULT_CHUNK_SIZE
+from .htmlstream import iter_element_html, stream_elements
 
 
 DEFAULT_CACHE_TTL = 300
+DEFAULT_MEMBERS_ENDPOINT = '/api/orgs/getOrgMembers'
+# seconds between the member pages of an org
+MEMBERS_PAGE_DELAY = 0.5
+
+# only the parts of the org pages that are scraped get parsed
+ORG_DETAILS_STRAINER_CLASSES = ('banner', 'logo', 'inner', 'join-us')
+ORG_DETAILS_STRAINER = class_strainer(*ORG_DETAILS_STRAINER_CLASSES)
+ORG_MEMBER_STRAINER_CLASSES = ('member-item',)
+ORG_MEMBER_STRAINER = class_strainer(*ORG_MEMBER_STRAINER_CLASSES)
+
+
+@traced('parse_members')
+def parse_members(html, url=DEFAULT_RSI_URL, admin_mode=False):
+    """
+    Parse the html returned by the getOrgMembers API.
+
+    :param html: html fragment from the API response
+    :param url: base RSI url used to build absolute links
+    :param admin_mode: whether the html was requested in admin mode and contains the admin only fields
+    :return: tuple of (list of member dicts, number of member entries scanned including hidden ones)
+    """
+    url = url.rstrip('/')
+    members = []
+    scanned = 0
+    apisoup = BeautifulSoup(html, features='html.parser', parse_only=ORG_MEMBER_STRAINER)
+    for member in apisoup.select('.member-item'):
+        scanned += 1
+        if member.select('.member-visibility-restriction'):
+            # hidden members are counted in `scanned` but not returned
+            continue
+
+        members.append({
+            'name': member.select_one('.name').text,
+            'handle': member.select_one('.nick').text,
+            'avatar': '{}{}'.format(url, member.select_one('img').attrs['src']),
+            'affiliate': member.select_one('.title').text == 'Affiliate',
+            'rank': member.select_one('.rank').text,
+            'roles': [_.text for _ in member.select('.rolelist .role')],
+            'url': '{}{}'.format(url, member.select_one('a.membercard').attrs['href']),
+
+            # defaults for things online admins will be able to get the real values of
+            'id': '',
+            'visibility': 'Membership: Visible',
+            'last_online': '',
+        })
+
+        if admin_mode:
+            members[-1].update({
+                'id': member.attrs.get('data-member-id', ''),
+                'last_online': member.select_one('.frontinfo .lastonline').text,
+                'visibility': member.select_one('.frontinfo .visibility').text,
+            })
+    return members, scanned
+
+
+@traced('members_page')
+@with_deadline
+def fetch_members_page(session, symbol, page, search='', admin_mode=False, url=DEFAULT_RSI_URL,
+                       members_endpoint=DEFAULT_MEMBERS_ENDPOINT, parse_executor=None, stream=False):
+    """
+    Fetch and parse a single page of an org's members from the getOrgMembers API.
+
+    :param parse_executor: Optional `ParseExecutor` the response is parsed on
+    :param stream: Parse the members as they download, ignored if the session has a parse cache as that needs the
+                   whole response
+    :return: tuple of (members, number of entries scanned, totalrows or None) or None if the API returned nothing
+    """
+    members_api = "{}/{}".format(url.rstrip('/'), members_endpoint.lstrip('/'))
+    params = {
+        'symbol': symbol,
+        'search': search,
+        'page': page
+    }
+
+    if admin_mode:
+        params['admin_mode'] = 1
+
+    if stream and getattr(session, 'parse_cache', None) is None:
+        return _collect_parts(_stream_members_page(session, members_api, params, url=url, admin_mode=admin_mode,
+                                                   parse_executor=parse_executor))
+
+    r = session.post(members_api, data=params)
+    if r.status_code != 200:
+        raise Exception('Received error fetching Org members: {}'.format(r.status_code))
+
+    return cached_parse(session, (members_api, symbol, page, search, admin_mode), r.content, parse_members_response,
+                        url=url, admin_mode=admin_mode, parse_executor=parse_executor)
+
+
+@with_deadline
+def iter_members_page(session, symbol, page, search='', admin_mode=False, url=DEFAULT_RSI_URL,
+                      members_endpoint=DEFAULT_MEMBERS_ENDPOINT, parse_executor=None, stream=False):
+    """
+    Generator over a single page of an org's members from the getOrgMembers API, in parts.
+
+    Each part is a tuple of (members, number of entries scanned, totalrows or None). When streaming, a part is
+    yielded with the members completed by each chunk of the response as it downloads and the last part holds
+    totalrows, otherwise the whole page is one part. Nothing is yielded if the API returned nothing.
+
+    See `fetch_members_page` for the arguments.
+    """
+    members_api = "{}/{}".format(url.rstrip('/'), members_endpoint.lstrip('/'))
+    if stream and getattr(session, 'parse_cache', None) is None:
+        params = {'symbol': symbol, 'search': search, 'page': page}
+        if admin_mode:
+            params['admin_mode'] = 1
+        yield from _stream_members_page(session, members_api, params, url=url, admin_mode=admin_mode,
+                                        parse_executor=parse_executor)
+        return
+    result = fetch_members_page(session, symbol, page, search=search, admin_mode=admin_mode, url=url,
+                                members_endpoint=members_endpoint, parse_executor=parse_executor)
+    if result is not None:
+        yield result
+
+
+def _check_members_meta(meta):
+    if meta.get('success', 1) != 1:
+        raise ValueError('Received error fetching Org members: {}'.format(meta))
+
+
+def _stream_members_page(session, members_api, params, url=DEFAULT_RSI_URL, admin_mode=False, parse_executor=None):
+    with session.post(members_api, data=params, stream=True) as r:
+        if r.status_code != 200:
+            raise Exception('Received error fetching Org members: {}'.format(r.status_code))
+
+        meta = {}
+        html = iter_json_string(r.iter_content(DEFAULT_CHUNK_SIZE), ('data', 'html'), meta=meta)
+        for items in iter_element_html(html, ORG_MEMBER_STRAINER_CLASSES):
+            # RSI sends `success` before the data, an error is raised before yielding anything
+            _check_members_meta(meta)
+            members, scanned = run_parse(parse_executor, parse_members, items, url=url, admin_mode=admin_mode)
+            yield members, scanned, None
+
+    if not meta:
+        return      # a null response, like `parse_members_response` returning None
+    _check_members_meta(meta)
+    totalrows = None
+    if meta.get('data') and 'totalrows' in meta['data']:
+        totalrows = int(meta['data']['totalrows'])
+    yield [], 0, totalrows
+
+
+def _collect_parts(parts):
+    """ The parts of a page from `iter_members_page` as one (members, scanned, totalrows) tuple, or None """
+    result = None
+    for members, scanned, totalrows in parts:
+        if result is None:
+            result = ([], 0, None)
+        result = (result[0] + members, result[1] + scanned, result[2] if totalrows is None else totalrows)
+    return result
+
+
+def parse_members_response(content, url=DEFAULT_RSI_URL, admin_mode=False):
+    """
+    Parse the raw body of a getOrgMembers API response.
+
+    :return: tuple of (members, number of entries scanned, totalrows or None) or None if the API returned nothing
+    """
+    with span('json_decode'):
+        r = json.loads(content)
+    if r is None:
+        return None
+
+    totalrows = None
+    if 'data' in r and r['data'] and 'totalrows' in r['data']:
+        totalrows = int(r['data']['totalrows'])
+
+    if r['success'] != 1:
+        raise ValueError('Received error fetching Org members: {}'.format(r))
+
+    members, scanned = parse_members(r['data']['html'], url=url, admin_mode=admin_mode)
+    return members, scanned, totalrows
+
+
+@traced('parse_details')
+def parse_org_details(html, url=DEFAULT_RSI_URL):
+    """ Parse the details of an org from its page """
+    url = url.rstrip('/')
+    data = {}
+    orgsoup = BeautifulSoup(html, features='html.parser', parse_only=ORG_DETAILS_STRAINER)
+    data['banner'] = '{}{}'.format(url, orgsoup.select_one('.banner img')['src'])
+    data['logo'] = '{}{}'.format(url, orgsoup.select_one('.logo img')['src'])
+    data['name'], data['symbol'] = orgsoup.select_one('.inner h1').text.split(' / ')
+    data['model'] = orgsoup.select_one('.inner .tags .model').text
+    data['commitment'] = orgsoup.select_one('.inner .tags .commitment').text
+    data['primary_focus'] = orgsoup.select_one('.inner .focus .primary img')['alt']
+    data['secondary_focus'] = orgsoup.select_one('.inner .focus .secondary img')['alt']
+    data['join_us'] = orgsoup.select_one('.join-us .body').text.strip()
+    return data
+
+
+class RosterIndex(object):
+    def __init__(self, members):
+        """ Lookup indexes over an org roster, built once per roster fill.
+
+        Handles are indexed case-insensitively. Ranks, roles and visibility are multi-maps (also case-insensitive)
+        to sets of roster positions, so combining filters is a set intersection instead of a scan of the roster.
+
+        :argument members List of member dicts as returned by `OrgAPI.members`
+        """
+        self.members = members
+        self.by_handle = {}
+        self.by_rank = defaultdict(set)
+        self.by_role = defaultdict(set)
+        self.by_visibility = defaultdict(set)
+        self.affiliates = set()
+        self.handle_choices = {}
+
+        for i, member in enumerate(members):
+            self.by_handle[member['handle'].lower()] = i
+            self.handle_choices[i] = member['handle']
+            self.by_rank[member['rank'].lower()].add(i)
+            for role in member['roles']:
+                self.by_role[role.lower()].add(i)
+            self.by_visibility[member['visibility'].lower()].add(i)
+            if member['affiliate']:
+                self.affiliates.add(i)
+
+    def member(self, handle):
+        """ The member with the given handle (case-insensitive) or None """
+        i = self.by_handle.get(handle.lower())
+        return None if i is None else self.members[i]
+
+    def positions(self, rank=None, role=None, affiliate=None, visibility=None):
+        """ Set of roster positions matching all of the given filters, `role` may also be a list of roles """
+        matches = []
+        if rank is not None:
+            matches.append(self.by_rank.get(rank.lower(), set()))
+        if role is not None:
+            for _ in [role] if isinstance(role, str) else role:
+                matches.append(self.by_role.get(_.lower(), set()))
+        if visibility is not None:
+            matches.append(self.by_visibility.get(visibility.lower(), set()))
+        if affiliate is not None:
+            matches.append(self.affiliates if affiliate else set(range(len(self.members))) - self.affiliates)
+        if not matches:
+            return set(range(len(self.members)))
+        matches.sort(key=len)
+        return matches[0].intersection(*matches[1:])
+
+    def find(self, rank=None, role=None, affiliate=None, visibility=None):
+        """ Members matching all of the given filters, in roster order """
+        return [self.members[_] for _ in sorted(self.positions(rank, role, affiliate, visibility))]
+
+
+class MembersIteration(object):
+    def __init__(self, org, search='', progress=None):
+        """ One pass over the member pages of an `OrgAPI`, shared by `OrgAPI.iter_members` and
+        `OrgAPI.aiter_members`.
+
+        Iterating (or async iterating) yields the members, `hidden_members` counts the hidden members this pass
+        skipped.
+
+        :argument search Only return members matching this search string
+        :argument progress Optional callable called with (pages done, members scanned, total members) after each page
+        """
+        self.org = org
+        self.search = search
+        self.progress = progress
+        self.page = 1
+        self.total = 1      # this just gets us going
+        self.scanned = 0
+        self.hidden_members = 0
+        self._page_scanned = 0
+        self._last_page = False
+
+    @property
+    def pending(self):
+        """ Whether there are pages left to fetch """
+        return not self._last_page and self.scanned < self.total
+
+    def _parts(self):
+        org = self.org
+        return iter_members_page(org.session, org.symbol, self.page, search=self.search, admin_mode=org.admin_mode,
+                                 url=org.url, members_endpoint=org.members_endpoint,
+                                 parse_executor=org.parse_executor, stream=org.stream_parse)
+
+    def _add_part(self, part):
+        """ Account for a part of the current page, returning its members """
+        page_members, scanned, totalrows = part
+        if totalrows is not None:
+            self.total = totalrows
+        self.scanned += scanned
+        self._page_scanned += scanned
+        self.hidden_members += scanned - len(page_members)
+        return page_members
+
+    def _end_page(self, fetched):
+        if not fetched:
+            return      # the API returned nothing, the page is fetched again
+        if self.progress is not None:
+            self.progress(self.page, self.scanned, self.total)
+        if self._page_scanned:
+            self.page += 1
+        else:
+            self._last_page = True
+        self._page_scanned = 0
+
+    def __iter__(self):
+        while self.pending:
+            check_deadline()
+            fetched = False
+            for part in self._parts():
+                fetched = True
+                yield from self._add_part(part)
+            self._end_page(fetched)
+            if self.pending:
+                with span('sleep'):
+                    sleep(MEMBERS_PAGE_DELAY)
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        while self.pending:
+            check_deadline()
+            fetched = False
+            parts = self._parts()
+            while True:
+                # in a copy of the task's context, for the active deadline and trace to apply to the fetch
+                part = await loop.run_in_executor(None, contextvars.copy_context().run, next, parts, None)
+                if part is None:
+                    break
+                fetched = True
+                for member in self._add_part(part):
+                    yield member
+            self._end_page(fetched)
+            if self.pending:
+                await asyncio.sleep(MEMBERS_PAGE_DELAY)
 
 
 class OrgAPI(object):
     def __init__(self, symbol, session=None, admin_mode=False, url=DEFAULT_RSI_URL, endpoint='/orgs',
-                 members_endpoint='/api/orgs/getOrgMembers', cache_ttl=DEFAULT_CACHE_TTL):
+                 members_endpoint=DEFAULT_MEMBERS_ENDPOINT, cache_ttl=DEFAULT_CACHE_TTL, parse_executor=None,
+                 cache_backend=None, stream_parse=False, activity=None):
+        """ Queries an org's details and members.
+
+        :argument parse_executor Optional `ParseExecutor` the member pages are parsed on
+        :argument cache_backend Optional `CacheBackend` to share the cached roster and details with other processes
+        :argument stream_parse Parse the org page and member pages while they download
+        :argument activity Optional `MemberActivity` every admin mode roster fetched is recorded into
+        """
         self.symbol = symbol
         self.url = url.rstrip('/')
         self.endpoint = endpoint
         self.members_endpoint = members_endpoint
         self.admin_mode = admin_mode
         self.session = session or RSISession(url=url)
+        self.parse_executor = parse_executor
+        self.stream_parse = stream_parse
+        self.activity = activity
 
         self.org_url = "{}/{}/{}".format(self.url, self.endpoint.lstrip('/'), symbol)
         self.members_api = "{}/{}".format(self.url, self.members_endpoint.lstrip('/'))
-        self._ttlcache = TTLCache(maxsize=1, ttl=cache_ttl)
+        # the roster and details, optionally in a `CacheBackend` shared with other processes
+        self._ttlcache = make_cache(cache_backend, 'org:{}:{}:{}'.format(self.url, symbol.upper(), int(admin_mode)),
+                                    maxsize=2, ttl=cache_ttl)
+        self.hidden_members = 0
 
-        self._update_details()   # pull and cache the org details which will raise 404 if not found
+        self._cache('details', self._update_details)   # pull and cache the details, raises if the org is not found
 
     def clear_cache(self):
         """ Resets the cache """
-        for key in self._ttlcache.keys():
+        for key in list(self._ttlcache.keys()):
             del self._ttlcache[key]
 
     def _cache(self, key, update_func, *args, **kwargs):
-        if key not in self._ttlcache:
-            self._ttlcache[key] = update_func(*args, **kwargs)
-        return self._ttlcache[key]
+        return get_or_update(self._ttlcache, key, lambda: update_func(*args, **kwargs))
 
+    @traced('org_members')
     def _update_members(self, search):
         members = []
+        try:
+            members.extend(self.iter_members(search=search))
+        except DeadlineExceeded as e:
+            # not cached, the next access starts over
+            e.partial = members
+            raise
+        if self.activity is not None and self.admin_mode:
+            self.activity.record(self.symbol, members)
+        return members
 
-        params = {
-            'symbol': self.symbol,
-            'search': search,
-            'page': 1
-        }
+    @with_deadline
+    def iter_members(self, search='', progress=None):
+        """
+        Generator yielding the org's members page by page as they are fetched and parsed.
 
-        if self.admin_mode:
-            params['admin_mode'] = 1
+        Hidden members are not yielded, the number skipped is kept in `hidden_members` once the iteration is done. It
+        is only meaningful for one iteration at a time, iterate over `members_iteration` to get the count of each.
 
-        # this just gets us going
-        totalsize = 1
-        members_scanned = 0
-
-        while members_scanned < totalsize:
-            r = self.session.post(self.members_api, data=params)
-
-            if r.status_code == 200:
-                r = r.json()
-                if r is None:
-                    continue
-
-                if 'data' in r and r['data'] and 'totalrows' in r['data']:
-                    totalsize = int(r['data']['totalrows'])
-
-                if r['success'] == 1:
-                    apisoup = BeautifulSoup(r['data']['html'], features='html.parser')
-                    for member in apisoup.select('.member-item'):
-                        members_scanned += 1
-                        if member.select('.member-visibility-restriction'):
-                            print('skipping hidden member')
-                            continue
-
-                        members.append({
-                            'name': member.select_one('.name').text,
-                            'handle': member.select_one('.nick').text,
-                            'avatar': '{}{}'.format(self.url, member.select_one('img').attrs['src']),
-                            'affiliate': member.select_one('.title').text == 'Affiliate',
-                            'rank': member.select_one('.rank').text,
-                            'roles': [_.text for _ in member.select('.rolelist .role')],
-                            'url': '{}{}'.format(self.url, member.select_one('a.membercard').attrs['href']),
-
-                            # defaults for things online admins will be able to get the real values of
-                            'id': '',
-                            'visibility': 'Membership: Visible',
-                            'last_online': '',
-                        })
-
-                        if self.admin_mode:
-                            members[-1].update({
-                                'id': member.attrs.get('data-member-id', ''),
-                                'last_online': member.select_one('.frontinfo .lastonline').text,
-                                'visibility': member.select_one('.frontinfo .visibility').text,
-                            })
-
-                    params['page'] = params['page'] + 1
-                else:
-                    raise ValueError('Received error fetching Org members: {}'.format(r))
-            else:
-                raise Exception('Received error fetching Org members: {}'.format(r.status_code))
-            time.sleep(0.5)
-        return members
+        :param search: Only return members matching this search string
+        :param progress: Optional callable called with (pages done, members scanned, total members) after each page
+        :param deadline: Optional seconds or `Deadline` for fetching all of the pages, `DeadlineExceeded` is raised
+                         after the members fetched in time have been yielded
+        """
+        iteration = self.members_iteration(search=search, progress=progress)
+        yield from iteration
+        self.hidden_members = iteration.hidden_members
+
+    async def aiter_members(self, search='', progress=None):
+        """
+        Async variant of `iter_members`, the blocking page fetches are run in the event loop's default executor.
+
+        :param search: Only return members matching this search string
+        :param progress: Optional callable called with (pages done, members scanned, total members) after each page
+        """
+        iteration = self.members_iteration(search=search, progress=progress)
+        async for member in iteration:
+            yield member
+        self.hidden_members = iteration.hidden_members
 
+    def members_iteration(self, search='', progress=None):
+        """ A `MembersIteration` over the org's members, iterable once either blocking or with `async for` """
+        return MembersIteration(self, search=search, progress=progress)
+
+    @traced('org_details')
     def _update_details(self):
+        if self.stream_parse and getattr(self.session, 'parse_cache', None) is None:
+            # only the scraped parts of the page are kept, and they are parsed once the page is done
+            with self.session.get(self.org_url, stream=True) as r:
+                r.raise_for_status()
+                html = ''.join(stream_elements(r, ORG_DETAILS_STRAINER_CLASSES))
+            return parse_org_details(html, url=self.url)
+
         r = self.session.get(self.org_url)
-        data = {}
         r.raise_for_status()
-
-        orgsoup = BeautifulSoup(r.text, features='html.parser')
-        data['banner'] = '{}{}'.format(self.url, orgsoup.select_one('.banner img')['src'])
-        data['logo'] = '{}{}'.format(self.url, orgsoup.select_one('.logo img')['src'])
-        data['name'], data['symbol'] = orgsoup.select_one('.inner h1').text.split(' / ')
-        data['model'] = orgsoup.select_one('.inner .tags .model').text
-        data['commitment'] = orgsoup.select_one('.inner .tags .commitment').text
-        data['primary_focus'] = orgsoup.select_one('.inner .focus .primary img')['alt']
-        data['secondary_focus'] = orgsoup.select_one('.inner .focus .secondary img')['alt']
-        data['join_us'] = orgsoup.select_one('.join-us .body').text.strip()
-        return data
+        return cached_parse(self.session, self.org_url, r.text, parse_org_details, url=self.url)
 
     def search(self, handle, score_cutoff=80, limit=None):
         """
@@ -127,9 +456,9 @@ class OrgAPI(object):
         :return: List of matched results in the form of [(dict, int)] where dict is the ship data and in is the
                  matching confidence
         """
-        choices = {i: _['handle'] for i, _ in enumerate(self.members)}
-        return [(self.members[_[2]], _[1]) for _ in process.extractBests(handle, choices,
-                                                                         score_cutoff=score_cutoff, limit=limit)]
+        roster = self.roster
+        return [(roster.members[_[2]], _[1]) for _ in process.extractBests(handle, roster.handle_choices,
+                                                                           score_cutoff=score_cutoff, limit=limit)]
 
     def search_one(self, handle):
         """
@@ -143,9 +472,43 @@ class OrgAPI(object):
             return choices[0][0]
         return None
 
+    @property
+    def roster(self):
+        """ `RosterIndex` over the cached members """
+        return self._cache('roster', lambda: RosterIndex(self._update_members(search='')))
+
+    def cached_roster(self):
+        """ The `RosterIndex` if the roster is cached, None instead of fetching it """
+        return self._ttlcache.get('roster')
+
     @property
     def members(self):
-        return self._cache('members', self._update_members, search='')
+        return self.roster.members
+
+    def member(self, handle):
+        """ The member with exactly the given handle (case-insensitive), or None """
+        return self.roster.member(handle)
+
+    def find_members(self, rank=None, role=None, affiliate=None, visibility=None):
+        """
+        Members matching all of the given filters (case-insensitive), in roster order.
+
+        :param rank: Rank name, e.g. 'Officer'
+        :param role: Role name or list of role names the member must all have
+        :param affiliate: True for only affiliates, False for only main members
+        :param visibility: Membership visibility (admin mode only), e.g. 'Membership: Visible'
+        """
+        return self.roster.find(rank=rank, role=role, affiliate=affiliate, visibility=visibility)
+
+    def members_with_rank(self, rank):
+        return self.find_members(rank=rank)
+
+    def members_with_role(self, role):
+        return self.find_members(role=role)
+
+    @property
+    def affiliates(self):
+        return self.find_members(affiliate=True)
 
     @property
     def details(self):
@@ -186,3 +549,85 @@ class OrgAPI(object):
     @property
     def join_us(self):
         return self.details['join_us']
+
+
+class RosterRegistry(object):
+    def __init__(self, fetch_rosters=False):
+        """ The `OrgAPI`s of the tracked orgs, so their cached rosters can answer member lookups such as the roles of
+        a citizen in `fetch_citizen`, instead of a getOrgMembers search per org.
+
+        :argument fetch_rosters Fetch the roster of a tracked org on its first lookup if it is not cached, worth it
+                                when many members of the org will be looked up
+        """
+        self.fetch_rosters = fetch_rosters
+        self._orgs = {}
+        self._fetch_locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'not_cached': 0, 'untracked': 0}
+
+    def __contains__(self, symbol):
+        return symbol.upper() in self._orgs
+
+    def __len__(self):
+        return len(self._orgs)
+
+    def track(self, org):
+        """ Track an `OrgAPI`, replacing any other tracked for the same symbol, and return it """
+        with self._lock:
+            self._orgs[org.symbol.upper()] = org
+        return org
+
+    def untrack(self, symbol):
+        """ Stop tracking an org, returning its `OrgAPI` or None """
+        with self._lock:
+            return self._orgs.pop(symbol.upper(), None)
+
+    def org(self, symbol):
+        """ The tracked `OrgAPI` for `symbol` or None """
+        return self._orgs.get(symbol.upper())
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def roster(self, symbol):
+        """ The `RosterIndex` of a tracked org, None if it isn't tracked or its roster isn't cached (and isn't
+        fetched as `fetch_rosters` is off) """
+        org = self.org(symbol)
+        if org is None:
+            return None
+        roster = org.cached_roster()
+        if roster is None and self.fetch_rosters:
+            # one thread fetches, the others wait for it and use the result
+            with self._fetch_locks[org.symbol.upper()]:
+                roster = org.roster
+        return roster
+
+    def member(self, symbol, handle):
+        """
+        A member of a tracked org from its cached roster.
+
+        :return: the member dict, or None if the org is not tracked, its roster is not available or the member is
+                 not in it (e.g. hidden, or joined since the roster was fetched), in which case the caller should
+                 look the member up on the site
+        """
+        if symbol.upper() not in self._orgs:
+            self._count('untracked')
+            return None
+        roster = self.roster(symbol)
+        if roster is None:
+            self._count('not_cached')
+            return None
+        member = roster.member(handle)
+        self._count('misses' if member is None else 'hits')
+        return member
+
+    @property
+    def requests_avoided(self):
+        """ Number of lookups answered from a roster instead of the site """
+        return self._stats['hits']
+
+    def stats(self):
+        """ dict of the tracked orgs and the lookup counts, `requests_avoided` being the lookups answered """
+        with self._lock:
+            return dict(self._stats, tracked=sorted(self._orgs), requests_avoided=self._stats['hits'])
@@ -0,0 +1,116 @@
+"""
+Skipping the parse of responses that didn't change since they were last fetched.
+
+Most pages (the ship matrix, org pages and rosters, SKU listings, citizen pages) are byte-identical between
+refreshes. With a `ParseCache` on the session, every scraper hashes the raw body of a response and, if it matches the
+last body seen for the same resource, returns the previous result instead of parsing it again::
+
+    session = RSISession(parse_cache=ParseCache())
+"""
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+from rsi.parse_executor import run_parse
+
+DEFAULT_PARSE_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class ParseCache(object):
+    def __init__(self, maxbytes=DEFAULT_PARSE_CACHE_BYTES):
+        """ LRU cache of parse results keyed by resource, valid for as long as the resource's body hashes the same.
+
+        Results are kept pickled, which bounds the memory by `maxbytes` and hands every caller its own copy to
+        modify, unpickling being a small fraction of the cost of parsing.
+
+        :argument maxbytes Maximum total size of the pickled results kept, least recently used are evicted
+        """
+        self.maxbytes = maxbytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def digest(payload):
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8', 'surrogatepass')
+        return hashlib.blake2b(payload, digest_size=16).digest()
+
+    def get(self, key, digest):
+        """ The cached result for `key` if it was parsed from a body with the given digest, else raises KeyError """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != digest:
+                self.misses += 1
+                raise KeyError(key)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            data = entry[1]
+        return pickle.loads(data)
+
+    def put(self, key, digest, result):
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.maxbytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (digest, data)
+            self.size += len(data)
+            while self.size > self.maxbytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """ Forget the results parsed from the resource `key` (as passed to `parse`), or every result if None """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self.size = 0
+                return
+            # entries are keyed by the parse function and arguments along with the resource
+            for entry_key in [_ for _ in self._entries if _[2] == key]:
+                self.size -= len(self._entries.pop(entry_key)[1])
+
+    def stats(self):
+        """ dict of the hit, miss and eviction counts, the hit rate and the entries and bytes kept """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'hit_rate': self.hits / lookups if lookups else 0.0, 'entries': len(self._entries),
+                    'bytes': self.size}
+
+    def parse(self, key, payload, func, *args, parse_executor=None, **kwargs):
+        """
+        `func(payload, *args, **kwargs)`, or the previous result for `key` if `payload` is unchanged.
+
+        :param key: Hashable identifying the logical resource (e.g. the URL and request parameters)
+        :param payload: The raw response body, str or bytes
+        :param parse_executor: Optional `ParseExecutor` to parse on when the payload changed
+        """
+        key = (func.__module__, func.__qualname__, key, args, tuple(sorted(kwargs.items())))
+        digest = self.digest(payload)
+        try:
+            return self.get(key, digest)
+        except KeyError:
+            pass
+        result = run_parse(parse_executor, func, payload, *args, **kwargs)
+        self.put(key, digest, result)
+        return result
+
+
+def cached_parse(session, key, payload, func, *args, parse_executor=None, **kwargs):
+    """ Parse through the session's `parse_cache` if it has one, otherwise just parse """
+    parse_cache = getattr(session, 'parse_cache', None)
+    if parse_cache is None:
+        return run_parse(parse_executor, func, payload, *args, **kwargs)
+    return parse_cache.parse(key, payload, func, *args, parse_executor=parse_executor, **kwargs)
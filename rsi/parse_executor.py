@@ -0,0 +1,116 @@
+"""
+Offloading of the CPU bound HTML parsing to a pool of processes.
+
+The parse functions (`rsi.org.parse_members`, `rsi.citizen.parse_citizen_profile`, `rsi.citizen.parse_citizen_orgs`,
+`rsi.pledge_store.parse_skus`, ...) take the raw payload and return plain dicts and lists, so they can be run in
+another process while the I/O threads keep fetching::
+
+    from rsi.parse_executor import ParseExecutor
+
+    with ParseExecutor(max_workers=4) as parser:
+        crawler = OrgCrawler(symbols, parse_executor=parser)
+        crawler.run()
+"""
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+# payloads smaller than this are parsed in the calling thread, below it the ~1ms of pickling and process hand-off
+# is a large part of the parse time (see benchmarks/bench_parse_pool.py)
+DEFAULT_INLINE_THRESHOLD = 4 * 1024
+
+
+class ParseExecutor(object):
+    def __init__(self, max_workers=None, max_pending=None, inline_threshold=DEFAULT_INLINE_THRESHOLD,
+                 mp_context=None):
+        """ Runs parse functions on a process pool, with a bound on the payloads waiting to be parsed.
+
+        Submitting blocks while `max_pending` payloads are queued or being parsed, so fetching threads can't get
+        arbitrarily far ahead of the parsers and hold every fetched page in memory.
+
+        :argument max_workers Number of parser processes, defaults to the number of CPUs
+        :argument max_pending Maximum payloads in flight before `submit` blocks, defaults to twice `max_workers`
+        :argument inline_threshold Payloads shorter than this (in characters) are parsed in the calling thread
+        :argument mp_context multiprocessing context to start the processes with
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 2
+        self.inline_threshold = inline_threshold
+        self.inline = 0
+        self.offloaded = 0
+        self._mp_context = mp_context
+        self._pool = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        return False
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self._mp_context)
+            return self._pool
+
+    def _release(self, future):
+        self._slots.release()
+
+    def submit(self, func, payload, *args, **kwargs):
+        """
+        Parse `payload` with `func(payload, *args, **kwargs)`, blocking while `max_pending` parses are in flight.
+
+        :param func: A module level parse function, it and its arguments and result must be picklable
+        :param payload: The raw html or text to parse
+        :return: `concurrent.futures.Future` with the result of the parse
+        """
+        if len(payload) < self.inline_threshold:
+            future = Future()
+            with self._lock:
+                self.inline += 1
+            try:
+                future.set_result(func(payload, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        self._slots.acquire()
+        try:
+            future = self._executor().submit(func, payload, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.offloaded += 1
+        future.add_done_callback(self._release)
+        return future
+
+    def parse(self, func, payload, *args, **kwargs):
+        """ Like `submit` but waits for and returns the result """
+        return self.submit(func, payload, *args, **kwargs).result()
+
+    def map(self, func, payloads, *args, **kwargs):
+        """ Parse every payload with `func`, yielding the results in order while later payloads are still parsing """
+        futures = []
+        for payload in payloads:
+            futures.append(self.submit(func, payload, *args, **kwargs))
+            while futures and futures[0].done():
+                yield futures.pop(0).result()
+        for future in futures:
+            yield future.result()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+def run_parse(parse_executor, func, payload, *args, **kwargs):
+    """ `func(payload, *args, **kwargs)` on the executor when one is given, otherwise in the calling thread """
+    if parse_executor is None:
+        return func(payload, *args, **kwargs)
+    return parse_executor.parse(func, payload, *args, **kwargs)
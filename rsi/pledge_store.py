@@ -1,15 +1,20 @@
 import re
-from cachetools import TTLCache
 
 from bs4 import BeautifulSoup
 from rsi.session import RSISession
 from rsi.conf import DEFAULT_RSI_URL
 from rsi.exceptions import RSIException
+from rsi.utils import class_strainer, notify_listeners
+from rsi.upgrades import UpgradeGraph
+from rsi.parse_cache import cached_parse
+from rsi.cache import make_cache, get_or_update
+from rsi.deadline import with_deadline, check_deadline
 
 PLEDGE_SKU_ENDPOINT = '/api/store/getSKUs'
 SHIP_UPGRADE_ENDPOINT = '/pledge-store/api/upgrade'
 SET_CONTEXT_TOKEN_ENDPOINT = '/pledge-store/api/setContextToken'
 SHIP_UPGRADE_RE = re.compile(r'fromShips: (\[.*\]), toShips')
+SKU_STRAINER = class_strainer('product-item')
 
 
 upgrades_initShipUpgrades_query = [{
@@ -79,23 +84,59 @@ SKU_PRODUCT_IDS = {
 }
 
 
+def parse_skus(html, url=DEFAULT_RSI_URL):
+    """
+    Parse the html of the getSKUs API.
+
+    :param html: html fragment(s) from the API responses
+    :param url: base RSI url used to build absolute links
+    :return: list of sku dicts
+    """
+    url = url.rstrip('/')
+    skus = []
+    soup = BeautifulSoup(html, features='html.parser', parse_only=SKU_STRAINER)
+    for item in soup.select('div.product-item.js-ecommerce-tracking-sku'):
+        try:
+            skus.append(dict(
+                title=item.select('.title')[0].text.strip(),
+                image=item.select('img')[0].get('src', ''),
+                price=item.select('.final-price')[0].get('data-value', ''),
+                price_str=item.select('.final-price')[0].text.strip(),
+                stock=item.select('.state')[0].text.strip(),
+                link=f'{url}{item.select(".more")[0].get("href", "")}',
+            ))
+        except Exception as e:
+            print(repr(e))
+    return skus
+
+
 class PledgeStore(object):
     def __init__(self, session=None, rsi_url=DEFAULT_RSI_URL, sku_endpoint=PLEDGE_SKU_ENDPOINT, cache_ttl=300,
-                 ship_upgrade_endpoint=SHIP_UPGRADE_ENDPOINT, set_context_token_endpoint=SET_CONTEXT_TOKEN_ENDPOINT):
+                 ship_upgrade_endpoint=SHIP_UPGRADE_ENDPOINT, set_context_token_endpoint=SET_CONTEXT_TOKEN_ENDPOINT,
+                 history=None, parse_executor=None, cache_backend=None):
         """ Queries information from the RSI pledge store.
 
         :argument cache_ttl How long to cache the results of the API before re-querying
+        :argument history Optional `SKUHistory` every SKU listing is recorded into
+        :argument parse_executor Optional `ParseExecutor` the SKU listings are parsed on
+        :argument cache_backend Optional `CacheBackend` to share the cached upgrade graph with other processes
         """
         self.session = session or RSISession(url=rsi_url)
         self.rsi_url = rsi_url.rstrip('/')
         self.sku_endpoint = '{}/{}'.format(self.rsi_url, sku_endpoint.lstrip('/'))
         self.ship_upgrade_endpoint = '{}/{}'.format(self.rsi_url, ship_upgrade_endpoint.lstrip('/'))
         self._set_context_token_endpoint = '{}/{}'.format(self.rsi_url, set_context_token_endpoint.lstrip('/'))
-        self._ttlcache = TTLCache(maxsize=1, ttl=cache_ttl)
+        self._ttlcache = make_cache(cache_backend, 'pledge_store:{}'.format(self.rsi_url), maxsize=1, ttl=cache_ttl)
+        self.history = history
+        self.parse_executor = parse_executor
+        # callables given (list of SKU dicts, whether that is the whole store) after every listing that was iterated
+        # to the end, e.g. `SearchIndex.index_skus`
+        self.refresh_listeners = []
 
         if self.session is None:
             self.session = RSISession(url=rsi_url)
 
+    @with_deadline
     def skus(self, product_id="", search="", storefront="pledge", type="", sort='price_desc', pages=9999):
         page = 1
         opts = {"product_id": product_id, "search": search, "storefront": storefront, "type": type, "sort": sort}
@@ -107,6 +148,7 @@ class PledgeStore(object):
         row_count = r['data']['rowcount']
         html = r['data']['html']
         while row_count < r['data']['totalrows'] and page < pages:
+            check_deadline()
             page += 1
             r = self.session.post(self.sku_endpoint, json={**opts, **dict(page=page)})
             r.raise_for_status()
@@ -115,19 +157,19 @@ class PledgeStore(object):
             html += r['data']['html']
             row_count += r['data']['rowcount']
 
-        soup = BeautifulSoup(html, features='html.parser')
-        for item in soup.select('div.product-item.js-ecommerce-tracking-sku'):
-            try:
-                yield item.select('.title')[0].text.strip(), dict(
-                    title=item.select('.title')[0].text.strip(),
-                    image=item.select('img')[0].get('src', ''),
-                    price=item.select('.final-price')[0].get('data-value', ''),
-                    price_str=item.select('.final-price')[0].text.strip(),
-                    stock=item.select('.state')[0].text.strip(),
-                    link=f'{self.rsi_url}{item.select(".more")[0].get("href", "")}',
-                )
-            except Exception as e:
-                print(repr(e))
+        observed = []
+        try:
+            skus = cached_parse(self.session, (self.sku_endpoint, tuple(sorted(opts.items())), pages), html, parse_skus,
+                                url=self.rsi_url, parse_executor=self.parse_executor)
+            for sku in skus:
+                observed.append(sku)
+                yield sku['title'], sku
+            complete = (not (product_id or search or type) and storefront == 'pledge' and
+                        row_count >= r['data']['totalrows'])
+            notify_listeners(self.refresh_listeners, observed, complete)
+        finally:
+            if self.history is not None:
+                self.history.record(observed, product_id=product_id)
 
     def pledge_extras(self, product_id="", search="", *args, **kwargs):
         return self.skus(product_id, search, type="extras", *args, **kwargs)
@@ -149,3 +191,19 @@ class PledgeStore(object):
             raise
         return pledge_map
 
+    def upgrade_graph(self):
+        """
+        `UpgradeGraph` of the current ship upgrades, cached for `cache_ttl` so solved upgrade paths are reused
+        until the pledge data is refreshed.
+        """
+        return get_or_update(self._ttlcache, 'upgrade_graph', lambda: UpgradeGraph(self.ship_upgrades()))
+
+    def cheapest_upgrade(self, from_ship, to_ship):
+        """
+        Cheapest chain of ship upgrades between two ships.
+
+        :param from_ship: Ship id or name to upgrade from
+        :param to_ship: Ship id or name to upgrade to
+        :return: tuple of (total price, list of ship ids) or None if there is no upgrade path
+        """
+        return self.upgrade_graph().cheapest_path(from_ship, to_ship)
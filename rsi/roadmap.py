@@ -1,8 +1,13 @@
-from datetime import datetime
+from array import array
+from itertools import accumulate
+from collections import defaultdict
+from datetime import datetime, date, timedelta
 
 from rsi.session import RSISession
 from rsi.conf import DEFAULT_RSI_URL
 from rsi.exceptions import RSIException
+from rsi.deadline import with_deadline
+from rsi.utils import notify_listeners
 
 ROADMAP_ENDPOINT = '/graphql'
 
@@ -71,6 +76,166 @@ fragment Discipline on Discipline {
 }]
 
 
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    # the API returns dates, but tolerate full timestamps
+    return datetime.strptime(value[:10], DATE_STR_FMT).date()
+
+
+class IntervalIndex(object):
+    def __init__(self, intervals):
+        """ Static index of closed [start, end] intervals supporting overlap queries without a full scan.
+
+        The intervals are sorted by start and viewed as an implicit balanced binary tree (the middle of every range
+        is its root), with the largest end of every subtree stored at its root so whole subtrees ending before a
+        query can be skipped.
+
+        :argument intervals Iterable of (start, end, value) where start and end are comparable (e.g. ordinals)
+        """
+        intervals = sorted(intervals, key=lambda _: _[0])
+        self.starts = [_[0] for _ in intervals]
+        self.ends = [_[1] for _ in intervals]
+        self.values = [_[2] for _ in intervals]
+        self._max_end = list(self.ends)
+        self._build(0, len(intervals))
+
+    def __len__(self):
+        return len(self.values)
+
+    def _build(self, lo, hi):
+        if lo >= hi:
+            return None
+        mid = (lo + hi) // 2
+        for child in (self._build(lo, mid), self._build(mid + 1, hi)):
+            if child is not None and self._max_end[child] > self._max_end[mid]:
+                self._max_end[mid] = self._max_end[child]
+        return mid
+
+    def overlapping(self, start, end):
+        """ Values of the intervals overlapping [start, end], ordered by interval start """
+        result = []
+        stack = [(0, len(self.values))]
+        while stack:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] < start:
+                continue    # everything in this subtree ends before the query
+            stack.append((lo, mid))
+            if self.starts[mid] > end:
+                continue    # this one and everything to its right start after the query
+            if self.ends[mid] >= start:
+                result.append(mid)
+            stack.append((mid + 1, hi))
+        return [self.values[_] for _ in sorted(result)]
+
+    def containing(self, point):
+        """ Values of the intervals containing `point` """
+        return self.overlapping(point, point)
+
+
+class RoadmapModel(object):
+    def __init__(self, roadmap):
+        """ Parsed roadmap with dates converted once and deliverables and time allocations indexed by date.
+
+        :argument roadmap Team list as returned by `Roadmap.fetch_roadmap`
+        """
+        self.teams = [_.get('title', '') for _ in roadmap]
+        self.deliverables = []
+        self.allocations = []
+
+        for team in roadmap:
+            for deliverable in team.get('deliverables') or []:
+                projects = [_.get('title', '') for _ in deliverable.get('projects') or []]
+                d = {
+                    'team': team.get('title', ''),
+                    'title': deliverable.get('title', ''),
+                    'description': deliverable.get('description', ''),
+                    'start': _to_date(deliverable['startDate']),
+                    'end': _to_date(deliverable['endDate']),
+                    'projects': projects,
+                }
+                self.deliverables.append(d)
+                for allocation in deliverable.get('timeAllocations') or []:
+                    discipline = allocation.get('discipline') or {}
+                    self.allocations.append({
+                        'team': d['team'],
+                        'deliverable': d['title'],
+                        'projects': projects,
+                        'discipline': discipline.get('title', ''),
+                        'members': discipline.get('countMembers') or 0,
+                        'start': _to_date(allocation['startDate']),
+                        'end': _to_date(allocation['endDate']),
+                    })
+
+        self.deliverable_index = IntervalIndex((_['start'].toordinal(), _['end'].toordinal(), _)
+                                               for _ in self.deliverables)
+        self.allocation_index = IntervalIndex((_['start'].toordinal(), _['end'].toordinal(), _)
+                                              for _ in self.allocations)
+
+    def deliverables_between(self, start, end):
+        """ Deliverables scheduled at any point between the given dates (inclusive) """
+        return self.deliverable_index.overlapping(_to_date(start).toordinal(), _to_date(end).toordinal())
+
+    def allocations_between(self, start, end):
+        """ Time allocations scheduled at any point between the given dates (inclusive) """
+        return self.allocation_index.overlapping(_to_date(start).toordinal(), _to_date(end).toordinal())
+
+    def busy_disciplines(self, start, end):
+        """ Dict of discipline to the most members allocated to it on any single day between the given dates """
+        _, series = self.allocated(start, end, bucket_days=1, by='discipline')
+        return {k: max(v) for k, v in series.items() if max(v)}
+
+    def allocated(self, start, end, bucket_days=7, by='discipline'):
+        """
+        Allocated member-days per `by` key summed over fixed size time buckets.
+
+        Every overlapping allocation adds its member count to the first day of its (clipped) range and subtracts it
+        after the last in a per key difference array, so the daily totals are a single prefix sum per key.
+
+        :param start: First day of the first bucket
+        :param end: Last day to include
+        :param bucket_days: Length of every bucket in days, 7 gives member-weeks when divided by 7
+        :param by: 'discipline', 'team' or 'project'
+        :return: tuple of (list of bucket start dates, dict of key to list of member-days per bucket)
+        """
+        if by not in ('discipline', 'team', 'project'):
+            raise ValueError('Cannot aggregate roadmap allocations by {}'.format(by))
+        if bucket_days < 1:
+            raise ValueError('Buckets must be at least a day long, not {}'.format(bucket_days))
+        first, last = _to_date(start).toordinal(), _to_date(end).toordinal()
+        if last < first:
+            raise ValueError('Roadmap range ends ({}) before it starts ({})'.format(_to_date(end), _to_date(start)))
+        days = last - first + 1
+        diffs = defaultdict(lambda: array('d', bytes(8 * (days + 1))))
+
+        for allocation in self.allocation_index.overlapping(first, last):
+            lo = max(allocation['start'].toordinal(), first) - first
+            hi = min(allocation['end'].toordinal(), last) - first + 1
+            keys = allocation['projects'] if by == 'project' else [allocation[by]]
+            for key in keys:
+                diffs[key][lo] += allocation['members']
+                diffs[key][hi] -= allocation['members']
+
+        buckets = [date.fromordinal(first) + timedelta(days=_) for _ in range(0, days, bucket_days)]
+        result = {}
+        for key, diff in diffs.items():
+            daily = array('d', accumulate(diff[:days]))
+            totals = array('d', accumulate(daily))
+            result[key] = [totals[min(i + bucket_days, days) - 1] - (totals[i - 1] if i else 0)
+                           for i in range(0, days, bucket_days)]
+        return buckets, result
+
+    def allocated_weeks(self, start, end, bucket_days=7, by='discipline'):
+        """ Same as `allocated` but in member-weeks """
+        buckets, result = self.allocated(start, end, bucket_days=bucket_days, by=by)
+        return buckets, {k: [_ / 7 for _ in v] for k, v in result.items()}
+
+
 class Roadmap(object):
     def __init__(self, session=None, rsi_url=DEFAULT_RSI_URL, roadmap_endpoint=ROADMAP_ENDPOINT):
         """ Queries information from the RSI Roadmap
@@ -80,29 +245,45 @@ class Roadmap(object):
         self.session = session or RSISession(url=rsi_url)
         self.rsi_url = rsi_url.rstrip('/')
         self.roadmap_endpoint = '{}/{}'.format(self.rsi_url, roadmap_endpoint.lstrip('/'))
+        # callables given every roadmap fetched, e.g. `SearchIndex.index_roadmap`
+        self.refresh_listeners = []
 
         if self.session is None:
             self.session = RSISession(url=rsi_url)
 
+    @with_deadline
     def fetch_roadmap(self, start_date: datetime, end_date: datetime):
         """
 
         :param start_date: Datetime beginning of the roadmap to search for
         :param end_date: Datetime end of the roadmap to search for
+        :param deadline: Optional seconds or `Deadline` for the request
         :return: diction of roadmap entries
         """
-        q = roadmap_query.copy()
-        q[0]['variables'].update({
+        # copy down to the variables so concurrent fetches don't share them
+        q = [dict(roadmap_query[0], variables=dict(roadmap_query[0]['variables'], **{
             'startDate': start_date.strftime(DATE_STR_FMT),
             'endDate': end_date.strftime(DATE_STR_FMT)
-        })
+        }))]
         try:
             p = self.session.post(self.roadmap_endpoint, json=q)
             if p.status_code == 200:
                 p = p.json()[0]
                 if p.get('errors', []):
                     raise RSIException(p['errors'])
-                return p.get('data', {}).get('roadmap', [])
+                roadmap = p.get('data', {}).get('roadmap', [])
+                notify_listeners(self.refresh_listeners, roadmap)
+                return roadmap
         except Exception as e:
             raise
         return []
+
+    @with_deadline
+    def fetch_model(self, start_date: datetime, end_date: datetime):
+        """
+        Fetch the roadmap and parse it into a `RoadmapModel` for range queries and aggregation.
+
+        :param start_date: Datetime beginning of the roadmap to search for
+        :param end_date: Datetime end of the roadmap to search for
+        """
+        return RoadmapModel(self.fetch_roadmap(start_date, end_date))
@@ -1,22 +1,79 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from cachetools import LRUCache
+
 from .session import RSISession
 from .pledge_store import PledgeStore
-from .shipmatrix import ShipMatrixAPI
-from .org import OrgAPI
-from .citizen import fetch_citizen
+from .shipmatrix import ShipMatrixAPI, SHIP_REQUIRED_FIELDS
+from .org import OrgAPI, RosterRegistry
+from .citizen import CitizenCache
 from .status import Status
 from .roadmap import Roadmap
+from .crowdfund import CrowdfundStats
+from .launcher import LauncherAPI
+from .search import SearchIndex, DEFAULT_SEARCH_LIMIT
+
+DEFAULT_SNAPSHOT_SOURCES = ('status', 'timeline', 'ship_count', 'news', 'roadmap')
+DEFAULT_SNAPSHOT_DEADLINE = 5
+DEFAULT_SNAPSHOT_WORKERS = 8
+# seconds a snapshot source's last value is reused for instead of fetching it again
+DEFAULT_SNAPSHOT_MAX_AGE = 30
+# untracked orgs whose `OrgAPI` (and details cache) is kept for snapshots
+DEFAULT_SNAPSHOT_ORGS = 32
+DEFAULT_ROADMAP_DAYS = 90
 
 
 class RSISite:
-    def __init__(self, session: RSISession = None, *args, **kwargs):
+    def __init__(self, session: RSISession = None, *args, citizen_cache: CitizenCache = None, search: bool = False,
+                 **kwargs):
+        """ Entry point to every RSI API, sharing one session.
+
+        :argument citizen_cache `CitizenCache` for `citizen` lookups, one using the session is created if not given
+        :argument search Index what `store`, `ships` and `roadmap` fetch from the start, instead of from the first
+                         `search` on
+        """
         self.session = session
         if self.session is None:
             self.session = RSISession(*args, **kwargs)
 
         self.store = PledgeStore(session=self.session)
         self.ships = ShipMatrixAPI(session=self.session)
+        # just the ship matrix, for counting the ships without fetching the pledges and every ship page
+        self._ship_summary = ShipMatrixAPI(session=self.session, enable_pledges=False, enable_ship_models=False,
+                                           fields=SHIP_REQUIRED_FIELDS)
         self.roadmap = Roadmap(session=self.session)
-        self.status = Status()
+        self.status = Status(session=self.session)
+        self.crowdfund = CrowdfundStats(session=self.session)
+        self.launcher = LauncherAPI(self.session)
+        # orgs tracked with `track_org`, their cached rosters answer the org roles of `citizen` lookups
+        self.rosters = RosterRegistry()
+        self.citizens = citizen_cache or CitizenCache(session=self.session, rosters=self.rosters)
+        self._search_index = None
+        self._search_lock = threading.Lock()
+        if search:
+            self.search_index
+
+        self._orgs = LRUCache(maxsize=DEFAULT_SNAPSHOT_ORGS)
+        self._orgs_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_pool = None
+        self._snapshot_pending = {}
+        self._snapshot_last = {}
+
+    def close(self):
+        """ Stop the snapshot workers, sources still loading in the background are left to finish on their own """
+        with self._snapshot_lock:
+            pool, self._snapshot_pool = self._snapshot_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     @property
     def is_authenticated(self):
@@ -25,8 +82,136 @@ class RSISite:
     def authenticate(self, username, password, force=False):
         return self.session.authenticate(username, password, force=force)
 
-    def citizen(self, handle, skip_orgs=False):
-        return fetch_citizen(handle, skip_orgs=skip_orgs, session=self.session)
+    def citizen(self, handle, skip_orgs=False, refresh=False):
+        """ Citizen profile and orgs, cached in `citizens` (see `CitizenCache`), roles in tracked orgs come from their
+        rosters (see `track_org`) """
+        return self.citizens.get(handle, skip_orgs=skip_orgs, refresh=refresh)
+
+    @property
+    def search_index(self):
+        """ `SearchIndex` kept up to date with what `store`, `ships` and `roadmap` fetch, created on first use """
+        with self._search_lock:
+            if self._search_index is None:
+                self._search_index = SearchIndex()
+                self._search_index.attach(store=self.store, ships=self.ships, roadmap=self.roadmap)
+            return self._search_index
+
+    def search(self, query, kinds=None, limit=DEFAULT_SEARCH_LIMIT):
+        """
+        Search the SKUs, ships and roadmap deliverables fetched through `store`, `ships` and `roadmap` since the index
+        was created (see the `search` argument), and the ships cached then.
+
+        :param query: text to search for, typos are tolerated and the last word can be incomplete
+        :param kinds: only return results of these kinds: 'sku', 'ship' and/or 'deliverable'
+        :return: list of (score, kind, id, item) tuples, best first
+        """
+        return self.search_index.search(query, kinds=kinds, limit=limit)
 
     def org(self, symbol):
-        return OrgAPI(symbol=symbol, session=self.session)
+        """ The tracked `OrgAPI` of the org if there is one, otherwise a new one """
+        return self.rosters.org(symbol) or OrgAPI(symbol=symbol, session=self.session)
+
+    def track_org(self, symbol, **kwargs):
+        """
+        Keep an `OrgAPI` for the org in `rosters`, so once its roster is fetched (e.g. through `members`) the roles of
+        its members are read from it by `citizen` instead of being looked up on the site.
+
+        :param kwargs: Passed on to `OrgAPI`
+        :return: the `OrgAPI`
+        """
+        return self.rosters.track(OrgAPI(symbol=symbol, session=self.session, **kwargs))
+
+    def _snapshot_org(self, symbol):
+        # kept around so the org's details cache is reused between snapshots, creating the `OrgAPI` fetches the details
+        # so concurrent snapshots wait for the first one instead of each creating their own
+        org = self.rosters.org(symbol)
+        if org is None:
+            with self._orgs_lock:
+                org = self._orgs.get(symbol.upper())
+                if org is None:
+                    org = self._orgs[symbol.upper()] = self.org(symbol)
+        return org.details
+
+    def _snapshot_source(self, source):
+        if source == 'status':
+            return self.status.system()
+        if source == 'timeline':
+            return self.status.timeline()
+        if source == 'ship_count':
+            ships = self.ships.cached_ships()
+            return len(ships if ships is not None else self._ship_summary.ships)
+        if source == 'news':
+            return self.launcher.news()
+        if source == 'roadmap':
+            now = datetime.now()
+            return self.roadmap.fetch_roadmap(now, now + timedelta(days=DEFAULT_ROADMAP_DAYS))
+        if source == 'crowdfund':
+            return self.crowdfund.current()
+        if source.startswith('org:'):
+            return self._snapshot_org(source[4:])
+        raise ValueError('Unknown snapshot source: {}'.format(source))
+
+    def _fetch_source(self, source):
+        value = self._snapshot_source(source)
+        with self._snapshot_lock:
+            self._snapshot_last[source] = (value, time.time())
+        return value
+
+    def snapshot(self, sources=DEFAULT_SNAPSHOT_SOURCES, deadline=DEFAULT_SNAPSHOT_DEADLINE,
+                 max_age=DEFAULT_SNAPSHOT_MAX_AGE):
+        """
+        Fetch several data sources concurrently, returning whatever is ready once the deadline passes.
+
+        Sources still loading at the deadline keep loading in the background, so a later snapshot picks up their
+        result, and a source is never fetched twice at the same time. The workers run until `close`. Anything that
+        failed or did not finish in time is filled in with the last value fetched for it, if any, and marked as stale.
+
+        :param sources: Names of the sources: 'status', 'timeline', 'ship_count', 'news', 'roadmap', 'crowdfund' and
+                        'org:<symbol>' for an org's details
+        :param deadline: Seconds to wait for the sources
+        :param max_age: Sources fetched less than this many seconds ago are not fetched again
+        :return: dict with 'complete' (every source is fresh), 'elapsed' seconds and 'sources', a dict of source name
+                 to a dict of 'state' ('ok', 'stale' or 'missing'), 'data', 'age' (seconds since it was fetched,
+                 None if missing) and 'error' (why it is not fresh, if it isn't)
+        """
+        started = time.time()
+        with self._snapshot_lock:
+            if self._snapshot_pool is None:
+                self._snapshot_pool = ThreadPoolExecutor(max_workers=DEFAULT_SNAPSHOT_WORKERS,
+                                                         thread_name_prefix='rsi-snapshot')
+            futures = {}
+            for source in sources:
+                future = self._snapshot_pending.get(source)
+                last = self._snapshot_last.get(source)
+                if last is not None and started - last[1] < max_age and (future is None or future.done()):
+                    future = Future()
+                    future.set_result(last[0])
+                elif future is None or future.done():
+                    future = self._snapshot_pending[source] = self._snapshot_pool.submit(self._fetch_source, source)
+                futures[source] = future
+
+        wait(futures.values(), timeout=max(0, deadline - (time.time() - started)))
+
+        result = {}
+        now = time.time()
+        for source, future in futures.items():
+            error = None
+            if not future.done():
+                error = 'timed out'
+            elif future.exception() is not None:
+                error = repr(future.exception())
+            else:
+                with self._snapshot_lock:
+                    fetched_at = self._snapshot_last[source][1]
+                result[source] = {'state': 'ok', 'data': future.result(), 'age': now - fetched_at, 'error': None}
+                continue
+
+            with self._snapshot_lock:
+                last = self._snapshot_last.get(source)
+            if last is None:
+                result[source] = {'state': 'missing', 'data': None, 'age': None, 'error': error}
+            else:
+                result[source] = {'state': 'stale', 'data': last[0], 'age': now - last[1], 'error': error}
+
+        return {'complete': all(_['state'] == 'ok' for _ in result.values()), 'elapsed': now - started,
+                'sources': result}
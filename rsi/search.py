@@ -0,0 +1,292 @@
+"""
+One search index over pledge store SKUs, ships and roadmap deliverables, for search-as-you-type.
+
+Text is broken into trigrams kept in an inverted index, so a query only looks at the documents sharing trigrams with
+it instead of scoring every entity. Matching on trigrams makes queries tolerant of typos, and the last word of a
+query also matches as a prefix::
+
+    index = SearchIndex()
+    index.attach(store=store, ships=ships, roadmap=roadmap)
+    ships.ships                 # every refresh of the ship matrix (or SKU listing, or roadmap) updates the index
+    index.search('carack')      # -> [(score, 'ship', 7, {...}), ...]
+"""
+import re
+import heapq
+import threading
+from itertools import chain
+from collections import Counter, defaultdict
+
+DEFAULT_SEARCH_LIMIT = 10
+DEFAULT_MIN_SCORE = 0.35
+# a matching trigram in the title counts this many times one only found in the body
+TITLE_WEIGHT = 2
+# added to the score when a word of the title starts with the last word of the query
+PREFIX_BONUS = 0.25
+# scored candidates per result, as candidates with the same number of matching trigrams are ranked on their titles
+CANDIDATES_PER_RESULT = 4
+
+SEARCH_KINDS = ('sku', 'ship', 'deliverable')
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """ Lowercased words of `text` """
+    return _WORD_RE.findall((text or '').lower())
+
+
+def _word_trigrams(word, prefix=False, initial=False):
+    # words are padded so two letter words have trigrams and matching starts and ends weigh more, a prefix isn't
+    # padded at the end as the rest of the word is still to come. Indexed words also keep their first letter on its
+    # own, for one letter queries to match, other queries leave it out as it is in far too many documents.
+    padded = ' {}{}'.format(word, '' if prefix else ' ')
+    grams = {padded[i:i + 3] for i in range(len(padded) - 2)}
+    if initial or len(word) == 1:
+        grams.add(padded[:2])
+    return grams
+
+
+def trigrams(text, prefix=False, initials=False):
+    """
+    Set of the trigrams of the words of `text`.
+
+    :param prefix: treat the last word as the start of a word still being typed
+    :param initials: also include the first letter of every word, as indexed documents do
+    """
+    words = normalize(text)
+    result = set()
+    for i, word in enumerate(words):
+        result |= _word_trigrams(word, prefix=prefix and i == len(words) - 1, initial=initials)
+    return result
+
+
+def _document_text(title, body):
+    return '{}\x00{}'.format(title, body)
+
+
+class _Document(object):
+    __slots__ = ('key', 'title', 'text', 'words', 'title_grams', 'body_grams', 'payload')
+
+    def __init__(self, key, title, body, payload):
+        self.key = key
+        self.title = title
+        self.text = _document_text(title, body)
+        self.words = normalize(title)
+        self.title_grams = trigrams(title, initials=True)
+        self.body_grams = trigrams(body, initials=True) - self.title_grams
+        self.payload = payload
+
+
+class SearchIndex(object):
+    def __init__(self, min_score=DEFAULT_MIN_SCORE):
+        """ In-memory trigram index over documents of several kinds, see the module docs.
+
+        :argument min_score Default minimum score (0 to 1.25) of search results, lower returns more distant matches
+        """
+        self.min_score = min_score
+        self._lock = threading.RLock()
+        self._docs = {}             # internal id -> _Document
+        self._ids = {}              # (kind, id) -> internal id
+        # (kind, trigram) -> set of internal ids, of the documents having it in their title and only in their body
+        self._titles = defaultdict(set)
+        self._bodies = defaultdict(set)
+        self._kinds = Counter()
+        self._next_id = 0
+        self._ship_sources = []
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def kinds(self):
+        """ Kinds of the indexed documents """
+        return sorted(+self._kinds)
+
+    def _add(self, key, title, body, payload):
+        old = self._ids.get(key)
+        if old is not None:
+            if self._docs[old].text == _document_text(title, body):
+                self._docs[old].payload = payload   # only what is returned changed, nothing to re-index
+                return False
+            self._remove(key)
+        doc = _Document(key, title, body, payload)
+        doc_id = self._ids[key] = self._next_id
+        self._next_id += 1
+        self._docs[doc_id] = doc
+        self._kinds[key[0]] += 1
+        for postings, grams in ((self._titles, doc.title_grams), (self._bodies, doc.body_grams)):
+            for gram in grams:
+                postings[key[0], gram].add(doc_id)
+        return True
+
+    def _remove(self, key):
+        doc_id = self._ids.pop(key, None)
+        if doc_id is None:
+            return False
+        doc = self._docs.pop(doc_id)
+        self._kinds[key[0]] -= 1
+        for postings, grams in ((self._titles, doc.title_grams), (self._bodies, doc.body_grams)):
+            for gram in grams:
+                posting = postings[key[0], gram]
+                posting.discard(doc_id)
+                if not posting:
+                    del postings[key[0], gram]
+        return True
+
+    def add(self, kind, id, title, body='', payload=None):
+        """
+        Add or replace a document.
+
+        :param kind: kind of the document, e.g. 'ship'
+        :param id: id of the document, unique within its kind
+        :param title: text matched with full weight
+        :param body: text matched with 1 / `TITLE_WEIGHT` of the weight
+        :param payload: returned with the search results, defaults to the title
+        :return: whether the index changed
+        """
+        with self._lock:
+            return self._add((kind, id), title, body, title if payload is None else payload)
+
+    def remove(self, kind, id):
+        """ Remove a document, returning whether it was indexed """
+        with self._lock:
+            return self._remove((kind, id))
+
+    def update(self, kind, documents, complete=False):
+        """
+        Incrementally bring the documents of a kind up to date, only re-indexing those whose text changed.
+
+        :param kind: kind of the documents
+        :param documents: iterable of (id, title, body, payload) tuples, a None payload defaults to the title
+        :param complete: the documents are all there is of the kind, any other indexed document of it is removed
+        :return: tuple of (number of documents added or re-indexed, number removed)
+        """
+        changed = removed = 0
+        with self._lock:
+            seen = set()
+            for id, title, body, payload in documents:
+                seen.add((kind, id))
+                changed += self._add((kind, id), title, body, title if payload is None else payload)
+            if complete:
+                for key in [_ for _ in self._ids if _[0] == kind and _ not in seen]:
+                    removed += self._remove(key)
+        return changed, removed
+
+    def clear(self, kind=None):
+        """ Remove every document, or every document of `kind` """
+        with self._lock:
+            if kind is None:
+                self._docs.clear()
+                self._ids.clear()
+                self._titles.clear()
+                self._bodies.clear()
+                self._kinds.clear()
+            else:
+                self.update(kind, [], complete=True)
+
+    def search(self, query, kinds=None, limit=DEFAULT_SEARCH_LIMIT, min_score=None):
+        """
+        The documents best matching `query`, the last word of which may be incomplete.
+
+        A document scores the fraction of the query's trigrams it contains (those only found in its body count for
+        1 / `TITLE_WEIGHT`), plus `PREFIX_BONUS` if a word of its title starts with the last word of the query. Ties go
+        to the document with the shorter title.
+
+        :param query: text to search for
+        :param kinds: only return documents of these kinds
+        :param limit: maximum number of results
+        :param min_score: minimum score of the results, defaults to the index's `min_score`
+        :return: list of (score, kind, id, payload) tuples, best first
+        """
+        min_score = self.min_score if min_score is None else min_score
+        words = normalize(query)
+        grams = trigrams(query, prefix=True)
+        if not grams:
+            return []
+        last = words[-1]
+        full = TITLE_WEIGHT * len(grams)
+
+        with self._lock:
+            kinds = self.kinds() if kinds is None else kinds
+            titles, bodies = [], []
+            for kind in kinds:
+                titles.extend(self._titles[kind, _] for _ in grams if (kind, _) in self._titles)
+                bodies.extend(self._bodies[kind, _] for _ in grams if (kind, _) in self._bodies)
+            # the counting is all done in C, a title match counts TITLE_WEIGHT times
+            counts = Counter(chain.from_iterable(titles * TITLE_WEIGHT + bodies))
+
+            # a title word starting with the last word of the query has all of its trigrams in the title, the best of
+            # those documents get the prefix bonus if that's really the case
+            prefixed = set()
+            prefix_grams = _word_trigrams(last, prefix=True)
+            for kind in kinds:
+                postings = [self._titles.get((kind, _)) for _ in prefix_grams]
+                if postings and all(postings):
+                    prefixed.update(set.intersection(*postings))
+            prefixed = heapq.nlargest(limit * CANDIDATES_PER_RESULT, prefixed, key=counts.__getitem__)
+            if len(prefix_grams) > 1:
+                # only a single trigram is sure to be from one word
+                prefixed = [_ for _ in prefixed if any(w.startswith(last) for w in self._docs[_].words)]
+            prefixed = set(prefixed)
+
+            candidates = set(_ for _, count in counts.most_common(limit * CANDIDATES_PER_RESULT)
+                             if count >= min_score * full) | prefixed
+            results = []
+            for doc_id in candidates:
+                score = counts[doc_id] / full + (PREFIX_BONUS if doc_id in prefixed else 0)
+                if score >= min_score:
+                    results.append((score, -len(self._docs[doc_id].title), doc_id))
+            best = heapq.nlargest(limit, results)
+            return [(round(score, 4),) + self._docs[doc_id].key + (self._docs[doc_id].payload,)
+                    for score, _, doc_id in best]
+
+    # the sources
+
+    def index_skus(self, skus, complete=False):
+        """ Index SKU dicts as returned by `PledgeStore.skus`, keyed by title """
+        return self.update('sku', ((_['title'], _['title'], '', _) for _ in skus), complete=complete)
+
+    def index_ships(self, ships, complete=True):
+        """ Index the ships of `ShipMatrixAPI.ships` (a dict of id to ship) by name, manufacturer and description """
+        return self.update('ship', ((id, ship.get('name', ''),
+                                     '{} {}'.format((ship.get('manufacturer') or {}).get('name', ''),
+                                                    ship.get('description') or ''), ship)
+                                    for id, ship in ships.items()), complete=complete)
+
+    def index_roadmap(self, roadmap, complete=False):
+        """ Index the deliverables of a roadmap as returned by `Roadmap.fetch_roadmap` by title and description """
+        def _documents():
+            for team in roadmap:
+                for deliverable in team.get('deliverables') or []:
+                    id = deliverable.get('uuid') or deliverable.get('slug') or deliverable.get('title', '')
+                    payload = dict(deliverable, team=team.get('title', ''))
+                    yield id, deliverable.get('title', ''), deliverable.get('description') or '', payload
+        return self.update('deliverable', _documents(), complete=complete)
+
+    def attach(self, store=None, ships=None, roadmap=None):
+        """
+        Keep the index up to date with the data each API fetches, via their `refresh_listeners`.
+
+        :param store: `PledgeStore` whose SKU listings are indexed, a complete listing replaces the indexed SKUs
+        :param ships: `ShipMatrixAPI` whose ship matrix is indexed every time its cache refreshes or is read from a
+                      shared cache, the ships it has cached already are indexed right away
+        :param roadmap: `Roadmap` whose fetched deliverables are indexed
+        """
+        if store is not None:
+            store.refresh_listeners.append(self.index_skus)
+        if ships is not None:
+            ships.refresh_listeners.append(self.index_ships)
+            self._ship_sources.append(ships)
+        if roadmap is not None:
+            roadmap.refresh_listeners.append(self.index_roadmap)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Index the ships cached by the attached `ShipMatrixAPI`s (e.g. by another process sharing their cache backend)
+        without fetching them, a no-op for those that didn't change since they were last indexed.
+        """
+        for ships in self._ship_sources:
+            ships.cached_ships()
@@ -1,10 +1,19 @@
 import os
+import queue
 import codecs
 import pickle
 import requests
+import threading
 import configparser
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
 
 from rsi.conf import DEFAULT_RSI_URL
+from rsi.utils import RateLimiter
+from rsi.tracing import span
+from rsi.deadline import current_deadline, request_timeout
+from rsi.exceptions import DeadlineExceeded
 
 DEFAULT_SESSION_CONFIG = {
     'name': '',
@@ -12,6 +21,9 @@ DEFAULT_SESSION_CONFIG = {
     'cookies': '',
 }
 
+# seconds a request may take when neither the call nor an active `Deadline` says otherwise
+DEFAULT_REQUEST_TIMEOUT = 30
+
 RSI_SESSION_DURATION = ['session', 'day', 'week', 'month', 'year']
 
 DEFAULT_API_ENDPOINTS = {
@@ -37,10 +49,23 @@ def cli_two_factor_prompt():
 class RSISession(requests.Session):
     def __init__(self, url=DEFAULT_RSI_URL, persist_session=True, session_file='.pyrsi_session', clear_session=False,
                  allow_two_factor=True, two_factor_prompt=cli_two_factor_prompt, two_factor_duration='session',
-                 username=None, password=None, **kwargs):
+                 username=None, password=None, rate_limit=None, parse_cache=None,
+                 timeout=DEFAULT_REQUEST_TIMEOUT, operation_timeout=None, **kwargs):
         super(RSISession, self).__init__()
 
+        # optional number of requests per second allowed through this session
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        # optional `ParseCache` shared by every API using this session to skip parsing unchanged responses
+        self.parse_cache = parse_cache
+        # default timeout of every request, shortened to the time left of the active `rsi.deadline.Deadline`
+        self.timeout = timeout
+        # default time budget in seconds of the operations taking a `deadline` (`OrgAPI.iter_members`, the ship
+        # matrix refresh, `fetch_citizen`, ...) run with this session outside of any `Deadline`
+        self.operation_timeout = operation_timeout
+
         self.hooks['response'].append(self._update_rsi_token)
+        # ask for every compression urllib3 can decode here (brotli/zstd when installed)
+        self.headers['Accept-Encoding'] = ACCEPT_ENCODING
         self.url = url.rstrip('/')
 
         def _kwargs_or_default(key):
@@ -73,6 +98,20 @@ class RSISession(requests.Session):
         if username is not None and password is not None:
             self.authenticate(username, password)
 
+    def request(self, method, url, *args, **kwargs):
+        if self.rate_limiter is not None:
+            with span('rate_limit'):
+                self.rate_limiter.wait()
+        kwargs['timeout'] = request_timeout(kwargs.get('timeout', self.timeout))
+        with span('http', method=method, url=url):
+            try:
+                return super(RSISession, self).request(method, url, *args, **kwargs)
+            except requests.Timeout as e:
+                deadline = current_deadline()
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded() from e
+                raise
+
     def _load_session(self):
         self._config.read(self.session_file)
         cookies = self._config.get('RSI', 'cookies', fallback='')
@@ -105,7 +144,7 @@ class RSISession(requests.Session):
         # called on the response hook and will update the session id from the cookie
         if self.session_name in response.cookies:
             if response.cookies[self.session_name] != self.session_id:
-                self._update_session(self.session_name, self.session_id)
+                self._update_session(self.session_name, response.cookies[self.session_name])
 
     def query_api(self, api, json=None):
         resp = self.post(api, json=json)
@@ -166,3 +205,137 @@ class RSISession(requests.Session):
         self._update_session(info['data']['session_name'], info['data']['session_id'])
 
         return True
+
+
+class PooledRSISession(RSISession):
+    """ An `RSISession` handed out by an `RSISessionPool`, sharing its auth state with every other session of the pool.
+
+    Token updates are forwarded to the pool and picked up by every session right before its next request.
+    """
+
+    def __init__(self, pool):
+        requests.Session.__init__(self)
+        source = pool.source
+        for attr in ('url', '_login_api', '_login_two_factor_api', '_session_check_api', '_signout_api',
+                     '_set_auth_token', '_allow_two_factor', 'two_factor_prompt', 'two_factor_duration',
+                     'session_file', 'persist_session', 'rate_limiter', 'parse_cache', 'timeout',
+                     'operation_timeout'):
+            setattr(self, attr, getattr(source, attr))
+        self._config = source._config
+        self._pool = pool
+        self._synced_version = None
+        self._token_headers = {}
+        self.session_name = self.session_id = ''
+
+        self.headers.update(source.headers)
+        self.cookies = source.cookies   # the cookie jar locks internally and is shared by the whole pool
+        self.mount('https://', pool.adapter)
+        self.mount('http://', pool.adapter)
+        self.hooks['response'].append(self._update_rsi_token)
+        self._sync()
+
+    def _sync(self):
+        version, name, id, token_headers = self._pool.auth_state()
+        if version == self._synced_version:
+            return
+        for header in self._token_headers:
+            self.headers.pop(header, None)
+        self.headers.update(token_headers)
+        self._token_headers = token_headers
+        self.session_name, self.session_id = name, id
+        self._synced_version = version
+
+    def request(self, method, url, *args, **kwargs):
+        self._sync()
+        return super(PooledRSISession, self).request(method, url, *args, **kwargs)
+
+    def _load_session(self):
+        self._sync()
+
+    def _update_session(self, name, id, save=True):
+        self._pool.update_session(name, id, save=save)
+        self._sync()
+
+    def close(self):
+        # the connection pools belong to the RSISessionPool, leave them open for the other sessions
+        pass
+
+
+class RSISessionPool(object):
+    def __init__(self, size=10, session=None, pool_connections=10, pool_block=False, **kwargs):
+        """ A pool of `RSISession` clones that can be used from multiple threads.
+
+        Every session handed out shares the cookies, auth token and urllib3 connection pools of the pool, so requests
+        made from any thread reuse the same connections and authentication. Check a session out with `session()`
+        and only use it from one thread at a time.
+
+        :argument size Maximum number of sessions handed out at once, also the connection pool size per host
+        :argument session `RSISession` to take the auth state and settings from, one is created with `kwargs` if
+                          not given. Do not use it directly once pooled.
+        :argument pool_connections Number of hosts to keep connection pools for
+        :argument pool_block Block when all connections to a host are in use instead of opening extra ones
+        """
+        self.size = size
+        self.source = session or RSISession(**kwargs)
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=size, pool_block=pool_block)
+        self.source.mount('https://', self.adapter)
+        self.source.mount('http://', self.adapter)
+
+        self._lock = threading.RLock()
+        # serializes logins, only ever taken with a session checked out and never together with `_lock`
+        self._login_lock = threading.Lock()
+        self._version = 0
+        self._idle = queue.LifoQueue()
+        self._created = 0
+
+    def auth_state(self):
+        """ Returns (version, session name, session id, token headers) of the shared auth state """
+        with self._lock:
+            name, id = self.source.session_name, self.source.session_id
+            headers = {'X-{}'.format(name): id} if id else {}
+            return self._version, name, id, headers
+
+    def update_session(self, name, id, save=True):
+        """ Atomically update the auth token shared by every session of the pool """
+        with self._lock:
+            self.source._update_session(name, id, save=save)
+            self._version += 1
+
+    def acquire(self, timeout=None):
+        """ Check out a session, blocking up to `timeout` seconds when `size` sessions are already checked out """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return PooledRSISession(self)
+        return self._idle.get(timeout=timeout)
+
+    def release(self, session):
+        """ Return a session checked out with `acquire` to the pool """
+        self._idle.put(session)
+
+    @contextmanager
+    def session(self, timeout=None):
+        """ Context manager checking out a session for the duration of the block """
+        s = self.acquire(timeout=timeout)
+        try:
+            yield s
+        finally:
+            self.release(s)
+
+    @property
+    def is_authenticated(self):
+        with self.session() as s:
+            return s.is_authenticated
+
+    def authenticate(self, username, password, force=False):
+        # the login runs without `_lock`, which sessions in use need to sync and update the token, only the token
+        # update at the end takes it (in `update_session`)
+        with self.session() as s, self._login_lock:
+            return s.authenticate(username, password, force=force)
+
+    def close(self):
+        self.adapter.close()
@@ -1,13 +1,19 @@
 import re
+import json
 import time
 from collections import defaultdict
 from fuzzywuzzy import process
-from cachetools import TTLCache
 from bs4 import BeautifulSoup
 from rsi.conf import DEFAULT_RSI_URL
 from rsi.session import RSISession
 from rsi.pledge_store import PledgeStore
-from rsi.exceptions import RSIException
+from rsi.exceptions import RSIException, DeadlineExceeded
+from rsi.utils import class_strainer, notify_listeners
+from rsi.tracing import span, traced
+from rsi.jsonstream import iter_json_array, DEFAULT_CHUNK_SIZE
+from rsi.parse_cache import cached_parse
+from rsi.cache import make_cache, get_or_update
+from rsi.deadline import with_deadline, check_deadline
 
 DEFAULT_SHIPMATRIX_ENDPOINT = '/ship-matrix/index'
 DEFAULT_LOANER_MATRIX_URL = 'https://support.robertsspaceindustries.com/hc/en-us/articles/360003093114-Loaner-Ship-Matrix'
@@ -15,16 +21,54 @@ SHIP_MODEL_RE = re.compile(r"model_3d:\s*'(\S+)'")
 DEFAULT_CACHE_TTL = 300
 SHIP_UPGRADE_URL = 'https://robertsspaceindustries.com/pledge/ship-upgrades'
 SHIP_UPGRADE_RE = re.compile(r'fromShips: (\[.*\]), toShips')
+LOANER_STRAINER = class_strainer('article-body')
+
+# a projection with just the commonly used summary fields of every ship, for use with `fields`
+SHIP_SUMMARY_FIELDS = ('id', 'name', 'url', 'size', 'focus', 'type', 'production_status', 'manufacturer', 'length',
+                       'beam', 'height', 'mass', 'cargo_capacity', 'min_crew', 'max_crew', 'scm_speed',
+                       'afterburner_speed')
+# fields that are always kept regardless of the projection as the cache depends on them
+SHIP_REQUIRED_FIELDS = ('id', 'name', 'url')
+
+
+def process_ship(ship, rsi_url=DEFAULT_RSI_URL, fields=None):
+    """ Normalize a ship from the ship matrix API, keeping only `fields` (plus the required ones) if given """
+    # rename cargo capacity to be in line with other vars
+    if 'cargocapacity' in ship:
+        ship['cargo_capacity'] = ship.pop('cargocapacity')
+
+    if fields is not None:
+        ship = {k: v for k, v in ship.items() if k in fields}
+
+    ship['url'] = f'{rsi_url}{ship["url"]}'
+    if ship.get('media'):
+        ship['media'][0]['source_url'] = f'{rsi_url}{ship["media"][0]["source_url"]}'
+        for _ in ship['media'][0]['images']:
+            ship['media'][0]['images'][_] = f'{rsi_url}{ship["media"][0]["images"][_]}'
+    return ship
+
+
+def parse_ships(content, rsi_url=DEFAULT_RSI_URL, fields=None):
+    """ Parse the raw body of a ship matrix API response into a dict of ship id to ship """
+    with span('json_decode'):
+        data = json.loads(content)
+    if data['msg'] != 'OK':
+        raise RSIException(repr(data))
+    return {int(_['id']): process_ship(_, rsi_url, fields) for _ in data['data']}
 
 
 class ShipMatrixAPI(object):
     def __init__(self, session=None, rsi_url=DEFAULT_RSI_URL, api_endpoint=DEFAULT_SHIPMATRIX_ENDPOINT, cache_ttl=300,
                  enable_pledges=True, enable_ship_models=True,
-                 loaner_ship_url=DEFAULT_LOANER_MATRIX_URL):
+                 loaner_ship_url=DEFAULT_LOANER_MATRIX_URL, fields=None, stream_decode=True, cache_backend=None):
         """ Queries information from the RSI Ship Matrix.
 
         :argument api_endpoint The URL to use to connect to the ship matrix API
         :argument cache_ttl How long to cache the results of the API before re-querying
+        :argument fields Iterable of the ship fields to keep (e.g. `SHIP_SUMMARY_FIELDS`), None keeps everything
+        :argument stream_decode Decode the ship matrix one ship at a time while it downloads instead of all at once,
+                                ignored when the session has a parse cache
+        :argument cache_backend Optional `CacheBackend` to share the cached ships and loaners with other processes
         """
         self.session = session or RSISession()
         self.rsi_url = rsi_url.rstrip('/')
@@ -32,26 +76,38 @@ class ShipMatrixAPI(object):
         self._enable_pledges = enable_pledges
         self._enable_ship_models = enable_ship_models
         self._loaner_ship_url = loaner_ship_url
-        self._ttlcache = TTLCache(maxsize=3, ttl=cache_ttl)
+        self._fields = None if fields is None else frozenset(fields).union(SHIP_REQUIRED_FIELDS)
+        self._stream_decode = stream_decode
+        namespace = 'shipmatrix:{}:{}:{}:{}'.format(self.api_endpoint, int(enable_pledges), int(enable_ship_models),
+                                                    ','.join(sorted(self._fields or ())))
+        self._ttlcache = make_cache(cache_backend, namespace, maxsize=3, ttl=cache_ttl)
+        # callables given the ships dict every time it is refreshed or read anew from a shared cache, e.g.
+        # `SearchIndex.index_ships`
+        self.refresh_listeners = []
+        self._notified_ships = None
 
     def clear_cache(self):
         """ Resets the cache """
-        del self._ttlcache['ships_by_name']
-        del self._ttlcache['ships']
-        del self._ttlcache['loaners']
+        for key in ('ships_by_name', 'ships', 'loaners'):
+            self._ttlcache.pop(key, None)
+        # the listeners get the next ships read, even if another process cached the same dict meanwhile
+        self._notified_ships = None
 
     def _fuzzy_choices(self):
         return {k: v['name'] for k, v in self.ships.items()}
 
+    @traced('loaners')
+    @with_deadline
     def _update_loaner_cache(self):
         p = self.session.get(self._loaner_ship_url)
         p.raise_for_status()
 
         def _lookup_by_name(name):
-            return process.extractBests(name, self._fuzzy_choices(), score_cutoff=80)
+            with span('fuzzy_match'):
+                return process.extractBests(name, self._fuzzy_choices(), score_cutoff=80)
 
         loaners = defaultdict(set)
-        soup = BeautifulSoup(p.text, features='html.parser')
+        soup = BeautifulSoup(p.text, features='html.parser', parse_only=LOANER_STRAINER)
         for row in soup.select('.article-body table tbody tr'):
             your_ship, our_loaners = [_.text for _ in row.select('td')]
             our_loaners = [_.strip() for _ in our_loaners.split(',')]
@@ -80,51 +136,81 @@ class ShipMatrixAPI(object):
                 else:
                     for ship in ships:
                         loaners[ship].update([_[0] for _ in _lookup_by_name(loaner)])
-        self._ttlcache['loaners'] = {k: list(v) for k, v in loaners.items()}
-
+        return {k: list(v) for k, v in loaners.items()}
+
+    def _process_ship(self, ship):
+        return process_ship(ship, self.rsi_url, self._fields)
+
+    @traced('fetch_ships')
+    def _fetch_ships(self):
+        if not self._stream_decode or getattr(self.session, 'parse_cache', None) is not None:
+            # the parse cache needs the whole body to hash, which also makes streaming pointless
+            resp = self.session.get(self.api_endpoint)
+            resp.raise_for_status()
+            return cached_parse(self.session, self.api_endpoint, resp.content, parse_ships, self.rsi_url,
+                                self._fields)
+
+        meta = {}
+        with self.session.get(self.api_endpoint, stream=True) as resp:
+            resp.raise_for_status()
+            data = {}
+            for ship in iter_json_array(resp.iter_content(DEFAULT_CHUNK_SIZE), 'data', meta=meta):
+                ship = self._process_ship(ship)
+                data[int(ship['id'])] = ship
+        if meta.get('msg') != 'OK':
+            raise RSIException(repr(meta))
+        return data
+
+    @traced('ship_matrix')
+    @with_deadline
     def _update_ship_cache(self):
-        resp = self.session.get(self.api_endpoint)
-        resp.raise_for_status()
-        data = resp.json()
-        if data['msg'] != 'OK':
-            raise RSIException(repr(data))
-        data = data['data']
-        data = {int(_['id']): _ for _ in data}
+        data = self._fetch_ships()
 
         pledge_map = {}
         if self._enable_pledges:
-            pledges = PledgeStore(session=self.session)
-            pledge_map = pledges.ship_upgrades()
+            with span('pledges'):
+                pledges = PledgeStore(session=self.session, rsi_url=self.rsi_url)
+                pledge_map = pledges.ship_upgrades()
 
         for ship_id in data.keys():
-            # rename cargo capacity to be in line with other vars
-            if 'cargocapacity' in data[ship_id]:
-                data[ship_id]['cargo_capacity'] = data[ship_id].pop('cargocapacity')
-
             data[ship_id]['pledge_cost'] = pledge_map.get(ship_id, {}).get('msrp', '')
-            data[ship_id]['url'] = f'{self.rsi_url}{data[ship_id]["url"]}'
-            if data[ship_id]['media']:
-                data[ship_id]['media'][0]['source_url'] = f'{self.rsi_url}{data[ship_id]["media"][0]["source_url"]}'
-                for _ in data[ship_id]['media'][0]['images']:
-                    data[ship_id]['media'][0]['images'][_] = f'{self.rsi_url}{data[ship_id]["media"][0]["images"][_]}'
 
             if self._enable_ship_models:
                 try:
-                    p = self.session.get(data[ship_id]['url'])
-                    if p.status_code == 200:
-                        m = SHIP_MODEL_RE.search(p.text)
-                        data[ship_id]['model_3d'] = m.group(1) if m else ''
+                    check_deadline()
+                    with span('ship_model', ship_id=ship_id):
+                        p = self.session.get(data[ship_id]['url'])
+                        if p.status_code == 200:
+                            m = SHIP_MODEL_RE.search(p.text)
+                            data[ship_id]['model_3d'] = m.group(1) if m else ''
+                except DeadlineExceeded as e:
+                    # hand out what was fetched without caching it, the next access starts over
+                    e.partial = data
+                    raise
                 except Exception as e:
                     print(f'WARNING: could not lookup ship model for {ship_id} ({data[ship_id]["name"]})')
-        self._ttlcache['ships'] = data
-        self._ttlcache['ships_by_name'] = {v['name']: v for k, v in data.items()}
+        return data
+
+    def _notify(self, data):
+        # listeners run for every new ships dict, including those another process scraped into a shared cache
+        if data is not self._notified_ships:
+            self._notified_ships = data
+            notify_listeners(self.refresh_listeners, data)
+        return data
 
     def _from_cache(self, item):
-        if item == 'loaners' and 'loaners' not in self._ttlcache:
-            self._update_loaner_cache()
-        elif 'ships' not in self._ttlcache:
-            self._update_ship_cache()
-        return self._ttlcache[item]
+        # each entry can expire on its own in a shared cache, so the one read is the one checked
+        if item == 'loaners':
+            return get_or_update(self._ttlcache, 'loaners', self._update_loaner_cache)
+        if item == 'ships_by_name':
+            return get_or_update(self._ttlcache, 'ships_by_name',
+                                 lambda: {v['name']: v for v in self._from_cache('ships').values()})
+        return self._notify(get_or_update(self._ttlcache, 'ships', self._update_ship_cache))
+
+    def cached_ships(self):
+        """ The ships if they are cached (locally or in the shared cache), None instead of fetching them """
+        data = self._ttlcache.get('ships')
+        return None if data is None else self._notify(data)
 
     @property
     def loaners(self):
@@ -160,7 +246,6 @@ class ShipMatrixAPI(object):
 
 
 if __name__ == "__main__":
-    import json
     s = ShipMatrixAPI(enable_ship_models=False)
     print(len(s.ships))
     # print(json.dumps(s.ships, indent=4))
@@ -0,0 +1,168 @@
+import time
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_SKU_HISTORY_FILE = '.pyrsi_sku_history.db'
+SKU_TRACKED_FIELDS = ('price', 'price_str', 'stock')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sku_state (
+    title TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    price REAL,
+    stock TEXT,
+    changed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sku_observations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    product_id TEXT NOT NULL DEFAULT '',
+    observed_at REAL NOT NULL,
+    price REAL,
+    price_str TEXT,
+    stock TEXT,
+    prev_price REAL,
+    prev_stock TEXT,
+    image TEXT,
+    link TEXT
+);
+CREATE INDEX IF NOT EXISTS sku_observations_title ON sku_observations (title, observed_at);
+CREATE INDEX IF NOT EXISTS sku_observations_product ON sku_observations (product_id, observed_at);
+CREATE INDEX IF NOT EXISTS sku_observations_time ON sku_observations (observed_at);
+"""
+
+
+def _to_price(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def sku_hash(sku):
+    """ Hash of the fields of a SKU that are tracked for changes """
+    h = hashlib.blake2b(digest_size=16)
+    for field in SKU_TRACKED_FIELDS:
+        h.update(str(sku.get(field, '')).encode())
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+class SKUHistory(object):
+    def __init__(self, path=DEFAULT_SKU_HISTORY_FILE):
+        """ Local SQLite backed history of pledge store SKU prices and stock.
+
+        An observation is only stored when the price, price string or stock of a SKU differs from the last one
+        recorded for it, which is decided by comparing against the hash kept for every known title.
+
+        :argument path Path to the SQLite database, use ':memory:' for a throwaway store
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        self._state = {row['title']: (row['hash'], row['price'], row['stock'])
+                       for row in self._db.execute('SELECT title, hash, price, stock FROM sku_state')}
+
+    def close(self):
+        self._db.close()
+
+    def record(self, skus, product_id='', observed_at=None):
+        """
+        Record an iterable of SKU dicts (as returned by `PledgeStore.skus`), storing only the changed ones.
+
+        :param skus: iterable of SKU dicts, or of (title, dict) tuples
+        :param product_id: product id the SKUs were queried with
+        :param observed_at: timestamp of the observation, defaults to now
+        :return: list of the SKU dicts that changed since their last observation
+        """
+        observed_at = time.time() if observed_at is None else observed_at
+        changed, observations = [], []
+        with self._lock:
+            for sku in skus:
+                if isinstance(sku, tuple):
+                    sku = sku[1]
+                title = sku['title']
+                digest = sku_hash(sku)
+                previous = self._state.get(title)
+                if previous is not None and previous[0] == digest:
+                    continue
+
+                price = _to_price(sku.get('price'))
+                prev_price, prev_stock = (previous[1], previous[2]) if previous is not None else (None, None)
+                self._state[title] = (digest, price, sku.get('stock', ''))
+                changed.append(sku)
+                observations.append((title, str(product_id), observed_at, price, sku.get('price_str', ''),
+                                     sku.get('stock', ''), prev_price, prev_stock, sku.get('image', ''),
+                                     sku.get('link', '')))
+
+            with self._db:
+                self._db.executemany(
+                    'INSERT INTO sku_observations (title, product_id, observed_at, price, price_str, stock, '
+                    'prev_price, prev_stock, image, link) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', observations)
+                self._db.executemany(
+                    'INSERT INTO sku_state (title, hash, price, stock, changed_at) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT(title) DO UPDATE SET hash=excluded.hash, price=excluded.price, '
+                    'stock=excluded.stock, changed_at=excluded.changed_at',
+                    [(_[0],) + self._state[_[0]] + (observed_at,) for _ in observations])
+        return changed
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(_) for _ in self._db.execute(sql, params)]
+
+    def price_history(self, title, since=None):
+        """
+        All recorded observations of the given SKU title, oldest first.
+
+        :param title: exact SKU title
+        :param since: only return observations made after this timestamp
+        """
+        return self._query('SELECT * FROM sku_observations WHERE title = ? AND observed_at >= ? ORDER BY observed_at',
+                           (title, since or 0))
+
+    def stock_changes(self, within=3600, product_id=None):
+        """
+        SKUs whose stock changed in the last `within` seconds.
+
+        :param within: number of seconds to look back
+        :param product_id: restrict to SKUs observed with the given product id
+        """
+        sql = ('SELECT * FROM sku_observations WHERE observed_at >= ? AND prev_stock IS NOT NULL '
+               'AND prev_stock != stock')
+        params = [time.time() - within]
+        if product_id is not None:
+            sql += ' AND product_id = ?'
+            params.append(str(product_id))
+        return self._query(sql + ' ORDER BY observed_at', params)
+
+    def price_changes(self, within=3600, product_id=None):
+        """
+        SKUs whose price changed in the last `within` seconds.
+
+        :param within: number of seconds to look back
+        :param product_id: restrict to SKUs observed with the given product id
+        """
+        sql = ('SELECT * FROM sku_observations WHERE observed_at >= ? AND prev_price IS NOT NULL '
+               'AND prev_price != price')
+        params = [time.time() - within]
+        if product_id is not None:
+            sql += ' AND product_id = ?'
+            params.append(str(product_id))
+        return self._query(sql + ' ORDER BY observed_at', params)
+
+    def lowest_price(self, title):
+        """
+        The observation with the lowest price ever recorded for the given SKU title, or None.
+
+        :param title: exact SKU title
+        """
+        rows = self._query('SELECT * FROM sku_observations WHERE title = ? AND price IS NOT NULL '
+                           'ORDER BY price, observed_at LIMIT 1', (title,))
+        return rows[0] if rows else None
+
+    def titles(self):
+        """ All SKU titles that have been observed """
+        return sorted(self._state)
@@ -0,0 +1,402 @@
+"""
+A local stand-in for the RSI site serving synthetic but structurally realistic responses, for load testing and
+development without touching the real site.
+
+Point the API classes at `StandinServer.url` (and `status_url` for `Status`)::
+
+    with StandinServer(roster_size=5000, latency=0.05, throttle_rate=0.01) as server:
+        org = OrgAPI('STANDIN', url=server.url, session=RSISession(url=server.url, persist_session=False))
+"""
+import json
+import time
+import random
+import threading
+import zlib
+from datetime import date, timedelta
+from html import escape
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RANKS = ('Recruit', 'Member', 'Senior Member', 'Officer', 'Director', 'Founder')
+ROLES = ('Pilot', 'Engineer', 'Medic', 'Marine', 'Trader', 'Explorer', 'Recruiter')
+DISCIPLINES = ('Engineering', 'Art', 'Design', 'QA', 'Audio', 'Tech Art')
+FOCUSES = ('Combat', 'Exploration', 'Trading', 'Mining', 'Transport', 'Medical')
+
+
+def _rng(*seed):
+    return random.Random(zlib.crc32(repr(seed).encode()))
+
+
+class StandinServer(object):
+    def __init__(self, host='127.0.0.1', port=0, roster_size=1000, page_size=32, hidden_ratio=0.1, ship_count=200,
+                 sku_count=300, sku_page_size=20, deliverable_count=100, latency=0.0, latency_jitter=0.0,
+                 error_rate=0.0, throttle_rate=0.0, missing_prefix='missing', seed=0):
+        """ Threaded HTTP server mimicking the RSI endpoints the API classes use.
+
+        :argument roster_size Number of members of every org
+        :argument page_size Members returned per getOrgMembers page
+        :argument hidden_ratio Fraction of members whose membership is hidden
+        :argument latency Seconds added to every response, plus up to `latency_jitter` more
+        :argument error_rate Fraction of requests answered with a 500
+        :argument throttle_rate Fraction of requests answered with a 429
+        :argument missing_prefix Citizens and orgs starting with this are answered with a 404
+        """
+        self.roster_size = roster_size
+        self.page_size = page_size
+        self.hidden_ratio = hidden_ratio
+        self.ship_count = ship_count
+        self.sku_count = sku_count
+        self.sku_page_size = sku_page_size
+        self.deliverable_count = deliverable_count
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.missing_prefix = missing_prefix
+        self.seed = seed
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._faults = random.Random(seed)
+        self._rosters = {}
+
+        handler = type('StandinHandler', (_Handler,), {'standin': self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    @property
+    def status_url(self):
+        return '{}/status'.format(self.url)
+
+    @property
+    def loaner_url(self):
+        return '{}/loaners'.format(self.url)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def fault(self):
+        """ Returns the status code of an injected fault for the next request, or None """
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._faults.random() * self.latency_jitter
+            roll = self._faults.random()
+        if delay:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+    # synthetic data
+
+    def roster(self, symbol):
+        symbol = symbol.upper()
+        if symbol not in self._rosters:
+            rng = _rng(self.seed, 'roster', symbol)
+            self._rosters[symbol] = [{
+                'id': str(100000 + i),
+                'name': 'Citizen {} {}'.format(symbol.title(), i),
+                'handle': '{}_{}'.format(symbol.lower(), i),
+                'rank': RANKS[min(len(RANKS) - 1, int(rng.expovariate(1.2)))],
+                'roles': rng.sample(ROLES, rng.randint(0, 3)),
+                'affiliate': rng.random() < 0.2,
+                'hidden': rng.random() < self.hidden_ratio,
+                'last_online': rng.choice(('less than an hour ago', '{} hours ago'.format(rng.randint(2, 23)),
+                                           '{} days ago'.format(rng.randint(2, 30)),
+                                           '{} months ago'.format(rng.randint(2, 11)))),
+            } for i in range(self.roster_size)]
+        return self._rosters[symbol]
+
+    def member_html(self, member, admin_mode):
+        if member['hidden']:
+            return ('<li class="member-item js-member-item"><span class="member-visibility-restriction">'
+                    'This member has chosen to hide their membership</span></li>')
+        frontinfo = ''
+        if admin_mode:
+            frontinfo = ('<div class="frontinfo"><span class="lastonline">{}</span>'
+                         '<span class="visibility">Membership: Visible</span></div>').format(member['last_online'])
+        return (
+            '<li class="member-item js-member-item" data-member-id="{id}">'
+            '<a class="membercard js-edit-member" href="/citizens/{handle}">'
+            '<span class="thumb"><img src="/media/avatars/{id}.jpg"></span>'
+            '<span class="right"><span class="name-wrap"><span class="name">{name}</span>'
+            '<span class="nick">{handle}</span></span>'
+            '<span class="title">{title}</span><span class="ranking-stars"></span>'
+            '<span class="rank">{rank}</span>'
+            '<ul class="rolelist">{roles}</ul></span></a>{frontinfo}</li>'
+        ).format(id=member['id'], handle=escape(member['handle']), name=escape(member['name']),
+                 title='Affiliate' if member['affiliate'] else 'Member', rank=member['rank'],
+                 roles=''.join('<li class="role">{}</li>'.format(_) for _ in member['roles']), frontinfo=frontinfo)
+
+    def org_members(self, params):
+        roster = self.roster(params.get('symbol', ''))
+        search = params.get('search', '').lower()
+        if search:
+            roster = [_ for _ in roster if search in _['handle'].lower()]
+        page = int(params.get('page', 1))
+        rows = roster[(page - 1) * self.page_size:page * self.page_size]
+        html = ''.join(self.member_html(_, bool(params.get('admin_mode'))) for _ in rows)
+        return {'success': 1, 'code': 'OK', 'msg': 'OK',
+                'data': {'totalrows': len(roster), 'html': html}}
+
+    def org_page(self, symbol):
+        rng = _rng(self.seed, 'org', symbol)
+        return (
+            '<html><head><title>{symbol}</title></head><body><div id="organization">'
+            '<div class="banner"><img src="/media/banners/{symbol}.jpg"></div>'
+            '<div class="inner clearfix"><div class="logo"><img src="/media/logos/{symbol}.png"></div>'
+            '<h1>{name} / <span class="symbol">{symbol}</span></h1>'
+            '<ul class="tags"><li class="model">Organization</li><li class="commitment">Regular</li></ul>'
+            '<ul class="focus"><li class="primary"><img alt="{primary}"></li>'
+            '<li class="secondary"><img alt="{secondary}"></li></ul></div>'
+            '<div class="join-us"><div class="body">\n  Join the {name} today!\n</div></div>'
+            '<div class="filler">{filler}</div></div></body></html>'
+        ).format(symbol=symbol, name='Standin {}'.format(symbol.title()), primary=rng.choice(FOCUSES),
+                 secondary=rng.choice(FOCUSES), filler='<p>lorem ipsum</p>' * 200)
+
+    def citizen_page(self, handle):
+        rng = _rng(self.seed, 'citizen', handle)
+        return (
+            '<html><body><div id="public-profile"><div class="profile-content overview-tab clearfix">'
+            '<div class="box-content profile-wrapper"><div class="inner-bg">'
+            '<div class="profile left-col"><div class="inner clearfix">'
+            '<div class="thumb"><img src="/media/avatars/{handle}.jpg"></div>'
+            '<div class="info"><p class="entry"><strong class="value">{name}</strong></p>'
+            '<p class="entry"><span class="label">Handle name</span><strong class="value">{handle}</strong></p>'
+            '<p class="entry"><span class="icon"><img src="media/titles/civilian.png"></span>'
+            '<span class="value">Civilian</span></p></div></div></div>'
+            '<p class="citizen-record"><span class="label">UEE Citizen Record</span>'
+            '<strong class="value">#{record}</strong></p></div></div>'
+            '<div class="left-col"><div class="inner">'
+            '<p class="entry"><span class="label">Enlisted</span><strong class="value">Jan 1, 2015</strong></p>'
+            '<p class="entry"><span class="label">Location</span><strong class="value">Stanton ,\n  Hurston'
+            '</strong></p>'
+            '<p class="entry"><span class="label">Fluency</span><strong class="value">English, German</strong></p>'
+            '</div></div>'
+            '<div class="right-col"><div class="bio"><span class="label">Bio</span><div class="value">'
+            'Synthetic citizen {handle}</div></div></div></div></div>{filler}</body></html>'
+        ).format(handle=escape(handle), name='Name of {}'.format(escape(handle)), record=rng.randint(1, 4000000),
+                 filler='<div class="nav"><a href="/">link</a></div>' * 200)
+
+    def citizen_orgs_page(self, handle):
+        rng = _rng(self.seed, 'citizen-orgs', handle)
+        memberships = [('ORG{}'.format(rng.randint(1, 50)), rng.choice(RANKS)) for _ in range(rng.randint(0, 4))]
+        # handles from a roster ('org7_12') are in that org first, so roster and citizen lookups agree
+        symbol, _, position = handle.rpartition('_')
+        if symbol and position.isdigit() and int(position) < self.roster_size:
+            symbol = symbol.upper()
+            memberships = ([(symbol, self.roster(symbol)[int(position)]['rank'])] +
+                           [_ for _ in memberships if _[0] != symbol])
+        orgs = ''
+        for i, (symbol, rank) in enumerate(memberships):
+            orgs += (
+                '<div class="box-content org {kind}"><div class="inner-bg"><div class="thumb">'
+                '<img src="/media/logos/{symbol}.png"></div><div class="info">'
+                '<p class="entry"><a class="value" href="/orgs/{symbol}">Standin {title}</a></p>'
+                '<p class="entry"><span class="label">Spectrum Identification (SID)</span>'
+                '<strong class="value">{symbol}</strong></p>'
+                '<p class="entry"><span class="label">Organization rank</span><strong class="value">{rank}</strong>'
+                '</p></div></div></div>'
+            ).format(kind='main' if i == 0 else 'affiliation', symbol=symbol, title=symbol.title(), rank=rank)
+        return '<html><body><div class="orgs-content">{}</div></body></html>'.format(orgs)
+
+    def ships(self):
+        rng = _rng(self.seed, 'ships')
+        ships = []
+        for i in range(1, self.ship_count + 1):
+            name = 'Standin {}'.format(i)
+            ships.append({
+                'id': str(i),
+                'name': name,
+                'url': '/pledge/ships/standin/{}'.format(i),
+                'size': rng.choice(('small', 'medium', 'large', 'capital')),
+                'focus': rng.choice(FOCUSES),
+                'type': rng.choice(('combat', 'exploration', 'industrial', 'transport')),
+                'production_status': rng.choice(('flight-ready', 'in-concept')),
+                'manufacturer': {'id': str(rng.randint(1, 20)), 'code': 'STD', 'name': 'Standin Manufacturing'},
+                'length': str(rng.randint(10, 200)), 'beam': str(rng.randint(5, 80)),
+                'height': str(rng.randint(3, 40)), 'mass': str(rng.randint(10000, 5000000)),
+                'cargocapacity': str(rng.randint(0, 700)), 'min_crew': '1', 'max_crew': str(rng.randint(1, 12)),
+                'scm_speed': str(rng.randint(100, 250)), 'afterburner_speed': str(rng.randint(900, 1300)),
+                'description': 'The {} is a synthetic ship. '.format(name) * 5,
+                'media': [{'source_url': '/media/ships/{}/source.jpg'.format(i),
+                           'images': {size: '/media/ships/{}/{}.jpg'.format(i, size)
+                                      for size in ('store_small', 'store_large', 'slideshow', 'banner')}}],
+                'compiled': {'RSIWeapon': {'weapons': [{'name': 'Gun', 'size': str(rng.randint(1, 5)),
+                                                        'mounts': '1'} for _ in range(rng.randint(1, 8))]}},
+            })
+        return ships
+
+    def skus(self, params):
+        rng = _rng(self.seed, 'skus')
+        items = [(('Standin Ship {}'.format(i)), rng.randint(20, 600) * 100,
+                  rng.choice(('Available', 'Limited', 'Out of stock'))) for i in range(self.sku_count)]
+        page = int(params.get('page', 1))
+        rows = items[(page - 1) * self.sku_page_size:page * self.sku_page_size]
+        html = ''.join(
+            '<div class="product-item js-ecommerce-tracking-sku"><a class="more" href="/pledge/ships/{i}"></a>'
+            '<img src="/media/skus/{i}.jpg"><p class="title">{title}</p>'
+            '<span class="final-price" data-value="{price}">${dollars:.2f} USD</span>'
+            '<span class="state">{stock}</span></div>'.format(i=title.split()[-1], title=title, price=price,
+                                                                 dollars=price / 100, stock=stock)
+            for title, price, stock in rows)
+        return {'success': 1, 'code': 'OK', 'data': {'rowcount': len(rows), 'totalrows': len(items), 'html': html}}
+
+    def ship_upgrades(self):
+        rng = _rng(self.seed, 'upgrades')
+        ships = []
+        for ship in self.ships():
+            msrp = rng.randint(20, 600) * 100
+            ships.append({'id': int(ship['id']), 'name': ship['name'], 'msrp': msrp, 'focus': ship['focus'],
+                          'skus': [{'id': int(ship['id']) * 10, 'title': ship['name'], 'available': True,
+                                    'price': msrp if rng.random() > 0.1 else msrp - 500, 'body': ''}]})
+        return [{'data': {'ships': ships}}]
+
+    def roadmap(self):
+        rng = _rng(self.seed, 'roadmap')
+        start = date.today() - timedelta(days=90)
+        teams = []
+        for t in range(max(1, self.deliverable_count // 10)):
+            deliverables = []
+            for d in range(10):
+                d_start = start + timedelta(days=rng.randint(0, 180))
+                d_end = d_start + timedelta(days=rng.randint(14, 120))
+                allocations = []
+                for _ in range(rng.randint(1, 4)):
+                    a_start = d_start + timedelta(days=rng.randint(0, 10))
+                    allocations.append({'startDate': a_start.isoformat(),
+                                        'endDate': (a_start + timedelta(days=rng.randint(7, 60))).isoformat(),
+                                        'discipline': {'title': rng.choice(DISCIPLINES), 'color': '#ffffff',
+                                                       'countMembers': rng.randint(1, 6)}})
+                deliverables.append({'title': 'Deliverable {}-{}'.format(t, d),
+                                     'description': 'Synthetic deliverable', 'startDate': d_start.isoformat(),
+                                     'endDate': d_end.isoformat(),
+                                     'projects': [{'title': rng.choice(('SC', 'SQ42')), 'logo': ''}],
+                                     'timeAllocations': allocations})
+            teams.append({'title': 'Team {}'.format(t), 'description': '', 'deliverables': deliverables})
+        return [{'data': {'roadmap': teams}}]
+
+    def crowdfund_stats(self):
+        # counters that keep growing with the wall clock, like the real ones
+        elapsed = time.time() - 1.6e9
+        return {'funds': int(30000000000 + elapsed * 1500), 'fans': int(3000000 + elapsed / 15),
+                'fleet': int(4000000 + elapsed / 12)}
+
+    def loaner_page(self):
+        rows = ''.join('<tr><td>Standin {}</td><td>Standin {}</td></tr>'.format(i, i + 1)
+                       for i in range(1, min(self.ship_count, 50)))
+        return '<html><body><div class="article-body"><table><tbody>{}</tbody></table></div></body></html>'.format(
+            rows)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    standin = None
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type='application/json'):
+        if not isinstance(body, bytes):
+            body = (json.dumps(body) if content_type == 'application/json' else body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if status == 429:
+            self.send_header('Retry-After', '1')
+        try:
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up waiting, e.g. its deadline passed
+            self.close_connection = True
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if 'application/json' in (self.headers.get('Content-Type') or ''):
+            return json.loads(raw or b'null')
+        return {k: v[0] for k, v in parse_qs(raw.decode()).items()}
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        s = self.standin
+        body = self._body() if method == 'POST' else None
+        fault = s.fault()
+        if fault:
+            return self._send(fault, {'success': 0, 'code': 'ErrStandinFault', 'msg': 'Injected fault'})
+
+        path = urlparse(self.path).path.rstrip('/')
+        parts = path.strip('/').split('/')
+        html = 'text/html; charset=utf-8'
+        ok = {'success': 1, 'code': 'OK', 'msg': 'OK', 'data': {}}
+
+        if method == 'GET' and parts[0] == 'citizens' and len(parts) >= 2:
+            if parts[1].startswith(s.missing_prefix):
+                return self._send(404, '<html>Not found</html>', html)
+            if len(parts) == 3 and parts[2] == 'organizations':
+                return self._send(200, s.citizen_orgs_page(parts[1]), html)
+            return self._send(200, s.citizen_page(parts[1]), html)
+        if method == 'GET' and parts[0] == 'orgs' and len(parts) == 2:
+            if parts[1].lower().startswith(s.missing_prefix):
+                return self._send(404, '<html>Not found</html>', html)
+            return self._send(200, s.org_page(parts[1].upper()), html)
+        if method == 'GET' and path == '/ship-matrix/index':
+            return self._send(200, {'success': 1, 'code': 'OK', 'msg': 'OK', 'data': s.ships()})
+        if method == 'GET' and path.startswith('/pledge/ships'):
+            return self._send(200, "<script>model_3d: '/media/models/{}.ctm'</script>".format(parts[-1]), html)
+        if method == 'GET' and path == '/loaners':
+            return self._send(200, s.loaner_page(), html)
+        if method == 'GET' and path == '/status/systems.en.json':
+            return self._send(200, {'systems': [{'name': name, 'status': 'operational'}
+                                                for name in ('Platform', 'Persistent Universe', 'Arena Commander')]})
+        if method == 'GET' and path == '/status/incidents/timeline.en.json':
+            return self._send(200, {'incidents': []})
+
+        if method == 'POST' and path == '/api/orgs/getOrgMembers':
+            return self._send(200, s.org_members(body or {}))
+        if method == 'POST' and path == '/api/store/getSKUs':
+            return self._send(200, s.skus(body or {}))
+        if method == 'POST' and path == '/pledge-store/api/upgrade':
+            return self._send(200, s.ship_upgrades())
+        if method == 'POST' and path == '/api/stats/getCrowdfundStats':
+            return self._send(200, dict(ok, data=s.crowdfund_stats()))
+        if method == 'POST' and path == '/graphql':
+            return self._send(200, s.roadmap())
+        if method == 'POST' and path in ('/api/account/v2/setAuthToken', '/pledge-store/api/setContextToken'):
+            return self._send(200, ok)
+        if method == 'POST' and path == '/api/launcher/v3/games/claims':
+            return self._send(200, dict(ok, data='standin-claims'))
+        if method == 'POST' and path == '/api/launcher/v3/content/news':
+            return self._send(200, dict(ok, data={'items': [{'id': i, 'title': 'News {}'.format(i)}
+                                                            for i in range(10)]}))
+        if method == 'POST' and path == '/api/launcher/v3/content/patchNotes':
+            return self._send(200, dict(ok, data={'channel': (body or {}).get('channel_id'), 'notes': 'Notes'}))
+        if method == 'POST' and path == '/api/launcher/v3/games/release':
+            return self._send(200, dict(ok, data={'channel': (body or {}).get('channelId'), 'version': '3.0.0'}))
+        return self._send(404, {'success': 0, 'code': 'ErrNotFound', 'msg': 'Not found'})
@@ -1,6 +1,9 @@
 import requests
 
+from rsi.deadline import request_timeout
+
 DEFAULT_STATUS_API_URL = 'https://status.robertsspaceindustries.com/static/content/api/v0'
+DEFAULT_TIMEOUT = 30
 
 
 class Status:
@@ -8,14 +11,19 @@ class Status:
     Interface to the RSI status page: https://status.robertsspaceindustries.com
     """
 
-    def __init__(self, status_api_url=DEFAULT_STATUS_API_URL, language='en'):
+    def __init__(self, status_api_url=DEFAULT_STATUS_API_URL, language='en', session=None):
         self.api_url = status_api_url.rstrip('/')
         self.language = language
+        # the status page is a separate site, a shared session just saves on connections
+        self.session = session or requests
 
     def _get(self, endpoint, language, *args, **kwargs):
         lang_map = {'language': language if language is not None else self.language}
         req_url = f'{self.api_url}/{endpoint.format_map(lang_map).lstrip("/")}'
-        r = requests.get(req_url, *args, **kwargs)
+        if self.session is requests:
+            # an RSISession applies its own default timeout and the active deadline
+            kwargs['timeout'] = request_timeout(kwargs.get('timeout', DEFAULT_TIMEOUT))
+        r = self.session.get(req_url, *args, **kwargs)
         r.raise_for_status()
         try:
             return r.json()
@@ -0,0 +1,163 @@
+"""
+Opt-in tracing of where the time of multi-request operations goes.
+
+The API classes wrap each phase of their work (network, JSON decode, HTML parsing, fuzzy matching, sleeps) in
+`span`, which does nothing unless a `Tracer` is active::
+
+    from rsi.tracing import Tracer
+
+    with Tracer(trace_memory=True) as tracer:
+        org.members
+    tracer.dump_chrome_trace('org.json')     # open in chrome://tracing or https://ui.perfetto.dev
+    print(tracer.to_folded())                # feed to flamegraph.pl / speedscope
+"""
+import os
+import json
+import functools
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from collections import defaultdict
+
+_active = None
+_local = threading.local()
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **args):
+    """ Context manager timing the enclosed block as `name` on the active tracer, a no-op when none is active """
+    tracer = _active
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, **args)
+
+
+def traced(name):
+    """ Decorator running the function inside `span(name)` """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def active_tracer():
+    return _active
+
+
+class Tracer(object):
+    def __init__(self, trace_memory=False):
+        """ Records nested spans with their wall time, CPU time and optionally tracemalloc allocation deltas.
+
+        :argument trace_memory Also record the net memory allocated in each span, this slows everything down
+        """
+        self.trace_memory = trace_memory
+        self.spans = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._previous = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        global _active
+        self._previous = _active
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        _active = self
+        return self
+
+    def __exit__(self, *args):
+        global _active
+        _active = self._previous
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        return False
+
+    @contextmanager
+    def span(self, name, **args):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        frame = {'name': name, 'children': 0.0}
+        stack.append(frame)
+        memory = tracemalloc.get_traced_memory()[0] if self.trace_memory and tracemalloc.is_tracing() else None
+        cpu = time.thread_time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            record = {
+                'name': name,
+                'stack': tuple(_['name'] for _ in stack),
+                'start': start - self._origin,
+                'duration': duration,
+                'self': duration - frame['children'],
+                'cpu': time.thread_time() - cpu,
+                'tid': threading.get_ident(),
+                'args': args,
+            }
+            if memory is not None and tracemalloc.is_tracing():
+                record['memory'] = tracemalloc.get_traced_memory()[0] - memory
+            stack.pop()
+            if stack:
+                stack[-1]['children'] += duration
+            with self._lock:
+                self.spans.append(record)
+
+    def summary(self):
+        """ Dict of span name to its count and total wall, self and CPU time in seconds """
+        totals = defaultdict(lambda: {'count': 0, 'wall': 0.0, 'self': 0.0, 'cpu': 0.0})
+        for record in self.spans:
+            total = totals[record['name']]
+            total['count'] += 1
+            total['wall'] += record['duration']
+            total['self'] += record['self']
+            total['cpu'] += record['cpu']
+        return dict(totals)
+
+    def to_chrome_trace(self):
+        """ The spans in the Chrome trace-event format (complete "X" events) """
+        pid = os.getpid()
+        events = []
+        for record in self.spans:
+            args = dict(record['args'], cpu_ms=round(record['cpu'] * 1000, 3))
+            if 'memory' in record:
+                args['memory_delta'] = record['memory']
+            events.append({
+                'name': record['name'],
+                'cat': record['stack'][0],
+                'ph': 'X',
+                'ts': record['start'] * 1e6,
+                'dur': record['duration'] * 1e6,
+                'pid': pid,
+                'tid': record['tid'],
+                'args': {k: v if isinstance(v, (int, float, bool)) else str(v) for k, v in args.items()},
+            })
+        return {'traceEvents': sorted(events, key=lambda _: _['ts']), 'displayTimeUnit': 'ms'}
+
+    def dump_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_chrome_trace(), f)
+
+    def to_folded(self):
+        """ The spans as folded stacks ("a;b;c <self time in microseconds>" per line) for flame graph tools """
+        folded = defaultdict(float)
+        for record in self.spans:
+            folded[';'.join(record['stack'])] += record['self']
+        return '\n'.join('{} {}'.format(k, int(v * 1e6)) for k, v in sorted(folded.items()))
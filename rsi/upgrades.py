@@ -0,0 +1,104 @@
+import heapq
+
+
+class UpgradeGraph(object):
+    def __init__(self, ships, extra_upgrades=None):
+        """ Graph of the ship upgrades (CCUs) that can currently be bought, for finding the cheapest upgrade chains.
+
+        Upgrading from ship A to ship B is possible when B has an available SKU priced above A's msrp, and costs the
+        lowest available B SKU price (which is below B's msrp during sales and for warbond offers) minus A's msrp.
+        Shortest paths are computed with Dijkstra once per source ship and cached until the graph is rebuilt, so
+        querying many targets from the same source costs a single search.
+
+        :argument ships Dict of ship id to ship as returned by `PledgeStore.ship_upgrades`
+        :argument extra_upgrades Iterable of (from id, to id, price) for specific upgrade offers that are known to
+                                 be available, used instead of the computed price when cheaper
+        """
+        self.ships = {}
+        self._by_name = {}
+        self._paths = {}
+        upgrade_price = {}
+
+        for ship_id, ship in ships.items():
+            msrp = ship.get('msrp') or 0
+            if not msrp:
+                continue
+            self.ships[ship_id] = ship
+            self._by_name[ship['name'].lower()] = ship_id
+            prices = [_['price'] for _ in ship.get('skus') or [] if _.get('available') and _.get('price')]
+            if prices:
+                upgrade_price[ship_id] = min(prices)
+
+        self.edges = {_: {} for _ in self.ships}
+        for from_id, ship in self.ships.items():
+            for to_id, price in upgrade_price.items():
+                if to_id != from_id and price > ship['msrp']:
+                    self.edges[from_id][to_id] = price - ship['msrp']
+
+        for from_id, to_id, price in extra_upgrades or []:
+            if from_id in self.edges and to_id in self.ships and price < self.edges[from_id].get(to_id, price + 1):
+                self.edges[from_id][to_id] = price
+
+    def resolve(self, ship):
+        """ Ship id of the given ship id, name (case-insensitive) or ship dict """
+        if isinstance(ship, dict):
+            ship = ship['id']
+        if ship in self.ships:
+            return ship
+        ship_id = self._by_name.get(str(ship).lower())
+        if ship_id is None:
+            raise KeyError('Unknown ship: {}'.format(ship))
+        return ship_id
+
+    def _search(self, source):
+        if source in self._paths:
+            return self._paths[source]
+
+        cost = {source: 0}
+        previous = {}
+        heap = [(0, source)]
+        while heap:
+            current_cost, ship_id = heapq.heappop(heap)
+            if current_cost > cost[ship_id]:
+                continue
+            for to_id, price in self.edges[ship_id].items():
+                new_cost = current_cost + price
+                if new_cost < cost.get(to_id, new_cost + 1):
+                    cost[to_id] = new_cost
+                    previous[to_id] = ship_id
+                    heapq.heappush(heap, (new_cost, to_id))
+        self._paths[source] = cost, previous
+        return self._paths[source]
+
+    def cheapest_path(self, from_ship, to_ship):
+        """
+        Cheapest upgrade chain between two ships.
+
+        :param from_ship: Ship id, name or dict to upgrade from
+        :param to_ship: Ship id, name or dict to upgrade to
+        :return: tuple of (total price, list of ship ids from `from_ship` to `to_ship`) or None if not possible
+        """
+        return self.cheapest_paths(from_ship, [to_ship])[self.resolve(to_ship)]
+
+    def cheapest_paths(self, from_ship, to_ships=None):
+        """
+        Cheapest upgrade chains from one ship to many.
+
+        :param from_ship: Ship id, name or dict to upgrade from
+        :param to_ships: Ships to upgrade to, defaults to every ship
+        :return: dict of target ship id to (total price, list of ship ids) or None if it can't be upgraded to
+        """
+        source = self.resolve(from_ship)
+        cost, previous = self._search(source)
+        targets = self.ships if to_ships is None else [self.resolve(_) for _ in to_ships]
+
+        result = {}
+        for target in targets:
+            if target not in cost:
+                result[target] = None
+                continue
+            path = [target]
+            while path[-1] != source:
+                path.append(previous[path[-1]])
+            result[target] = (cost[target], path[::-1])
+        return result
@@ -1,6 +1,71 @@
+import time
+import threading
+
+from bs4 import SoupStrainer
+
+
 def get_item(iterable_or_dict, index, default=None):
     """Return iterable[index] or default if IndexError is raised."""
     try:
         return iterable_or_dict[index]
     except (IndexError, KeyError):
         return default
+
+
+def notify_listeners(listeners, *args):
+    """ Call each of the `listeners` with `args`, a failing listener is reported and doesn't stop the others """
+    for listener in listeners:
+        try:
+            listener(*args)
+        except Exception as e:
+            print(f'WARNING [listeners] {listener!r} failed: {e!r}')
+
+
+def class_strainer(*classes):
+    """
+    A SoupStrainer that only keeps elements (and their subtree) having any of the given css classes.
+
+    Pass as `parse_only` to BeautifulSoup to skip building the tree for the rest of a page.
+    """
+    wanted = frozenset(classes)
+
+    def _match(value):
+        # depending on the bs4 version this is called with either each class or the whole class attribute
+        if not value:
+            return False
+        return not wanted.isdisjoint(value.split() if isinstance(value, str) else value)
+    return SoupStrainer(class_=_match)
+
+
+class RateLimiter(object):
+    def __init__(self, rate, burst=1):
+        """ Thread safe token bucket limiting how often `wait` returns.
+
+        :argument rate Number of calls allowed per second
+        :argument burst Number of calls that may be made back to back before being limited
+        """
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def wait(self):
+        """ Block until a call is allowed, returns the number of seconds spent waiting """
+        waited = 0
+        delay = self._acquire()
+        while delay:
+            time.sleep(delay)
+            waited += delay
+            delay = self._acquire()
+        return waited
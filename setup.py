@@ -36,6 +36,11 @@ setup(
         'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
     ],
+    entry_points={
+        'console_scripts': [
+            'pyrsi=rsi.cli:main',
+        ],
+    },
     description="Python API for interacting with the Roberts Space Industries site for Star Citizen.",
     install_requires=requirements,
     license="MIT license",
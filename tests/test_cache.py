@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.cache`."""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from cachetools import TTLCache
+
+from rsi.cache import MemoryBackend, SQLiteBackend, SharedCache, get_or_update, make_cache
+
+TTL = 0.05
+
+
+class BackendTests(object):
+    """Tests run against every `CacheBackend`."""
+
+    def backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.cache = self.backend()
+        self.addCleanup(self.cache.close)
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get('ships'))
+        self.cache.set('ships', b'\x00carrack')
+        self.assertEqual(self.cache.get('ships'), b'\x00carrack')
+        self.cache.set('ships', b'aurora')
+        self.assertEqual(self.cache.get('ships'), b'aurora')
+
+    def test_add(self):
+        self.assertTrue(self.cache.add('lease', b'1'))
+        self.assertFalse(self.cache.add('lease', b'2'))
+        self.assertEqual(self.cache.get('lease'), b'1')
+        self.assertTrue(self.cache.delete('lease'))
+        self.assertFalse(self.cache.delete('lease'))
+        self.assertTrue(self.cache.add('lease', b'3'))
+
+    def test_ttl_expiry(self):
+        self.cache.set('short', b'1', ttl=TTL)
+        self.cache.set('long', b'2', ttl=60)
+        self.cache.set('forever', b'3')
+        self.assertEqual(sorted(self.cache.keys()), ['forever', 'long', 'short'])
+        time.sleep(TTL * 2)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertEqual(self.cache.get('long'), b'2')
+        self.assertEqual(sorted(self.cache.keys()), ['forever', 'long'])
+
+    def test_add_replaces_expired(self):
+        self.assertTrue(self.cache.add('lease', b'1', ttl=TTL))
+        self.assertFalse(self.cache.add('lease', b'2', ttl=TTL))
+        time.sleep(TTL * 2)
+        self.assertTrue(self.cache.add('lease', b'3', ttl=TTL))
+        self.assertEqual(self.cache.get('lease'), b'3')
+
+    def test_keys_prefix(self):
+        for key in ('org:A', 'org:B', 'ships:all'):
+            self.cache.set(key, b'1')
+        self.assertEqual(sorted(self.cache.keys('org:')), ['org:A', 'org:B'])
+
+
+class TestMemoryBackend(BackendTests, unittest.TestCase):
+    """Tests for `MemoryBackend`."""
+
+    def backend(self):
+        return MemoryBackend()
+
+
+class TestSQLiteBackend(BackendTests, unittest.TestCase):
+    """Tests for `SQLiteBackend`."""
+
+    def backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'cache.db')
+        return SQLiteBackend(self.path)
+
+    def test_shared_between_instances(self):
+        other = SQLiteBackend(self.path)
+        self.addCleanup(other.close)
+        self.cache.set('ships', b'carrack')
+        self.assertEqual(other.get('ships'), b'carrack')
+        self.assertTrue(other.add('lease', b'1'))
+        self.assertFalse(self.cache.add('lease', b'1'))
+
+
+class SharedCacheTests(object):
+    """Tests of `SharedCache` run against every backend."""
+
+    def backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.backend()
+        self.addCleanup(self.store.close)
+
+    def shared(self, **kwargs):
+        return SharedCache(self.store, 'test', **dict(dict(ttl=60, local_ttl=0), **kwargs))
+
+    def test_mapping(self):
+        cache = self.shared()
+        cache['ships'] = {'Carrack': 1}
+        self.assertEqual(cache['ships'], {'Carrack': 1})
+        self.assertIn('ships', cache)
+        self.assertEqual(list(cache), ['ships'])
+        self.assertEqual(len(cache), 1)
+        # other instances over the same backend see the value
+        self.assertEqual(self.shared()['ships'], {'Carrack': 1})
+        del cache['ships']
+        self.assertNotIn('ships', cache)
+        with self.assertRaises(KeyError):
+            cache['ships']
+
+    def test_expired_is_missing(self):
+        cache = self.shared(ttl=TTL, stale_ttl=60)
+        cache['ships'] = 1
+        time.sleep(TTL * 2)
+        self.assertNotIn('ships', cache)
+        with self.assertRaises(KeyError):
+            cache['ships']
+        self.assertEqual(len(cache), 1)
+
+    def test_get_or_update(self):
+        cache = self.shared()
+        self.assertEqual(cache.get_or_update('ships', lambda: 1), 1)
+        self.assertEqual(cache.get_or_update('ships', lambda: 2), 1)
+        self.assertEqual(get_or_update(cache, 'ships', lambda: 3), 1)
+        self.assertEqual(list(cache), ['ships'])
+
+    def test_get_or_update_serves_stale(self):
+        cache = self.shared(ttl=TTL, stale_ttl=60)
+        cache['ships'] = 1
+        time.sleep(TTL * 2)
+        # another worker holds the lease, the expired value is served meanwhile
+        self.assertTrue(self.store.add('test:ships:lease', b'1', ttl=60))
+        self.assertEqual(cache.get_or_update('ships', lambda: 2), 1)
+        self.store.delete('test:ships:lease')
+        self.assertEqual(cache.get_or_update('ships', lambda: 2), 2)
+
+    def test_get_or_update_single_flight(self):
+        calls = []
+        results = []
+        start = threading.Barrier(8)
+
+        def update():
+            calls.append(threading.get_ident())
+            time.sleep(0.1)
+            return 'ships'
+
+        def worker():
+            cache = self.shared()
+            start.wait()
+            results.append(cache.get_or_update('ships', update, poll=0.01))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['ships'] * 8)
+        self.assertEqual(list(self.shared()), ['ships'])
+
+    def test_get_or_update_failure_releases_lease(self):
+        cache = self.shared()
+
+        def fail():
+            raise ValueError('refresh failed')
+
+        with self.assertRaises(ValueError):
+            cache.get_or_update('ships', fail)
+        self.assertEqual(cache.get_or_update('ships', lambda: 1), 1)
+
+
+class TestSharedCacheMemory(SharedCacheTests, unittest.TestCase):
+    """Tests for `SharedCache` over a `MemoryBackend`."""
+
+    def backend(self):
+        return MemoryBackend()
+
+
+class TestSharedCacheSQLite(SharedCacheTests, unittest.TestCase):
+    """Tests for `SharedCache` over a `SQLiteBackend`."""
+
+    def backend(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        return SQLiteBackend(os.path.join(directory, 'cache.db'))
+
+
+class TestMakeCache(unittest.TestCase):
+    """Tests for `make_cache` and `get_or_update` on a local cache."""
+
+    def test_local(self):
+        cache = make_cache(None, 'test', 4, 60)
+        self.assertIsInstance(cache, TTLCache)
+        self.assertEqual(get_or_update(cache, 'ships', lambda: 1), 1)
+        self.assertEqual(get_or_update(cache, 'ships', lambda: 2), 1)
+
+    def test_shared(self):
+        self.assertIsInstance(make_cache(MemoryBackend(), 'test', 4, 60), SharedCache)
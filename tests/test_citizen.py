@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.citizen`."""
+
+import time
+import unittest
+
+from rsi.citizen import CitizenCache
+from rsi.session import RSISession
+from rsi.standin import StandinServer
+
+
+class TestCitizenCache(unittest.TestCase):
+    """Tests for `CitizenCache`."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.standin = StandinServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.standin.stop()
+
+    def cache(self, url=None, **kwargs):
+        url = url or self.standin.url
+        return CitizenCache(session=RSISession(url=url, persist_session=False), url=url, **kwargs)
+
+    def requests_for(self, func, standin=None):
+        standin = standin or self.standin
+        before = standin.requests
+        result = func()
+        return result, standin.requests - before
+
+    def test_cached(self):
+        cache = self.cache()
+        citizen, requests = self.requests_for(lambda: cache.get('Someone'))
+        self.assertEqual(citizen['handle'], 'Someone')
+        self.assertGreater(requests, 1)
+        self.assertEqual(self.requests_for(lambda: cache.get('someone')), (citizen, 0))
+        self.assertEqual(cache.stats()['profile_hits'], 1)
+
+    def test_not_found_cached(self):
+        cache = self.cache(not_found_ttl=0.2)
+        self.assertEqual(self.requests_for(lambda: cache.get('missing_handle')), ({}, 1))
+        self.assertEqual(self.requests_for(lambda: cache.get('MISSING_handle')), ({}, 0))
+        stats = cache.stats()
+        self.assertEqual((stats['not_found'], stats['not_found_hits'], stats['profiles']), (1, 1, 0))
+
+        # until it expires
+        time.sleep(0.3)
+        self.assertEqual(self.requests_for(lambda: cache.get('missing_handle')), ({}, 1))
+
+    def test_not_found_refresh(self):
+        cache = self.cache()
+        cache.get('missing_handle')
+        self.assertEqual(self.requests_for(lambda: cache.get('missing_handle', refresh=True)), ({}, 1))
+        cache.invalidate('Missing_Handle')
+        self.assertEqual(self.requests_for(lambda: cache.get('missing_handle')), ({}, 1))
+
+    def test_errors_not_cached(self):
+        with StandinServer(error_rate=1.0) as failing:
+            cache = self.cache(url=failing.url)
+            self.assertEqual(self.requests_for(lambda: cache.get('someone'), failing), ({}, 1))
+            self.assertEqual(self.requests_for(lambda: cache.get('someone'), failing), ({}, 1))
+        stats = cache.stats()
+        self.assertEqual((stats['errors'], stats['not_found'], stats['profiles']), (2, 0, 0))
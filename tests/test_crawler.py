@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.crawler`."""
+
+import os
+import shutil
+import time
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from rsi import crawler
+from rsi.crawler import OrgCrawler
+from rsi.org import fetch_members_page
+from rsi.session import RSISession
+from rsi.standin import StandinServer
+
+ROSTER_SIZE = 100
+PAGE_SIZE = 32
+PAGES = 4
+
+
+class TestOrgCrawler(unittest.TestCase):
+    """Tests for `OrgCrawler` against the stand-in server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.standin = StandinServer(roster_size=ROSTER_SIZE, page_size=PAGE_SIZE).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.standin.stop()
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.checkpoint = os.path.join(directory, 'crawl.db')
+        self.session = RSISession(url=self.standin.url, persist_session=False)
+        self.fetched = []
+        self.fetched_at = []
+        self.fail = lambda symbol, page, calls: False
+        self._lock = threading.Lock()
+        patcher = mock.patch.object(crawler, 'fetch_members_page', self.fetch_members_page)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch_members_page(self, session, symbol, page, **kwargs):
+        with self._lock:
+            calls = sum(1 for _ in self.fetched if _ == (symbol, page))
+            self.fetched.append((symbol, page))
+            self.fetched_at.append(time.monotonic())
+        if self.fail(symbol, page, calls):
+            raise ConnectionError('page {} of {} failed'.format(page, symbol))
+        return fetch_members_page(session, symbol, page, **kwargs)
+
+    def crawler(self, symbols, **kwargs):
+        kwargs = dict(dict(workers=2, rate_limit=None, retries=0, retry_backoff=0), **kwargs)
+        return OrgCrawler(symbols, session=self.session, checkpoint_file=self.checkpoint, url=self.standin.url,
+                          **kwargs)
+
+    def test_crawl(self):
+        completed = []
+        progress = self.crawler(['org1', 'org2'], on_complete=lambda *args: completed.append(args)).run()
+        for symbol in ('ORG1', 'ORG2'):
+            self.assertEqual(progress[symbol]['pages_total'], PAGES)
+            self.assertEqual(progress[symbol]['scanned'], ROSTER_SIZE)
+            self.assertTrue(progress[symbol]['completed'])
+            self.assertIsNone(progress[symbol]['error'])
+        self.assertEqual(sorted(_[0] for _ in completed), ['ORG1', 'ORG2'])
+        self.assertEqual(len(self.fetched), 2 * PAGES)
+
+    def test_resume_from_checkpoint(self):
+        self.fail = lambda symbol, page, calls: page == 3
+        progress = self.crawler(['org1']).run()['ORG1']
+        self.assertFalse(progress['completed'])
+        # pages after the one given up on may or may not have been fetched already
+        self.assertIn(progress['pages_done'], (PAGES - 2, PAGES - 1))
+        self.assertIn('page 3 of ORG1 failed', progress['error'])
+        done = {page for symbol, page in self.fetched if page != 3}
+
+        self.fail = lambda symbol, page, calls: False
+        self.fetched = []
+        crawl = self.crawler(['org1'])
+        progress = crawl.run()['ORG1']
+        # only the page missing from the checkpoint is fetched again
+        self.assertEqual(sorted(self.fetched), [('ORG1', _) for _ in range(1, PAGES + 1) if _ not in done])
+        self.assertTrue(progress['completed'])
+        members = crawl.members('org1')
+        self.assertEqual(len({_['handle'] for _ in members}), len(members))
+        self.assertEqual(len(members) + sum(1 for _ in self.standin.roster('ORG1') if _['hidden']), ROSTER_SIZE)
+
+    def test_max_age_skips_recent(self):
+        self.crawler(['org1']).run()
+        self.fetched = []
+        self.crawler(['org1'], max_age=3600).run()
+        self.assertEqual(self.fetched, [])
+        self.crawler(['org1'], max_age=0).run()
+        self.assertEqual(len(self.fetched), PAGES)
+
+    def test_retry(self):
+        self.fail = lambda symbol, page, calls: page == 2 and calls < 2
+        progress = self.crawler(['org1'], retries=2).run()['ORG1']
+        self.assertTrue(progress['completed'])
+        self.assertEqual(self.fetched.count(('ORG1', 2)), 3)
+
+    def test_retry_does_not_block_worker(self):
+        self.fail = lambda symbol, page, calls: symbol == 'ORG1' and page == 2 and calls == 0
+        progress = self.crawler(['org1', 'org2'], workers=1, retries=1, retry_backoff=0.5).run()
+        self.assertTrue(all(_['completed'] for _ in progress.values()))
+        # the single worker went on with the other pages while the failed one waited out its backoff
+        failed = self.fetched.index(('ORG1', 2))
+        self.assertLess(self.fetched_at[failed + 1] - self.fetched_at[failed], 0.25)
+        self.assertEqual(self.fetched[-1], ('ORG1', 2))
+        self.assertGreaterEqual(self.fetched_at[-1] - self.fetched_at[failed], 0.5)
+        self.assertEqual(len(self.fetched), 2 * PAGES + 1)
+
+    def test_failing_callback_is_not_refetched(self):
+        def on_complete(symbol, members):
+            raise RuntimeError('callback failed')
+
+        progress = self.crawler(['org1'], retries=3, on_complete=on_complete).run()['ORG1']
+        self.assertTrue(progress['completed'])
+        self.assertIsNone(progress['error'])
+        self.assertEqual(len(self.fetched), PAGES)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.crowdfund`."""
+
+import unittest
+
+from rsi.crowdfund import CrowdfundSeries
+
+
+class TestCrowdfundSeries(unittest.TestCase):
+    """Tests for `CrowdfundSeries`."""
+
+    def fill(self, series, samples):
+        for timestamp, funds in samples:
+            series.append(timestamp, {'funds': funds, 'fans': timestamp, 'fleet': 0})
+
+    def test_values(self):
+        series = CrowdfundSeries(capacity=10)
+        self.fill(series, [(100, 5), (200, 8), (300, 20)])
+        self.assertEqual(len(series), 3)
+        self.assertEqual(series.latest(), (300, {'funds': 20, 'fans': 300, 'fleet': 0}))
+        self.assertIsNone(series.value_at(99))
+        self.assertEqual(series.value_at(250)['funds'], 8)
+        self.assertEqual(series.increase('funds', 100, 300), 15)
+        self.assertEqual(series.rate_per_hour('funds', window=200), 15 * 3600 / 200)
+
+    def test_time_order(self):
+        series = CrowdfundSeries(capacity=10)
+        self.fill(series, [(100, 5)])
+        with self.assertRaises(ValueError):
+            self.fill(series, [(99, 6)])
+
+    def test_widening(self):
+        series = CrowdfundSeries(capacity=10)
+        self.assertEqual(series._deltas['funds'].typecode, 'i')
+        self.fill(series, [(100, 0), (200, 2 ** 31), (300, 2 ** 31 + 1), (400, -2 ** 40)])
+        self.assertEqual(series._deltas['funds'].typecode, 'q')
+        # the other counters keep their 32 bit deltas
+        self.assertEqual(series._deltas['fans'].typecode, 'i')
+        self.assertEqual([series.value_at(_)['funds'] for _ in (100, 200, 300, 400)],
+                         [0, 2 ** 31, 2 ** 31 + 1, -2 ** 40])
+        self.assertEqual(series.increase('funds', 100, 300), 2 ** 31 + 1)
+        self.assertEqual(series.latest()[1]['funds'], -2 ** 40)
+
+    def test_widening_after_wrap(self):
+        series = CrowdfundSeries(capacity=4)
+        samples = [(_ * 60, _ * 1000) for _ in range(6)] + [(360, 2 ** 33), (420, 2 ** 33 + 7)]
+        self.fill(series, samples)
+        self.assertEqual(len(series), 4)
+        self.assertEqual(series._deltas['funds'].typecode, 'q')
+        self.assertIsNone(series.value_at(239))
+        self.assertEqual([series.value_at(t)['funds'] for t, _ in samples[-4:]], [_ for t, _ in samples[-4:]])
+        self.assertEqual(series.increase('funds', 240, 420), 2 ** 33 + 7 - 4000)
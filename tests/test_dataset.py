@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.dataset`."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rsi.dataset import Dataset, DatasetStore, write_dataset
+from rsi.exceptions import RSIException
+
+
+ROWS = [
+    {'handle': 'bravo', 'stars': 3, 'ratio': 0.5, 'active': True, 'roles': ['Officer'], 'name': 'Bravo'},
+    {'handle': 'alpha', 'stars': None, 'ratio': None, 'active': False, 'roles': None, 'name': 'Älpha ✓'},
+    {'handle': 'charlie', 'stars': 2 ** 40, 'ratio': -1.25, 'roles': {'main': 'Director'}},
+]
+
+
+class TestDataset(unittest.TestCase):
+    """Tests for `Dataset` and `write_dataset`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'members.rsids')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open(self, rows, **kwargs):
+        write_dataset(self.path, rows, **kwargs)
+        dataset = Dataset(self.path)
+        self.addCleanup(dataset.close)
+        return dataset
+
+    def test_round_trip(self):
+        dataset = self.open(ROWS, meta={'source': 'test'})
+        self.assertEqual(len(dataset), 3)
+        self.assertEqual(dataset.columns, ['handle', 'stars', 'ratio', 'active', 'roles', 'name'])
+        self.assertEqual(dataset.meta['source'], 'test')
+        self.assertEqual([_.to_dict() for _ in dataset], [dict({_: None for _ in dataset.columns}, **row)
+                                                           for row in ROWS])
+
+    def test_nulls(self):
+        dataset = self.open(ROWS)
+        self.assertEqual(list(dataset.column('stars')), [3, None, 2 ** 40])
+        self.assertEqual(list(dataset.column('ratio')), [0.5, None, -1.25])
+        self.assertEqual(list(dataset.column('active')), [True, False, None])
+        self.assertIsNone(dataset.row(2)['name'])
+        self.assertIsNone(dataset.row(1)['roles'])
+
+    def test_row_index(self):
+        dataset = self.open(ROWS)
+        self.assertEqual(dataset.row(-1)['handle'], 'charlie')
+        with self.assertRaises(IndexError):
+            dataset.row(3)
+        with self.assertRaises(KeyError):
+            dataset.column('missing')
+
+    def test_empty(self):
+        dataset = self.open([], key='handle')
+        self.assertEqual(len(dataset), 0)
+        self.assertEqual(list(dataset), [])
+        self.assertIsNone(dataset.get('alpha'))
+
+    def test_str_keys(self):
+        dataset = self.open(ROWS, key='handle')
+        self.assertEqual(list(dataset.keys()), ['alpha', 'bravo', 'charlie'])
+        self.assertEqual(dataset['charlie']['stars'], 2 ** 40)
+        self.assertIn('bravo', dataset)
+        self.assertNotIn('delta', dataset)
+        self.assertIsNone(dataset.get(['alpha']))
+        with self.assertRaises(KeyError):
+            dataset['delta']
+
+    def test_int_keys(self):
+        rows = [{'id': _ * 7, 'name': 'ship {}'.format(_)} for _ in range(100)]
+        dataset = self.open(rows, key=lambda _: _['id'])
+        self.assertTrue(all(dataset[_['id']]['name'] == _['name'] for _ in rows))
+        self.assertNotIn(1, dataset)
+        self.assertNotIn('7', dataset)
+
+    def test_no_key(self):
+        dataset = self.open(ROWS)
+        with self.assertRaises(RSIException):
+            dataset.get('alpha')
+
+    def test_duplicate_keys(self):
+        with self.assertRaises(ValueError):
+            write_dataset(self.path, ROWS + ROWS[:1], key='handle')
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_mixed_keys(self):
+        with self.assertRaises(ValueError):
+            write_dataset(self.path, [{'id': 1}, {'id': '2'}], key='id')
+
+    def test_not_a_dataset(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"handle": "alpha"}' * 10)
+        with self.assertRaises(RSIException):
+            Dataset(self.path)
+
+    def test_close_with_live_column(self):
+        write_dataset(self.path, ROWS, key='handle')
+        dataset = Dataset(self.path)
+        stars, names = dataset.column('stars'), dataset.column('name')
+        dataset.close()
+        dataset.close()
+        with self.assertRaises(ValueError):
+            stars[0]
+        with self.assertRaises(ValueError):
+            names[0]
+
+    def test_replace_keeps_open_mapping(self):
+        dataset = self.open(ROWS, key='handle')
+        write_dataset(self.path, [{'handle': 'delta'}], key='handle')
+        self.assertEqual(dataset['alpha']['name'], 'Älpha ✓')
+        replaced = Dataset(self.path)
+        self.assertEqual(list(replaced.keys()), ['delta'])
+        replaced.close()
+
+
+class TestDatasetStore(unittest.TestCase):
+    """Tests for `DatasetStore`."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = DatasetStore(self.directory, check_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_missing(self):
+        self.assertIsNone(self.store.get('ships'))
+        self.assertEqual(self.store.names(), [])
+
+    def test_get_reuses_and_replaces(self):
+        self.store.write('members', ROWS, key='handle')
+        first = self.store.get('members')
+        self.assertIs(self.store.get('members'), first)
+        self.assertEqual(self.store.names(), ['members'])
+
+        self.store.write('members', [{'handle': 'delta', 'stars': 1}], key='handle')
+        second = self.store.get('members')
+        self.assertIsNot(second, first)
+        self.assertEqual(list(second.keys()), ['delta'])
+        # readers of the replaced file keep their mapping
+        self.assertEqual(first['bravo']['stars'], 3)
+
+    def test_export_org_dedupes_handles(self):
+        class Org(object):
+            symbol = 'test'
+            org_url = 'https://example.com/orgs/TEST'
+            hidden_members = 0
+            members = [{'handle': 'Alpha', 'rank': 'Recruit'}, {'handle': 'bravo', 'rank': 'Member'},
+                       {'handle': 'alpha', 'rank': 'Officer'}]
+
+        self.store.export_org(Org())
+        dataset = self.store.get('org-TEST-members')
+        self.assertEqual(len(dataset), 2)
+        self.assertEqual(dataset['alpha']['rank'], 'Officer')
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.deadline`."""
+
+import time
+import threading
+import unittest
+
+from rsi.deadline import Deadline, current_deadline, check_deadline, request_timeout, sleep, with_deadline
+from rsi.exceptions import DeadlineExceeded
+
+
+class Session(object):
+    def __init__(self, operation_timeout=None):
+        self.operation_timeout = operation_timeout
+
+
+class API(object):
+    def __init__(self, session):
+        self.session = session
+
+    @with_deadline
+    def remaining(self):
+        return current_deadline().remaining() if current_deadline() else None
+
+    @with_deadline
+    def pages(self, count):
+        for i in range(count):
+            check_deadline()
+            yield i
+
+
+class TestDeadline(unittest.TestCase):
+    """Tests for `Deadline` and its helpers."""
+
+    def test_no_deadline(self):
+        self.assertIsNone(current_deadline())
+        check_deadline()
+        self.assertEqual(request_timeout(5), 5)
+        self.assertEqual(request_timeout((3, 10)), (3, 10))
+
+    def test_timeout(self):
+        with Deadline(2) as deadline:
+            self.assertIs(current_deadline(), deadline)
+            self.assertLessEqual(request_timeout(5), 2)
+            self.assertEqual(request_timeout(1), 1)
+            connect, read = request_timeout((1, None))
+            self.assertEqual(connect, 1)
+            self.assertLessEqual(read, 2)
+        self.assertIsNone(current_deadline())
+
+    def test_expired(self):
+        with Deadline(0):
+            with self.assertRaises(DeadlineExceeded):
+                check_deadline()
+            with self.assertRaises(DeadlineExceeded):
+                request_timeout(5)
+
+    def test_nested_never_extends(self):
+        with Deadline(1) as outer:
+            with Deadline(60) as inner:
+                self.assertIs(current_deadline(), inner)
+                self.assertGreaterEqual(outer.remaining(), inner.remaining())
+            with Deadline() as unlimited:
+                self.assertGreaterEqual(outer.remaining(), unlimited.remaining())
+            with Deadline(0.5) as shorter:
+                self.assertLess(shorter.remaining(), 0.5 + 1e-6)
+            self.assertIs(current_deadline(), outer)
+
+    def test_nested_keeps_own_time(self):
+        inner = Deadline(60)
+        with Deadline(0.5):
+            with inner:
+                self.assertLessEqual(inner.remaining(), 0.5)
+        # reused outside the shorter deadline it ran under, it has its own budget again
+        self.assertGreater(inner.remaining(), 30)
+        with inner:
+            self.assertGreater(request_timeout(), 30)
+        self.assertIsNone(Deadline().remaining())
+
+    def test_expired_outer_does_not_stick(self):
+        inner = Deadline(60)
+        with Deadline(0):
+            with inner:
+                self.assertTrue(inner.expired)
+        self.assertFalse(inner.expired)
+        with inner:
+            check_deadline()
+
+    def test_cancel_propagates_inward(self):
+        with Deadline() as outer:
+            with Deadline(60) as inner:
+                outer.cancel()
+                self.assertTrue(inner.cancelled)
+                with self.assertRaises(DeadlineExceeded):
+                    check_deadline()
+
+    def test_cancel_inner_only(self):
+        with Deadline(60) as outer:
+            with Deadline() as inner:
+                inner.cancel()
+                self.assertTrue(inner.expired)
+            self.assertFalse(outer.cancelled)
+            check_deadline()
+
+    def test_reentered(self):
+        deadline = Deadline(60)
+        with deadline:
+            with deadline:
+                self.assertIs(current_deadline(), deadline)
+            self.assertIs(current_deadline(), deadline)
+        self.assertIsNone(current_deadline())
+
+    def test_sleep_cut_short(self):
+        deadline = Deadline(60)
+        threading.Timer(0.05, deadline.cancel).start()
+        start = time.monotonic()
+        with deadline:
+            with self.assertRaises(DeadlineExceeded):
+                sleep(10)
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_threads_are_independent(self):
+        seen = []
+        with Deadline(1):
+            thread = threading.Thread(target=lambda: seen.append(current_deadline()))
+            thread.start()
+            thread.join()
+        self.assertEqual(seen, [None])
+
+
+class TestWithDeadline(unittest.TestCase):
+    """Tests for the `with_deadline` decorator."""
+
+    def test_argument(self):
+        api = API(Session())
+        self.assertIsNone(api.remaining())
+        self.assertLessEqual(api.remaining(deadline=5), 5)
+        self.assertIsNone(current_deadline())
+
+    def test_session_operation_timeout(self):
+        api = API(Session(operation_timeout=30))
+        self.assertLessEqual(api.remaining(), 30)
+        self.assertLessEqual(api.remaining(deadline=5), 5)
+        with Deadline(60):
+            # an active deadline is not replaced by the session's
+            self.assertGreater(api.remaining(), 30)
+
+    def test_generator(self):
+        api = API(Session())
+        self.assertEqual(list(api.pages(3, deadline=5)), [0, 1, 2])
+        pages = api.pages(3, deadline=Deadline(0))
+        with self.assertRaises(DeadlineExceeded):
+            next(pages)
+
+    def test_generator_inactive_between_items(self):
+        api = API(Session())
+        for _ in api.pages(2, deadline=5):
+            self.assertIsNone(current_deadline())
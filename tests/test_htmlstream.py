@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.htmlstream`."""
+
+import unittest
+
+from rsi.htmlstream import iter_element_html, iter_text
+
+PAGE = ('<html><body><div class="header">skip <b>me</b></div>'
+        '<div class="member-item first"><span class="nick">alpha</span><img src="/a.png"><br/>&amp; &#233;</div>'
+        '<p>between</p>'
+        '<div class="list"><div class="member-item"><ul><li>open<li>items</ul><div class="member-item">'
+        'nested</div></div></div>'
+        '<img class="member-item" src="/void.png">'
+        '</body></html>')
+
+ELEMENTS = ['<div class="member-item first"><span class="nick">alpha</span><img src="/a.png"><br/>&amp; &#233;</div>',
+            '<div class="member-item"><ul><li>open<li>items</ul><div class="member-item">nested</div></div>',
+            '<img class="member-item" src="/void.png">']
+
+
+def split(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestIterElementHtml(unittest.TestCase):
+    """Tests for `iter_element_html`."""
+
+    def test_outermost_elements(self):
+        self.assertEqual(''.join(iter_element_html([PAGE], ['member-item'])), ''.join(ELEMENTS))
+
+    def test_split_chunks(self):
+        for size in (1, 3, 10, 64):
+            self.assertEqual(''.join(iter_element_html(split(PAGE, size), ['member-item'])), ''.join(ELEMENTS),
+                             size)
+
+    def test_emitted_as_completed(self):
+        end = PAGE.index('<p>between')
+        parts = iter_element_html(iter([PAGE[:end], PAGE[end:]]), ['member-item'])
+        self.assertEqual(next(parts), ELEMENTS[0])
+        self.assertEqual(next(parts), ''.join(ELEMENTS[1:]))
+        self.assertEqual(list(parts), [])
+
+    def test_any_class(self):
+        html = ''.join(iter_element_html([PAGE], ['header', 'list']))
+        self.assertTrue(html.startswith('<div class="header">skip <b>me</b></div><div class="list">'))
+        self.assertNotIn('alpha', html)
+
+    def test_no_match(self):
+        self.assertEqual(list(iter_element_html(split(PAGE, 7), ['missing'])), [])
+
+    def test_iter_text(self):
+        data = 'é ✓ 🚀'.encode('utf-8')
+        self.assertEqual(''.join(iter_text([data[:1], data[1:5], data[5:]])), 'é ✓ 🚀')
+        self.assertEqual(''.join(iter_text([b'caf\xe9'], encoding='latin-1')), 'café')
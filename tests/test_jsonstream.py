@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.jsonstream`."""
+
+import json
+import unittest
+
+from rsi.jsonstream import iter_json_array
+
+DOCUMENT = {
+    'success': 1,
+    'code': 'OK',
+    'data': [
+        {'id': 1, 'name': 'Aurora MR', 'length': 18.5, 'media': [{'url': '/media/ü.jpg'}]},
+        {'id': 12345, 'name': 'Carrack „Expedition“ ✓', 'length': 126, 'production_note': None},
+        {'id': 3, 'name': 'escaped \\"quote\\" 🚀', 'length': -1e3, 'flags': [True, False]},
+    ],
+    'msg': 'done',
+}
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonArray(unittest.TestCase):
+    """Tests for `iter_json_array`."""
+
+    def setUp(self):
+        self.data = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode('utf-8')
+
+    def test_single_chunk(self):
+        meta = {}
+        self.assertEqual(list(iter_json_array([self.data], 'data', meta=meta)), DOCUMENT['data'])
+        self.assertEqual(meta, {'success': 1, 'code': 'OK', 'msg': 'done'})
+
+    def test_split_chunks(self):
+        # every chunk size splits values, numbers and multi-byte characters somewhere
+        for size in (1, 2, 3, 5, 7, 16, 64):
+            meta = {}
+            self.assertEqual(list(iter_json_array(split(self.data, size), 'data', meta=meta)), DOCUMENT['data'],
+                             size)
+            self.assertEqual(meta['msg'], 'done')
+
+    def test_every_split_point(self):
+        for i in range(1, len(self.data)):
+            chunks = [self.data[:i], b'', self.data[i:]]
+            self.assertEqual(list(iter_json_array(chunks, 'data')), DOCUMENT['data'], i)
+
+    def test_number_at_chunk_end(self):
+        data = b'{"data": [12, 345'
+        self.assertEqual(list(iter_json_array([data[:13], data[13:], b'6]}'], 'data')), [12, 3456])
+
+    def test_lazy(self):
+        consumed = []
+
+        def chunks():
+            for chunk in split(self.data, 8):
+                consumed.append(chunk)
+                yield chunk
+
+        items = iter_json_array(chunks(), 'data')
+        self.assertEqual(next(items), DOCUMENT['data'][0])
+        self.assertLess(sum(len(_) for _ in consumed), len(self.data) // 2)
+
+    def test_empty_and_missing(self):
+        self.assertEqual(list(iter_json_array([b'{"data": []}'], 'data')), [])
+        self.assertEqual(list(iter_json_array([b' { } '], 'data')), [])
+        meta = {}
+        self.assertEqual(list(iter_json_array([b'{"data": null, "code": "ERR"}'], 'data', meta=meta)), [])
+        self.assertEqual(meta, {'data': None, 'code': 'ERR'})
+
+    def test_malformed(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[1, 2]'], 'data'))
+        with self.assertRaises(ValueError):
+            list(iter_json_array(split(b'{"data": [1, 2', 3), 'data'))
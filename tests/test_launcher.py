@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.launcher`."""
+
+import time
+import threading
+import unittest
+from collections import Counter
+
+from rsi.launcher import LauncherAPI, DEFAULT_CHANNELS
+
+
+class Session(object):
+    """ Stand-in for an authenticated `RSISession` counting the API calls """
+    url = 'https://example.com'
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def is_authenticated(self):
+        with self._lock:
+            self.calls['is_authenticated'] += 1
+        return True
+
+    def query_api(self, api, json=None):
+        with self._lock:
+            self.calls[api.rsplit('/', 1)[-1]] += 1
+        time.sleep(self.delay)
+        if api.endswith('claims'):
+            return True, {'data': 'claims-token'}
+        return True, {'data': dict(json or {}, api=api)}
+
+
+class TestLauncherAPI(unittest.TestCase):
+    """Tests for `LauncherAPI`."""
+
+    def test_prefetch(self):
+        session = Session()
+        launcher = LauncherAPI(session)
+        result = launcher.prefetch()
+        self.assertEqual(result['errors'], {})
+        self.assertEqual(sorted(result['release']), sorted(DEFAULT_CHANNELS))
+        self.assertEqual(result['release']['PTU']['claims'], 'claims-token')
+        self.assertEqual(result['patch_notes']['LIVE']['channel_id'], 'LIVE')
+        # the claims are looked up once for all the releases
+        self.assertEqual(session.calls['is_authenticated'], 1)
+        self.assertEqual(session.calls['claims'], 1)
+        self.assertEqual(session.calls['release'], len(DEFAULT_CHANNELS))
+
+        launcher.prefetch()
+        self.assertEqual(session.calls['is_authenticated'], 1)
+        self.assertEqual(session.calls['release'], len(DEFAULT_CHANNELS))
+        self.assertEqual(session.calls['news'], 1)
+
+    def test_release_changes(self):
+        session = Session()
+        launcher = LauncherAPI(session)
+        changed, cursor = launcher.release_changes()
+        self.assertEqual(sorted(changed), sorted(DEFAULT_CHANNELS))
+        self.assertEqual(session.calls['is_authenticated'], 1)
+        self.assertEqual(launcher.release_changes(cursor), ({}, cursor))
+        self.assertEqual(session.calls['is_authenticated'], 1)
+
+    def test_concurrent_misses_fetch_once(self):
+        session = Session(delay=0.05)
+        launcher = LauncherAPI(session)
+        start = threading.Barrier(8)
+        results = []
+
+        def worker():
+            start.wait()
+            results.append(launcher.news())
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(session.calls['news'], 1)
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all(_ is results[0] for _ in results))
+
+    def test_concurrent_prefetch(self):
+        session = Session(delay=0.05)
+        launcher = LauncherAPI(session)
+        threads = [threading.Thread(target=launcher.prefetch) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(session.calls['news'], 1)
+        self.assertEqual(session.calls['patchNotes'], len(DEFAULT_CHANNELS))
+        self.assertEqual(session.calls['release'], len(DEFAULT_CHANNELS))
+
+    def test_failure_is_not_cached(self):
+        session = Session()
+        launcher = LauncherAPI(session)
+        session.query_api = lambda api, json=None: (False, {'msg': 'unavailable'})
+        with self.assertRaises(ValueError):
+            launcher.news()
+        self.assertIsInstance(launcher.prefetch(include_release=False)['errors'][('news', None)], ValueError)
+        del session.query_api
+        self.assertEqual(launcher.news()['game_id'], 'SC')
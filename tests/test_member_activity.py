@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.member_activity`."""
+
+import unittest
+
+from rsi.member_activity import parse_last_online, LAST_ONLINE_UNITS
+
+NOW = 1700000000
+HOUR, DAY = LAST_ONLINE_UNITS['hour'], LAST_ONLINE_UNITS['day']
+
+
+class TestParseLastOnline(unittest.TestCase):
+    """Tests for `parse_last_online`."""
+
+    def test_ago(self):
+        self.assertEqual(parse_last_online('3 days ago', now=NOW), (NOW - 3 * DAY, DAY))
+        self.assertEqual(parse_last_online('an hour ago', now=NOW), (NOW - HOUR, HOUR))
+        self.assertEqual(parse_last_online('1 week ago', now=NOW), (NOW - 7 * DAY, 7 * DAY))
+        self.assertEqual(parse_last_online('  Last online:\n 2 Months  ago ', now=NOW), (NOW - 60 * DAY, 30 * DAY))
+
+    def test_less_than(self):
+        self.assertEqual(parse_last_online('less than an hour ago', now=NOW), (NOW, HOUR))
+        self.assertEqual(parse_last_online('Less than 5 minutes ago', now=NOW), (NOW, 300))
+
+    def test_more_than(self):
+        self.assertEqual(parse_last_online('more than a year ago', now=NOW), (NOW - 365 * DAY, None))
+        self.assertEqual(parse_last_online('over than 2 years ago', now=NOW), (NOW - 730 * DAY, None))
+
+    def test_relative_days(self):
+        self.assertEqual(parse_last_online('Online now', now=NOW), (NOW, 60))
+        self.assertEqual(parse_last_online('just now', now=NOW), (NOW, 60))
+        self.assertEqual(parse_last_online('today', now=NOW), (NOW, DAY))
+        self.assertEqual(parse_last_online('Yesterday', now=NOW), (NOW - DAY, DAY))
+
+    def test_unparsable(self):
+        for text in (None, '', '   ', 'never', 'Never logged in', 'a while back', 'days ago'):
+            self.assertIsNone(parse_last_online(text, now=NOW), text)
+
+    def test_default_now(self):
+        timestamp, resolution = parse_last_online('2 hours ago')
+        self.assertEqual(resolution, HOUR)
+        self.assertGreater(timestamp, NOW)
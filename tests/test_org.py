@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.org`."""
+
+import gc
+import asyncio
+import unittest
+from unittest import mock
+
+from rsi import org as org_module
+from rsi.org import OrgAPI, RosterIndex, RosterRegistry
+from rsi.citizen import fetch_citizen_orgs
+from rsi.session import RSISession
+from rsi.standin import StandinServer
+from rsi.deadline import Deadline, current_deadline
+from rsi.exceptions import DeadlineExceeded
+
+ROSTER_SIZE = 200
+PAGE_SIZE = 32
+
+
+class RecordingSession(RSISession):
+    """ Session recording the deadline active for every request """
+
+    def __init__(self, *args, **kwargs):
+        super(RecordingSession, self).__init__(*args, **kwargs)
+        self.deadlines = []
+
+    def request(self, method, url, *args, **kwargs):
+        self.deadlines.append(current_deadline())
+        return super(RecordingSession, self).request(method, url, *args, **kwargs)
+
+
+class StandinTestCase(unittest.TestCase):
+    roster_size = ROSTER_SIZE
+
+    @classmethod
+    def setUpClass(cls):
+        cls.standin = StandinServer(roster_size=cls.roster_size, page_size=PAGE_SIZE).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.standin.stop()
+
+    def setUp(self):
+        patcher = mock.patch.object(org_module, 'MEMBERS_PAGE_DELAY', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.session = RecordingSession(url=self.standin.url, persist_session=False)
+
+    def org(self, symbol='ORG1', **kwargs):
+        return OrgAPI(symbol, session=self.session, url=self.standin.url, **kwargs)
+
+    def visible(self, symbol='ORG1'):
+        return [_['handle'] for _ in self.standin.roster(symbol) if not _['hidden']]
+
+
+class TestIterMembers(StandinTestCase):
+    """Tests for `OrgAPI.iter_members` and `OrgAPI.aiter_members`."""
+
+    def test_iter_members(self):
+        org = self.org()
+        progress = []
+        handles = [_['handle'] for _ in org.iter_members(progress=lambda *args: progress.append(args))]
+        self.assertEqual(handles, self.visible())
+        self.assertEqual(org.hidden_members, ROSTER_SIZE - len(handles))
+        self.assertEqual(progress[-1][1:], (ROSTER_SIZE, ROSTER_SIZE))
+        self.assertEqual([_['handle'] for _ in org.members], handles)
+
+    def test_stream_parse(self):
+        handles = [_['handle'] for _ in self.org(stream_parse=True).iter_members()]
+        self.assertEqual(handles, self.visible())
+
+    def test_lazy(self):
+        org = self.org()
+        requests = len(self.session.deadlines)
+        members = org.iter_members()
+        next(members)
+        # only the first page is fetched before the first member is handed out
+        self.assertEqual(len(self.session.deadlines) - requests, 1)
+        members.close()
+
+    def test_deadline(self):
+        org = self.org()
+        members = []
+        with self.assertRaises(DeadlineExceeded):
+            with Deadline(60) as deadline:
+                for member in org.iter_members():
+                    members.append(member)
+                    if len(members) == 10:
+                        deadline.cancel()
+        # the page being handed out when the deadline was cancelled is finished
+        self.assertEqual(len(members), sum(1 for _ in self.standin.roster('ORG1')[:PAGE_SIZE] if not _['hidden']))
+
+
+class TestIterMembersMemory(StandinTestCase):
+    """Tests for the memory of `OrgAPI.iter_members`."""
+    roster_size = 1000
+
+    @staticmethod
+    def live_members():
+        # parsed members, the stand-in's own roster entries have `hidden` instead of `avatar`
+        return sum(1 for _ in gc.get_objects() if isinstance(_, dict) and 'avatar' in _ and 'handle' in _)
+
+    def test_flat_memory(self):
+        org = self.org()
+        gc.collect()
+        baseline = self.live_members()
+        live = []
+        for i, member in enumerate(org.iter_members()):
+            if i % 300 == 299:
+                live.append(self.live_members() - baseline)
+        # at most about a page of members is held at any time, not the roster
+        self.assertEqual(len(live), len(self.visible()) // 300)
+        self.assertTrue(all(_ <= 2 * PAGE_SIZE for _ in live), live)
+
+        members = list(org.iter_members())
+        self.assertGreaterEqual(self.live_members() - baseline, len(members))
+
+
+class TestAsyncIterMembers(StandinTestCase):
+    """Tests for `OrgAPI.aiter_members`."""
+
+    def collect(self, org, deadline=None, cancel_after=None):
+        async def _collect():
+            members = []
+            async for member in org.aiter_members():
+                members.append(member)
+                if cancel_after is not None and len(members) == cancel_after:
+                    deadline.cancel()
+            return members
+
+        async def _run():
+            if deadline is None:
+                return await _collect()
+            with deadline:
+                return await _collect()
+        return asyncio.run(_run())
+
+    def test_same_as_iter_members(self):
+        org = self.org()
+        self.assertEqual(self.collect(org), list(org.iter_members()))
+
+    def test_deadline_reaches_fetches(self):
+        org = self.org()
+        self.session.deadlines = []
+        deadline = Deadline(60)
+        self.collect(org, deadline=deadline)
+        self.assertTrue(self.session.deadlines)
+        self.assertTrue(all(_ is deadline for _ in self.session.deadlines))
+
+    def test_deadline_checked_between_pages(self):
+        org = self.org()
+        with self.assertRaises(DeadlineExceeded):
+            self.collect(org, deadline=Deadline(60), cancel_after=10)
+
+
+def roster_member(handle, rank='Member', roles=(), affiliate=False, visibility='Membership: Visible'):
+    return {'handle': handle, 'rank': rank, 'roles': list(roles), 'affiliate': affiliate, 'visibility': visibility}
+
+
+class TestRosterIndex(unittest.TestCase):
+    """Tests for `RosterIndex`."""
+
+    def setUp(self):
+        self.members = [
+            roster_member('Alpha', rank='Officer', roles=['Founder', 'Recruitment']),
+            roster_member('bravo', roles=['Recruitment'], affiliate=True),
+            roster_member('Charlie', rank='officer', roles=['Logistics'], visibility='Membership: Hidden'),
+            roster_member('delta'),
+        ]
+        self.index = RosterIndex(self.members)
+
+    def handles(self, **filters):
+        return [_['handle'] for _ in self.index.find(**filters)]
+
+    def test_member(self):
+        self.assertIs(self.index.member('ALPHA'), self.members[0])
+        self.assertIs(self.index.member('bravo'), self.members[1])
+        self.assertIsNone(self.index.member('echo'))
+
+    def test_find(self):
+        self.assertEqual(self.handles(), ['Alpha', 'bravo', 'Charlie', 'delta'])
+        self.assertEqual(self.handles(rank='OFFICER'), ['Alpha', 'Charlie'])
+        self.assertEqual(self.handles(role='recruitment'), ['Alpha', 'bravo'])
+        self.assertEqual(self.handles(affiliate=True), ['bravo'])
+        self.assertEqual(self.handles(affiliate=False), ['Alpha', 'Charlie', 'delta'])
+        self.assertEqual(self.handles(visibility='membership: hidden'), ['Charlie'])
+
+    def test_find_combined(self):
+        self.assertEqual(self.handles(rank='Officer', role='Recruitment'), ['Alpha'])
+        self.assertEqual(self.handles(role=['Recruitment', 'Founder']), ['Alpha'])
+        self.assertEqual(self.handles(rank='Member', affiliate=False), ['delta'])
+        self.assertEqual(self.handles(rank='Officer', role='Missing'), [])
+        self.assertEqual(self.handles(rank='Admiral'), [])
+
+    def test_same_as_scan(self):
+        standin = StandinServer(roster_size=300)
+        self.addCleanup(standin.httpd.server_close)
+        members = [roster_member(_['handle'], rank=_['rank'], roles=_['roles'], affiliate=_['affiliate'])
+                   for _ in standin.roster('ORG3')]
+        index = RosterIndex(members)
+        ranks = {_['rank'] for _ in members}
+        roles = {role for _ in members for role in _['roles']}
+        self.assertTrue(len(ranks) > 1 and roles)
+        for rank in ranks:
+            for role in roles:
+                for affiliate in (True, False, None):
+                    expected = [_ for _ in members if _['rank'] == rank and role in _['roles'] and
+                                (affiliate is None or _['affiliate'] == affiliate)]
+                    self.assertEqual(index.find(rank=rank.upper(), role=role, affiliate=affiliate), expected)
+
+
+class TestRosterRegistry(StandinTestCase):
+    """Tests for `RosterRegistry`."""
+
+    def setUp(self):
+        super(TestRosterRegistry, self).setUp()
+        self.handle = self.visible('ORG2')[3]
+
+    def citizen_orgs(self, rosters=None):
+        before = self.standin.requests
+        orgs = fetch_citizen_orgs(self.handle, url=self.standin.url, session=self.session, rosters=rosters)
+        return orgs, self.standin.requests - before
+
+    def test_lookups(self):
+        rosters = RosterRegistry()
+        org = rosters.track(self.org('ORG2'))
+        self.assertIn('org2', rosters)
+        self.assertIsNone(rosters.member('ORG2', self.handle))
+        self.assertIsNone(rosters.member('ORG3', self.handle))
+
+        org.members
+        self.assertEqual(rosters.member('org2', self.handle.upper())['handle'], self.handle)
+        self.assertIsNone(rosters.member('ORG2', 'someone_else'))
+        stats = rosters.stats()
+        self.assertEqual(stats['tracked'], ['ORG2'])
+        self.assertEqual({_: stats[_] for _ in ('hits', 'misses', 'not_cached', 'untracked')},
+                         {'hits': 1, 'misses': 1, 'not_cached': 1, 'untracked': 1})
+        self.assertEqual(rosters.requests_avoided, 1)
+
+        self.assertIs(rosters.untrack('ORG2'), org)
+        self.assertIsNone(rosters.member('ORG2', self.handle))
+
+    def test_requests_avoided(self):
+        expected, requests = self.citizen_orgs()
+        rosters = RosterRegistry()
+        rosters.track(self.org('ORG2')).members
+
+        orgs, roster_requests = self.citizen_orgs(rosters)
+        member = next(_ for _ in self.standin.roster('ORG2') if _['handle'] == self.handle)
+        self.assertEqual(orgs[0]['sid'], 'ORG2')
+        self.assertEqual((orgs[0]['rank'], orgs[0]['roles']), (member['rank'], member['roles']))
+        self.assertEqual(orgs[1:], expected[1:])
+        # the roles in ORG2 came from its roster instead of a getOrgMembers search
+        self.assertEqual(rosters.requests_avoided, 1)
+        self.assertEqual(roster_requests, requests - 1)
+
+    def test_fetch_rosters(self):
+        rosters = RosterRegistry(fetch_rosters=True)
+        org = rosters.track(self.org('ORG2'))
+        self.assertIsNone(org.cached_roster())
+        self.assertEqual(rosters.member('ORG2', self.handle)['handle'], self.handle)
+        self.assertIsNotNone(org.cached_roster())
+        self.assertEqual(rosters.requests_avoided, 1)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.parse_cache`."""
+
+import pickle
+import unittest
+
+from rsi.parse_cache import ParseCache, cached_parse
+
+
+calls = []
+
+
+def parse_words(payload, prefix=''):
+    calls.append(payload)
+    return {'words': [prefix + _ for _ in payload.split()]}
+
+
+class TestParseCache(unittest.TestCase):
+    """Tests for `ParseCache`."""
+
+    def setUp(self):
+        self.cache = ParseCache()
+        calls.clear()
+
+    def test_hit(self):
+        first = self.cache.parse('page', 'a b', parse_words)
+        second = self.cache.parse('page', 'a b', parse_words)
+        self.assertEqual(second, {'words': ['a', 'b']})
+        self.assertEqual(len(calls), 1)
+        # every caller gets its own copy
+        second['words'].append('c')
+        self.assertEqual(self.cache.parse('page', 'a b', parse_words), first)
+        self.assertEqual(self.cache.stats()['hits'], 2)
+
+    def test_miss(self):
+        self.cache.parse('page', 'a b', parse_words)
+        self.assertEqual(self.cache.parse('page', 'a b c', parse_words), {'words': ['a', 'b', 'c']})
+        self.assertEqual(self.cache.parse('other', 'a b c', parse_words), {'words': ['a', 'b', 'c']})
+        self.assertEqual(self.cache.parse('page', 'a b c', parse_words, prefix='x'), {'words': ['xa', 'xb', 'xc']})
+        self.assertEqual(self.cache.parse('page', b'a b c'.decode(), parse_words), {'words': ['a', 'b', 'c']})
+        self.assertEqual(len(calls), 4)
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 4, 3))
+        self.assertEqual(stats['hit_rate'], 0.2)
+
+    def test_get_put(self):
+        digest = ParseCache.digest('body')
+        self.assertEqual(digest, ParseCache.digest(b'body'))
+        with self.assertRaises(KeyError):
+            self.cache.get('key', digest)
+        self.cache.put('key', digest, [1, 2])
+        self.assertEqual(self.cache.get('key', digest), [1, 2])
+        with self.assertRaises(KeyError):
+            self.cache.get('key', ParseCache.digest('changed'))
+
+    def test_eviction(self):
+        entry_size = len(pickle.dumps({'words': ['a', 'b']}, protocol=pickle.HIGHEST_PROTOCOL))
+        cache = ParseCache(maxbytes=entry_size * 3)
+        for key in ('one', 'two', 'three'):
+            cache.parse(key, 'a b', parse_words)
+        cache.parse('one', 'a b', parse_words)      # most recently used now
+        cache.parse('four', 'a b', parse_words)
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['bytes'], entry_size * 3)
+
+        parsed = len(calls)
+        cache.parse('one', 'a b', parse_words)
+        self.assertEqual(len(calls), parsed)
+        cache.parse('two', 'a b', parse_words)
+        self.assertEqual(len(calls), parsed + 1)
+
+    def test_too_large(self):
+        cache = ParseCache(maxbytes=10)
+        cache.parse('page', 'a b c d e f', parse_words)
+        cache.parse('page', 'a b c d e f', parse_words)
+        self.assertEqual((len(cache), cache.size, len(calls)), (0, 0, 2))
+
+    def test_invalidate(self):
+        self.cache.parse('one', 'a', parse_words)
+        self.cache.parse('two', 'b', parse_words)
+        self.cache.parse('one', 'a', parse_words, prefix='x')
+        self.cache.invalidate('one')
+        self.assertEqual(len(self.cache), 1)
+        self.cache.parse('one', 'a', parse_words, prefix='x')
+        self.cache.parse('one', 'a', parse_words)
+        self.cache.parse('two', 'b', parse_words)
+        self.assertEqual(len(calls), 5)
+        self.cache.invalidate()
+        self.assertEqual((len(self.cache), self.cache.size), (0, 0))
+
+    def test_cached_parse(self):
+        class Session(object):
+            parse_cache = None
+
+        session = Session()
+        cached_parse(session, 'page', 'a', parse_words)
+        cached_parse(session, 'page', 'a', parse_words)
+        self.assertEqual(len(calls), 2)
+        session.parse_cache = self.cache
+        cached_parse(session, 'page', 'a', parse_words)
+        cached_parse(session, 'page', 'a', parse_words)
+        self.assertEqual(len(calls), 3)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.parse_executor`."""
+
+import os
+import time
+import threading
+import unittest
+
+from rsi.parse_executor import ParseExecutor, run_parse
+
+THRESHOLD = 100
+
+
+def parse_pid(payload, seconds=0):
+    """ Module level, so it can be run in the pool """
+    time.sleep(seconds)
+    return len(payload), os.getpid()
+
+
+def parse_fail(payload):
+    raise ValueError(payload[:10])
+
+
+class TestParseExecutor(unittest.TestCase):
+    """Tests for `ParseExecutor`."""
+
+    def setUp(self):
+        self.executor = ParseExecutor(max_workers=1, max_pending=1, inline_threshold=THRESHOLD)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_inline_below_threshold(self):
+        self.assertEqual(self.executor.parse(parse_pid, 'x' * (THRESHOLD - 1)), (THRESHOLD - 1, os.getpid()))
+        self.assertEqual((self.executor.inline, self.executor.offloaded), (1, 0))
+        self.assertIsNone(self.executor._pool)
+
+    def test_offloaded_from_threshold(self):
+        size, pid = self.executor.parse(parse_pid, 'x' * THRESHOLD)
+        self.assertEqual(size, THRESHOLD)
+        self.assertNotEqual(pid, os.getpid())
+        self.assertEqual((self.executor.inline, self.executor.offloaded), (0, 1))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            self.executor.parse(parse_fail, 'small')
+        with self.assertRaises(ValueError):
+            self.executor.parse(parse_fail, 'x' * THRESHOLD)
+        # the failed parse gave its slot back
+        self.assertEqual(self.executor.parse(parse_pid, 'x' * THRESHOLD)[0], THRESHOLD)
+
+    def test_backpressure(self):
+        self.executor.parse(parse_pid, 'x' * THRESHOLD)     # start the worker process
+        first = self.executor.submit(parse_pid, 'x' * THRESHOLD, 0.5)
+        submitted = []
+
+        def submit():
+            self.executor.submit(parse_pid, 'y' * THRESHOLD)
+            submitted.append(first.done())
+        thread = threading.Thread(target=submit)
+        thread.start()
+        thread.join(0.2)
+        # the second submit waits for the first parse to free its slot
+        self.assertTrue(thread.is_alive())
+        thread.join(10)
+        self.assertEqual(submitted, [True])
+
+        # small payloads don't take a slot
+        blocker = self.executor.submit(parse_pid, 'x' * THRESHOLD, 0.5)
+        self.assertEqual(self.executor.parse(parse_pid, 'small')[0], 5)
+        self.assertFalse(blocker.done())
+        blocker.result()
+
+    def test_map(self):
+        payloads = ['x' * (THRESHOLD + _) if _ % 2 else 'y' * _ for _ in range(6)]
+        self.assertEqual([_[0] for _ in self.executor.map(parse_pid, payloads)], [len(_) for _ in payloads])
+
+    def test_run_parse(self):
+        self.assertEqual(run_parse(None, parse_pid, 'x' * THRESHOLD), (THRESHOLD, os.getpid()))
+        self.assertNotEqual(run_parse(self.executor, parse_pid, 'x' * THRESHOLD)[1], os.getpid())
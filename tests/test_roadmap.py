@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.roadmap`."""
+
+import random
+import unittest
+from datetime import date, datetime
+
+from rsi.roadmap import IntervalIndex, RoadmapModel
+
+
+def allocation(start, end, discipline, members):
+    return {'startDate': start, 'endDate': end, 'discipline': {'title': discipline, 'countMembers': members}}
+
+
+ROADMAP = [
+    {'title': 'Vehicle', 'deliverables': [
+        {'title': 'Ship A', 'startDate': '2024-01-01', 'endDate': '2024-01-14', 'projects': [{'title': 'SC'}],
+         'timeAllocations': [allocation('2024-01-01', '2024-01-07', 'Art', 2),
+                             allocation('2024-01-05', '2024-01-14T00:00:00', 'Design', 1)]},
+    ]},
+    {'title': 'Systems', 'deliverables': [
+        {'title': 'Feature B', 'startDate': '2024-01-10', 'endDate': '2024-02-10',
+         'projects': [{'title': 'SC'}, {'title': 'SQ42'}],
+         'timeAllocations': [allocation('2024-01-10', '2024-02-10', 'Art', 3)]},
+        {'title': 'Later', 'startDate': '2024-03-01', 'endDate': '2024-03-31', 'timeAllocations': None},
+    ]},
+]
+
+
+class TestIntervalIndex(unittest.TestCase):
+    """Tests for `IntervalIndex`."""
+
+    def test_overlapping(self):
+        index = IntervalIndex([(5, 10, 'b'), (1, 3, 'a'), (4, 4, 'point'), (8, 20, 'c'), (12, 15, 'd')])
+        self.assertEqual(len(index), 5)
+        self.assertEqual(index.overlapping(3, 5), ['a', 'point', 'b'])
+        self.assertEqual(index.overlapping(11, 11), ['c'])
+        self.assertEqual(index.overlapping(10, 12), ['b', 'c', 'd'])
+        self.assertEqual(index.overlapping(21, 30), [])
+        self.assertEqual(index.overlapping(-5, 0), [])
+        self.assertEqual(index.containing(4), ['point'])
+        self.assertEqual(IntervalIndex([]).overlapping(0, 100), [])
+
+    def test_same_as_scan(self):
+        rng = random.Random(3)
+        intervals = []
+        for i in range(500):
+            start = rng.randint(0, 1000)
+            intervals.append((start, start + int(rng.expovariate(1 / 20)), i))
+        index = IntervalIndex(intervals)
+        ordered = sorted(intervals, key=lambda _: _[0])
+        for _ in range(200):
+            start = rng.randint(-10, 1050)
+            end = start + rng.randint(0, 50)
+            expected = [v for s, e, v in ordered if s <= end and e >= start]
+            self.assertEqual(index.overlapping(start, end), expected)
+
+
+class TestRoadmapModel(unittest.TestCase):
+    """Tests for `RoadmapModel`."""
+
+    def setUp(self):
+        self.model = RoadmapModel(ROADMAP)
+
+    def test_between(self):
+        self.assertEqual(self.model.teams, ['Vehicle', 'Systems'])
+        self.assertEqual([_['title'] for _ in self.model.deliverables_between('2024-01-12', date(2024, 1, 12))],
+                         ['Ship A', 'Feature B'])
+        self.assertEqual([_['title'] for _ in self.model.deliverables_between(datetime(2024, 2, 11), '2024-12-31')],
+                         ['Later'])
+        self.assertEqual([_['discipline'] for _ in self.model.allocations_between('2024-01-06', '2024-01-08')],
+                         ['Art', 'Design'])
+
+    def test_allocated(self):
+        buckets, result = self.model.allocated('2024-01-01', '2024-01-14', bucket_days=7)
+        self.assertEqual(buckets, [date(2024, 1, 1), date(2024, 1, 8)])
+        # Art: 2 members for 7 days, then 3 from the 10th; Design: 1 member from the 5th to the 14th
+        self.assertEqual(result, {'Art': [14, 15], 'Design': [3, 7]})
+
+    def test_allocated_partial_bucket(self):
+        buckets, result = self.model.allocated('2024-02-05', '2024-02-15', bucket_days=7, by='team')
+        self.assertEqual(buckets, [date(2024, 2, 5), date(2024, 2, 12)])
+        self.assertEqual(result, {'Systems': [18, 0]})
+
+    def test_allocated_by_project(self):
+        _, result = self.model.allocated('2024-01-01', '2024-01-10', bucket_days=10, by='project')
+        self.assertEqual(result, {'SC': [14 + 6 + 3], 'SQ42': [3]})
+
+    def test_busy_disciplines(self):
+        self.assertEqual(self.model.busy_disciplines('2024-01-01', '2024-01-31'), {'Art': 3, 'Design': 1})
+        self.assertEqual(self.model.busy_disciplines('2024-03-01', '2024-03-31'), {})
+
+    def test_allocated_weeks(self):
+        _, result = self.model.allocated_weeks('2024-01-01', '2024-01-07')
+        self.assertEqual(result, {'Art': [2], 'Design': [3 / 7]})
+
+    def test_allocated_invalid(self):
+        with self.assertRaises(ValueError):
+            self.model.allocated('2024-01-01', '2024-01-31', by='member')
+        with self.assertRaises(ValueError):
+            self.model.allocated('2024-01-01', '2024-01-31', bucket_days=0)
+        with self.assertRaises(ValueError):
+            self.model.allocated('2024-01-31', '2024-01-01')
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.rsi`."""
+
+import threading
+import unittest
+from collections import Counter
+
+from rsi.rsi import RSISite
+from rsi.session import RSISession
+
+
+class TestSnapshot(unittest.TestCase):
+    """Tests for `RSISite.snapshot`."""
+
+    def setUp(self):
+        self.site = RSISite(RSISession(persist_session=False))
+        self.addCleanup(self.site.close)
+        self.fetches = Counter()
+        self.release = threading.Event()
+        self.failing = set()
+        self.site._snapshot_source = self.source
+
+    def source(self, source):
+        self.fetches[source] += 1
+        if source == 'slow':
+            self.release.wait(10)
+        if source in self.failing:
+            raise ConnectionError('{} is down'.format(source))
+        return '{} #{}'.format(source, self.fetches[source])
+
+    def test_ok(self):
+        snapshot = self.site.snapshot(['status', 'news'], deadline=5)
+        self.assertTrue(snapshot['complete'])
+        self.assertEqual(snapshot['sources']['status']['state'], 'ok')
+        self.assertEqual(snapshot['sources']['news']['data'], 'news #1')
+        self.assertIsNone(snapshot['sources']['news']['error'])
+
+    def test_reuses_fresh_values(self):
+        self.site.snapshot(['status'], deadline=5)
+        snapshot = self.site.snapshot(['status'], deadline=5)
+        self.assertEqual(snapshot['sources']['status']['data'], 'status #1')
+        self.assertEqual(self.fetches['status'], 1)
+        snapshot = self.site.snapshot(['status'], deadline=5, max_age=0)
+        self.assertEqual(snapshot['sources']['status']['data'], 'status #2')
+
+    def test_missing(self):
+        snapshot = self.site.snapshot(['status', 'slow'], deadline=0.1)
+        self.assertFalse(snapshot['complete'])
+        self.assertEqual(snapshot['sources']['status']['state'], 'ok')
+        slow = snapshot['sources']['slow']
+        self.assertEqual((slow['state'], slow['data'], slow['age'], slow['error']),
+                         ('missing', None, None, 'timed out'))
+
+        # still loading, it is not fetched a second time
+        self.site.snapshot(['slow'], deadline=0.05)
+        self.assertEqual(self.fetches['slow'], 1)
+        self.release.set()
+        self.assertEqual(self.site.snapshot(['slow'], deadline=5)['sources']['slow']['data'], 'slow #1')
+
+    def test_stale(self):
+        self.site.snapshot(['status'], deadline=5)
+        self.failing.add('status')
+        snapshot = self.site.snapshot(['status', 'news'], deadline=5, max_age=0)
+        self.assertFalse(snapshot['complete'])
+        status = snapshot['sources']['status']
+        self.assertEqual((status['state'], status['data']), ('stale', 'status #1'))
+        self.assertIn('status is down', status['error'])
+        self.assertGreaterEqual(status['age'], 0)
+
+    def test_failure_without_value_is_missing(self):
+        self.failing.add('news')
+        news = self.site.snapshot(['news'], deadline=5)['sources']['news']
+        self.assertEqual((news['state'], news['data']), ('missing', None))
+        self.assertIn('news is down', news['error'])
+
+    def test_close(self):
+        self.site.snapshot(['status'], deadline=5)
+        workers = [_ for _ in threading.enumerate() if _.name.startswith('rsi-snapshot')]
+        self.assertTrue(workers)
+        self.site.close()
+        for worker in workers:
+            worker.join(5)
+        self.assertFalse(any(_.is_alive() for _ in workers))
+        # a closed site starts new workers for the next snapshot
+        self.assertEqual(self.site.snapshot(['news'], deadline=5)['sources']['news']['state'], 'ok')
+
+
+class TestSnapshotSources(unittest.TestCase):
+    """Tests for the sources of `RSISite.snapshot`."""
+
+    def test_ship_count(self):
+        site = RSISite(RSISession(persist_session=False))
+        self.addCleanup(site.close)
+        self.assertFalse(site._ship_summary._enable_ship_models)
+        self.assertFalse(site._ship_summary._enable_pledges)
+        site._ship_summary._ttlcache['ships'] = {1: {}, 2: {}}
+        self.assertEqual(site._snapshot_source('ship_count'), 2)
+        # ships already cached with their models are counted instead
+        site.ships._ttlcache['ships'] = {1: {}, 2: {}, 3: {}}
+        self.assertEqual(site._snapshot_source('ship_count'), 3)
+
+    def test_unknown(self):
+        site = RSISite(RSISession(persist_session=False))
+        with self.assertRaises(ValueError):
+            site._snapshot_source('weather')
+
+
+class TestSearch(unittest.TestCase):
+    """Tests for `RSISite.search`."""
+
+    def test_lazy_index(self):
+        site = RSISite(RSISession(persist_session=False))
+        self.assertIsNone(site._search_index)
+        self.assertEqual(site.search('carrack'), [])
+        self.assertIs(site.search_index, site._search_index)
+        self.assertEqual(len(site.ships.refresh_listeners), 1)
+
+    def test_search_flag(self):
+        site = RSISite(RSISession(persist_session=False), search=True)
+        self.assertIsNotNone(site._search_index)
+        site.ships._ttlcache['ships'] = {7: {'name': 'Carrack'}}
+        site.search_index.refresh()
+        self.assertEqual([_[1:3] for _ in site.search('carrack')], [('ship', 7)])
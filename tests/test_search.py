@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.search`."""
+
+import unittest
+from unittest import mock
+
+from rsi import search
+from rsi.search import SearchIndex
+
+
+class Ships(object):
+    """ Stand-in for a `ShipMatrixAPI` whose cache is filled by another process """
+
+    def __init__(self):
+        self.refresh_listeners = []
+        self.cached = None
+        self.reads = 0
+
+    def cached_ships(self):
+        self.reads += 1
+        for listener in self.refresh_listeners:
+            listener(self.cached or {})
+        return self.cached
+
+
+class TestSearchIndex(unittest.TestCase):
+    """Tests for `SearchIndex`."""
+
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.update('ship', [(1, 'Carrack', 'Anvil exploration', None),
+                                   (2, 'Constellation Andromeda', 'RSI multi crew', {'id': 2}),
+                                   (3, 'Cutlass Black', 'Drake', None)])
+        self.index.add('sku', 'carrack', 'Carrack Standalone')
+
+    def ids(self, query, **kwargs):
+        return [(kind, id) for _, kind, id, _ in self.index.search(query, **kwargs)]
+
+    def test_search(self):
+        self.assertEqual(self.ids('carrack', kinds=['ship']), [('ship', 1)])
+        self.assertEqual(self.ids('andro')[0], ('ship', 2))
+        self.assertEqual(self.index.search('cutlass')[0][3], 'Cutlass Black')
+        self.assertEqual(self.index.search('andromeda')[0][3], {'id': 2})
+
+    def test_update_only_changed(self):
+        changed, removed = self.index.update('ship', [(1, 'Carrack', 'Anvil exploration', None),
+                                                      (3, 'Cutlass Black', 'Drake', 'new payload')])
+        self.assertEqual((changed, removed), (0, 0))
+        self.assertEqual(self.index.search('cutlass')[0][3], 'new payload')
+        self.assertEqual(self.index.update('ship', [(3, 'Cutlass Red', 'Drake', None)]), (1, 0))
+        self.assertEqual(self.ids('cutlass red')[0], ('ship', 3))
+
+    def test_update_complete(self):
+        changed, removed = self.index.update('ship', [(1, 'Carrack', 'Anvil exploration', None),
+                                                      (4, 'Hammerhead', 'Aegis', None)], complete=True)
+        self.assertEqual((changed, removed), (1, 2))
+        self.assertEqual(len(self.index), 3)
+        self.assertNotIn(('ship', 2), self.index)
+        self.assertEqual(self.ids('andromeda', kinds=['ship'], min_score=0.1), [])
+        self.assertEqual(self.ids('cutlass', kinds=['ship'], min_score=0.1), [])
+        # other kinds are left alone
+        self.assertIn(('sku', 'carrack'), self.index)
+        self.assertEqual(self.ids('hammerhead'), [('ship', 4)])
+
+    def test_update_complete_empty(self):
+        self.assertEqual(self.index.update('ship', [], complete=True), (0, 3))
+        self.assertEqual(self.index.kinds(), ['sku'])
+        self.assertFalse(any(kind == 'ship' for kind, _ in self.index._titles))
+        self.assertFalse(any(kind == 'ship' for kind, _ in self.index._bodies))
+
+    def test_remove(self):
+        self.assertTrue(self.index.remove('sku', 'carrack'))
+        self.assertFalse(self.index.remove('sku', 'carrack'))
+        self.assertEqual(self.ids('carrack'), [('ship', 1)])
+
+    def test_unchanged_not_reindexed(self):
+        with mock.patch.object(search, '_Document', wraps=search._Document) as document:
+            self.index.update('ship', [(1, 'Carrack', 'Anvil exploration', {'id': 1}),
+                                       (3, 'Cutlass Red', 'Drake', None)])
+        self.assertEqual(document.call_count, 1)
+        self.assertEqual(self.index.search('carrack', kinds=['ship'])[0][3], {'id': 1})
+
+    def test_attached_ships(self):
+        ships = Ships()
+        ships.cached = {7: {'name': 'Hammerhead', 'manufacturer': {'name': 'Aegis'}}}
+        self.index.attach(ships=ships)
+        # what is cached when attaching is indexed right away, searches don't read the source
+        self.assertEqual(self.ids('hammerhead'), [('ship', 7)])
+        self.assertEqual(ships.reads, 1)
+
+        ships.cached = {8: {'name': 'Reclaimer', 'manufacturer': {'name': 'Aegis'}}}
+        self.assertEqual(self.ids('reclaimer'), [])
+        self.index.refresh()
+        self.assertEqual(self.ids('reclaimer'), [('ship', 8)])
+        self.assertNotIn(('ship', 7), self.index)
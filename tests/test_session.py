@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.session`."""
+
+import queue
+import threading
+import unittest
+from unittest import mock
+
+from rsi.session import RSISession, RSISessionPool, PooledRSISession
+
+TIMEOUT = 5
+
+
+def fake_authenticate(session, username, password, force=False):
+    session._update_session('Rsi-Token', 'token-of-{}'.format(username), save=False)
+    return True
+
+
+class TestRSISessionPool(unittest.TestCase):
+    """Tests for `RSISessionPool`."""
+
+    def setUp(self):
+        patcher = mock.patch.object(PooledRSISession, 'authenticate', fake_authenticate)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def pool(self, size, **kwargs):
+        pool = RSISessionPool(size=size, session=RSISession(persist_session=False, **kwargs))
+        self.addCleanup(pool.close)
+        return pool
+
+    def run_thread(self, target, *args):
+        results = queue.Queue()
+        thread = threading.Thread(target=lambda: results.put(target(*args)), daemon=True)
+        thread.start()
+        return thread, results
+
+    def test_shared_auth_state(self):
+        pool = self.pool(2)
+        with pool.session() as first:
+            self.assertTrue(pool.authenticate('alpha', 'secret'))
+            first._sync()
+            self.assertEqual(first.headers['X-Rsi-Token'], 'token-of-alpha')
+        self.assertEqual(pool.auth_state()[3], {'X-Rsi-Token': 'token-of-alpha'})
+
+    def test_sessions_inherit_settings(self):
+        pool = self.pool(1, operation_timeout=30, timeout=7)
+        with pool.session() as s:
+            self.assertEqual((s.operation_timeout, s.timeout), (30, 7))
+
+    def test_exhausted(self):
+        pool = self.pool(1)
+        held = pool.acquire()
+        with self.assertRaises(queue.Empty):
+            pool.acquire(timeout=0.05)
+        pool.release(held)
+        self.assertIs(pool.acquire(timeout=0.05), held)
+
+    def test_authenticate_while_exhausted(self):
+        pool = self.pool(1)
+        held = pool.acquire()
+        # waits for the only session, which must not keep the held one from syncing and updating the token
+        thread, results = self.run_thread(pool.authenticate, 'alpha', 'secret')
+        thread.join(0.1)
+        self.assertTrue(thread.is_alive())
+        updater, _ = self.run_thread(held._update_session, 'Rsi-Token', 'token-of-bravo', False)
+        updater.join(TIMEOUT)
+        deadlocked = updater.is_alive()
+        pool.release(held)
+        self.assertFalse(deadlocked, 'the held session could not update the token')
+        self.assertEqual(held.headers['X-Rsi-Token'], 'token-of-bravo')
+        self.assertTrue(results.get(timeout=TIMEOUT))
+        thread.join(TIMEOUT)
+        self.assertEqual(pool.auth_state()[2], 'token-of-alpha')
+
+    def test_sync_during_login(self):
+        pool = self.pool(2)
+        logging_in, synced = threading.Event(), threading.Event()
+
+        def slow_authenticate(session, username, password, force=False):
+            logging_in.set()
+            # the other session has to sync and update the token while the login is running
+            self.assertTrue(synced.wait(TIMEOUT))
+            return fake_authenticate(session, username, password, force=force)
+
+        with mock.patch.object(PooledRSISession, 'authenticate', slow_authenticate):
+            thread, results = self.run_thread(pool.authenticate, 'alpha', 'secret')
+            self.assertTrue(logging_in.wait(TIMEOUT))
+            with pool.session(timeout=TIMEOUT) as s:
+                s._sync()
+                pool.update_session('Rsi-Token', 'token-of-bravo', save=False)
+                synced.set()
+            self.assertTrue(results.get(timeout=TIMEOUT))
+            thread.join(TIMEOUT)
+        self.assertEqual(pool.auth_state()[2], 'token-of-alpha')
+
+    def test_concurrent_logins_are_serialized(self):
+        pool = self.pool(4)
+        active, overlaps = [], []
+        lock = threading.Lock()
+
+        def counting_authenticate(session, username, password, force=False):
+            with lock:
+                active.append(username)
+                overlaps.append(len(active))
+            threading.Event().wait(0.02)
+            with lock:
+                active.remove(username)
+            return fake_authenticate(session, username, password, force=force)
+
+        with mock.patch.object(PooledRSISession, 'authenticate', counting_authenticate):
+            threads = [self.run_thread(pool.authenticate, 'user{}'.format(_), 'secret') for _ in range(4)]
+            self.assertTrue(all(results.get(timeout=TIMEOUT) for _, results in threads))
+        self.assertEqual(max(overlaps), 1)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.sku_history`."""
+
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from rsi.sku_history import SKUHistory
+
+
+def sku(title, price, stock='Available'):
+    return {'title': title, 'price': price, 'price_str': '${:.2f} USD'.format(price / 100), 'stock': stock,
+            'image': '/media/{}.jpg'.format(title), 'link': '/pledge/{}'.format(title)}
+
+
+class TestSKUHistory(unittest.TestCase):
+    """Tests for `SKUHistory`."""
+
+    def setUp(self):
+        self.history = SKUHistory(':memory:')
+        self.addCleanup(self.history.close)
+
+    def test_record_only_changes(self):
+        self.assertEqual(len(self.history.record([sku('Carrack', 60000), sku('Aurora', 2000)], observed_at=100)), 2)
+        self.assertEqual(self.history.record([sku('Carrack', 60000), sku('Aurora', 2000)], observed_at=200), [])
+        # fields that aren't tracked don't count as a change
+        self.assertEqual(self.history.record([dict(sku('Aurora', 2000), image='/other.jpg')], observed_at=300), [])
+        changed = self.history.record([('Carrack', sku('Carrack', 55000)), sku('Aurora', 2000)], observed_at=400)
+        self.assertEqual([_['title'] for _ in changed], ['Carrack'])
+        self.assertEqual(len(self.history.price_history('Carrack')), 2)
+        self.assertEqual(len(self.history.price_history('Aurora')), 1)
+        self.assertEqual(self.history.titles(), ['Aurora', 'Carrack'])
+
+    def test_state_survives_reopen(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'history.db')
+        history = SKUHistory(path)
+        history.record([sku('Carrack', 60000)], observed_at=100)
+        history.close()
+
+        history = SKUHistory(path)
+        self.addCleanup(history.close)
+        self.assertEqual(history.record([sku('Carrack', 60000)], observed_at=200), [])
+        self.assertEqual(len(history.record([sku('Carrack', 65000)], observed_at=300)), 1)
+
+    def test_price_history(self):
+        for observed_at, price in ((100, 60000), (200, 55000), (300, 65000)):
+            self.history.record([sku('Carrack', price)], product_id=72, observed_at=observed_at)
+        rows = self.history.price_history('Carrack')
+        self.assertEqual([(_['observed_at'], _['price'], _['prev_price']) for _ in rows],
+                         [(100, 60000, None), (200, 55000, 60000), (300, 65000, 55000)])
+        self.assertEqual(rows[0]['product_id'], '72')
+        self.assertEqual([_['price'] for _ in self.history.price_history('Carrack', since=200)], [55000, 65000])
+        self.assertEqual(self.history.price_history('Aurora'), [])
+
+    def test_lowest_price(self):
+        self.assertIsNone(self.history.lowest_price('Carrack'))
+        for observed_at, price in ((100, 60000), (200, 55000), (300, 65000), (400, 55000)):
+            self.history.record([sku('Carrack', price)], observed_at=observed_at)
+        lowest = self.history.lowest_price('Carrack')
+        self.assertEqual((lowest['price'], lowest['observed_at']), (55000, 200))
+
+    def test_lowest_price_ignores_unparsable(self):
+        self.history.record([dict(sku('Carrack', 60000), price='TBD')], observed_at=100)
+        self.assertIsNone(self.history.lowest_price('Carrack'))
+
+    def test_stock_changes(self):
+        now = time.time()
+        self.history.record([sku('Carrack', 60000), sku('Aurora', 2000)], product_id=1, observed_at=now - 7200)
+        self.history.record([sku('Carrack', 60000, 'Out of stock')], product_id=1, observed_at=now - 5000)
+        self.history.record([sku('Aurora', 2000, 'Limited'), sku('Carrack', 61000, 'Out of stock')], product_id=2,
+                            observed_at=now - 60)
+        self.assertEqual([(_['title'], _['prev_stock'], _['stock']) for _ in self.history.stock_changes()],
+                         [('Aurora', 'Available', 'Limited')])
+        self.assertEqual([_['title'] for _ in self.history.stock_changes(within=6000)], ['Carrack', 'Aurora'])
+        self.assertEqual([_['title'] for _ in self.history.stock_changes(within=6000, product_id=1)], ['Carrack'])
+        self.assertEqual([_['title'] for _ in self.history.price_changes()], ['Carrack'])
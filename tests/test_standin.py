@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.standin` and `rsi.loadtest`."""
+
+import io
+import unittest
+from contextlib import redirect_stdout
+
+import requests
+
+from rsi import loadtest
+from rsi.standin import StandinServer
+
+
+class TestStandinServer(unittest.TestCase):
+    """Tests for `StandinServer`."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandinServer(roster_size=50, page_size=20).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_deterministic(self):
+        same, seeded = StandinServer(roster_size=50), StandinServer(roster_size=50, seed=1)
+        self.addCleanup(same.httpd.server_close)
+        self.addCleanup(seeded.httpd.server_close)
+        self.assertEqual(same.roster('ORG1'), self.server.roster('org1'))
+        self.assertNotEqual(same.roster('ORG2'), self.server.roster('ORG1'))
+        self.assertNotEqual(seeded.roster('ORG1'), same.roster('ORG1'))
+
+    def test_members_pages(self):
+        roster = self.server.roster('ORG1')
+        handles = []
+        for page in (1, 2, 3, 4):
+            r = requests.post('{}/api/orgs/getOrgMembers'.format(self.server.url), data={'symbol': 'ORG1',
+                                                                                      'page': page})
+            self.assertEqual(r.status_code, 200)
+            data = r.json()['data']
+            self.assertEqual(data['totalrows'], 50)
+            handles.extend(_ for _ in (m['handle'] for m in roster) if '>{}<'.format(_) in data['html'])
+        self.assertEqual(handles, [_['handle'] for _ in roster if not _['hidden']])
+
+    def test_pages(self):
+        r = requests.get('{}/citizens/standin'.format(self.server.url))
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('citizen-record', r.text)
+        self.assertEqual(requests.get('{}/citizens/missing_one'.format(self.server.url)).status_code, 404)
+        self.assertEqual(requests.get('{}/orgs/MISSING'.format(self.server.url)).status_code, 404)
+        self.assertEqual(requests.get('{}/nothing/here'.format(self.server.url)).status_code, 404)
+
+    def test_faults(self):
+        with StandinServer(error_rate=0.5, throttle_rate=0.3) as server:
+            statuses = [requests.get('{}/orgs/ORG1'.format(server.url)).status_code for _ in range(100)]
+        self.assertEqual(server.requests, 100)
+        self.assertEqual(set(statuses), {200, 429, 500})
+        self.assertTrue(30 < statuses.count(500) < 70)
+
+
+class TestLoadTest(unittest.TestCase):
+    """Tests for the `rsi.loadtest` driver."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandinServer(roster_size=100, ship_count=20, sku_count=40, deliverable_count=10).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile(values, 100), 100)
+        self.assertEqual(loadtest.percentile([], 50), 0.0)
+
+    def test_every_scenario(self):
+        for scenario in loadtest.SCENARIOS:
+            result = loadtest.run_scenario(self.server, scenario, concurrency=2, operations=4)
+            self.assertEqual((result['operations'], result['errors']), (4, 0), scenario)
+            self.assertGreater(result['throughput'], 0)
+            self.assertLessEqual(result['p50'], result['p99'])
+            self.assertLessEqual(result['p99'], result['max'])
+
+    def test_run_load_test(self):
+        results = list(loadtest.run_load_test(self.server, scenarios=['org_details', 'status'],
+                                              concurrency_levels=(1, 3), operations=6))
+        self.assertEqual([(_['scenario'], _['concurrency']) for _ in results],
+                         [('org_details', 1), ('org_details', 3), ('status', 1), ('status', 3)])
+        self.assertTrue(all(_['operations'] == 6 for _ in results))
+
+    def test_main(self):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(loadtest.main(['--scenarios', 'org_members_page', '--concurrency', '2',
+                                            '--operations', '3', '--roster-size', '64']), 0)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[1].split()[:4], ['org_members_page', '2', '3', '0'])
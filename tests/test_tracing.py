@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.tracing`."""
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+
+from rsi.tracing import Tracer, span, traced, active_tracer
+
+
+@traced('parse')
+def parse(seconds):
+    time.sleep(seconds)
+    return 'parsed'
+
+
+class TestTracer(unittest.TestCase):
+    """Tests for `Tracer` and `span`."""
+
+    def run_operation(self):
+        with span('fetch', page=1):
+            with span('network'):
+                time.sleep(0.02)
+            self.assertEqual(parse(0.01), 'parsed')
+            with span('network'):
+                time.sleep(0.02)
+
+    def test_inactive(self):
+        self.assertIsNone(active_tracer())
+        with span('fetch') as s:
+            self.assertIsNotNone(s)
+        self.assertEqual(parse(0), 'parsed')
+
+    def test_nesting(self):
+        with Tracer() as tracer:
+            self.assertIs(active_tracer(), tracer)
+            self.run_operation()
+        self.assertIsNone(active_tracer())
+
+        self.assertEqual([_['stack'] for _ in tracer.spans],
+                         [('fetch', 'network'), ('fetch', 'parse'), ('fetch', 'network'), ('fetch',)])
+        fetch = tracer.spans[-1]
+        children = sum(_['duration'] for _ in tracer.spans[:-1])
+        self.assertEqual(fetch['args'], {'page': 1})
+        self.assertAlmostEqual(fetch['self'], fetch['duration'] - children, places=6)
+        self.assertGreaterEqual(fetch['duration'], children)
+
+        summary = tracer.summary()
+        self.assertEqual(summary['network']['count'], 2)
+        self.assertGreaterEqual(summary['network']['wall'], 0.04)
+        self.assertLess(summary['network']['cpu'], summary['network']['wall'])
+
+    def test_nested_tracers(self):
+        with Tracer() as outer:
+            with Tracer() as inner:
+                with span('inner'):
+                    pass
+            with span('outer'):
+                pass
+        self.assertEqual([_['name'] for _ in inner.spans], ['inner'])
+        self.assertEqual([_['name'] for _ in outer.spans], ['outer'])
+
+    def test_threads_have_own_stacks(self):
+        with Tracer() as tracer:
+            with span('main'):
+                thread = threading.Thread(target=self.run_operation)
+                thread.start()
+                thread.join()
+        stacks = {_['stack'] for _ in tracer.spans}
+        self.assertIn(('fetch', 'network'), stacks)
+        self.assertIn(('main',), stacks)
+        self.assertNotIn(('main', 'fetch'), stacks)
+
+    def test_folded(self):
+        with Tracer() as tracer:
+            self.run_operation()
+        lines = dict(_.rsplit(' ', 1) for _ in tracer.to_folded().splitlines())
+        self.assertEqual(sorted(lines), ['fetch', 'fetch;network', 'fetch;parse'])
+        self.assertGreaterEqual(int(lines['fetch;network']), 40000)
+        self.assertGreaterEqual(int(lines['fetch;parse']), 10000)
+        total = sum(int(_) for _ in lines.values())
+        self.assertAlmostEqual(total, tracer.spans[-1]['duration'] * 1e6, delta=len(lines))
+
+    def test_chrome_trace(self):
+        with Tracer(trace_memory=True) as tracer:
+            with span('allocate'):
+                data = [bytes(1024) for _ in range(100)]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'trace.json')
+        tracer.dump_chrome_trace(path)
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]['ph'], 'X')
+        self.assertGreaterEqual(events[0]['args']['memory_delta'], 100 * 1024)
+        del data
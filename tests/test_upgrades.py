@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.upgrades`."""
+
+import random
+import unittest
+
+from rsi.upgrades import UpgradeGraph
+
+
+def ship(ship_id, name, msrp, *prices):
+    return {'id': ship_id, 'name': name, 'msrp': msrp, 'skus': [{'price': _, 'available': True} for _ in prices]}
+
+
+SHIPS = {
+    1: ship(1, 'Aurora', 50),
+    2: ship(2, 'Avenger', 100, 90),         # on sale
+    3: ship(3, 'Cutlass', 150, 150),
+    4: ship(4, 'Constellation', 200, 200),
+    5: ship(5, 'Concept', 0, 100),          # no msrp, not upgradable
+    6: ship(6, 'Retired', 300),             # can't be bought
+}
+
+
+class TestUpgradeGraph(unittest.TestCase):
+    """Tests for `UpgradeGraph`."""
+
+    def setUp(self):
+        # a warbond upgrade cheaper than the computed price
+        self.graph = UpgradeGraph(SHIPS, extra_upgrades=[(3, 4, 30), (1, 5, 10)])
+
+    def test_edges(self):
+        self.assertNotIn(5, self.graph.ships)
+        self.assertEqual(self.graph.edges[1], {2: 40, 3: 100, 4: 150})
+        self.assertEqual(self.graph.edges[3], {4: 30})
+        self.assertEqual(self.graph.edges[4], {})
+
+    def test_cheapest_path(self):
+        self.assertEqual(self.graph.cheapest_path(1, 4), (120, [1, 2, 3, 4]))
+        self.assertEqual(self.graph.cheapest_path('aurora', {'id': 3}), (90, [1, 2, 3]))
+        self.assertEqual(self.graph.cheapest_path(2, 2), (0, [2]))
+        self.assertIsNone(self.graph.cheapest_path(4, 1))
+        with self.assertRaises(KeyError):
+            self.graph.cheapest_path(1, 'Concept')
+
+    def test_cheapest_paths(self):
+        self.assertEqual(self.graph.cheapest_paths('Aurora'), {
+            1: (0, [1]),
+            2: (40, [1, 2]),
+            3: (90, [1, 2, 3]),
+            4: (120, [1, 2, 3, 4]),
+            6: None,
+        })
+        self.assertEqual(self.graph.cheapest_paths(1, ['Retired', 3]), {6: None, 3: (90, [1, 2, 3])})
+
+    def test_search_once_per_source(self):
+        self.graph.cheapest_paths(1, [2])
+        searched = self.graph._paths[1]
+        self.graph.cheapest_paths(1, [4])
+        self.assertIs(self.graph._paths[1], searched)
+
+    def test_same_as_brute_force(self):
+        rng = random.Random(7)
+        ships = {}
+        for i in range(12):
+            msrp = rng.randint(2, 40) * 5
+            prices = [msrp - rng.choice((0, 0, 5, 10))] if rng.random() < 0.8 else []
+            ships[i] = ship(i, 'ship {}'.format(i), msrp, *prices)
+        graph = UpgradeGraph(ships)
+
+        def cheapest(source, target, seen):
+            if source == target:
+                return 0
+            costs = []
+            for to_id, price in graph.edges[source].items():
+                rest = None if to_id in seen else cheapest(to_id, target, seen | {to_id})
+                if rest is not None:
+                    costs.append(price + rest)
+            return min(costs) if costs else None
+
+        for source in graph.ships:
+            for target, path in graph.cheapest_paths(source).items():
+                expected = cheapest(source, target, {source})
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                cost, ships_on_path = path
+                self.assertEqual(cost, expected)
+                self.assertEqual(sum(graph.edges[a][b] for a, b in zip(ships_on_path, ships_on_path[1:])), cost)
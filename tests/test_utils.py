@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Tests for `rsi.utils`."""
+
+import unittest
+from unittest import mock
+
+from bs4 import BeautifulSoup
+
+from rsi import org, citizen, pledge_store
+from rsi.utils import class_strainer
+from rsi.standin import StandinServer
+
+PAGE = '''<html><head><title>x</title><script>var a = "<div class='item'>";</script></head><body>
+<div class="nav"><a class="item-link" href="/">home</a></div>
+<div class="list wide"><span class="item">one</span><p>outside</p></div>
+<ul><li class="other item">two<b>bold</b></li></ul>
+</body></html>'''
+
+
+class TestClassStrainer(unittest.TestCase):
+    """Tests for `class_strainer`."""
+
+    def test_keeps_matching_subtrees(self):
+        soup = BeautifulSoup(PAGE, features='html.parser', parse_only=class_strainer('item'))
+        self.assertEqual([_.text for _ in soup.select('.item')], ['one', 'twobold'])
+        self.assertIsNone(soup.select_one('.nav'))
+        self.assertIsNone(soup.select_one('p'))
+
+    def test_any_class(self):
+        soup = BeautifulSoup(PAGE, features='html.parser', parse_only=class_strainer('nav', 'wide'))
+        self.assertEqual([_['class'] for _ in soup.find_all(recursive=False)], [['nav'], ['list', 'wide']])
+        self.assertEqual(soup.select_one('.list p').text, 'outside')
+
+
+class TestPartialParsing(unittest.TestCase):
+    """The scrapers give the same results parsing only the strained subtrees as parsing whole pages."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.standin = StandinServer()
+
+    def assertSameAsFull(self, module, strainer, parse, html):
+        partial = parse(html)
+        with mock.patch.object(module, strainer, None):
+            self.assertEqual(partial, parse(html))
+        self.assertTrue(partial)
+
+    def test_org_members(self):
+        html = self.standin.org_members({'symbol': 'ORG7', 'page': 1})['data']['html']
+        self.assertSameAsFull(org, 'ORG_MEMBER_STRAINER', org.parse_members, html)
+        self.assertSameAsFull(citizen, 'ORG_MEMBER_STRAINER', citizen.parse_member_roles, html)
+
+    def test_org_details(self):
+        self.assertSameAsFull(org, 'ORG_DETAILS_STRAINER', org.parse_org_details, self.standin.org_page('ORG7'))
+
+    def test_citizen(self):
+        self.assertSameAsFull(citizen, 'CITIZEN_PROFILE_STRAINER', citizen.parse_citizen_profile,
+                              self.standin.citizen_page('standin'))
+        self.assertSameAsFull(citizen, 'CITIZEN_ORGS_STRAINER', citizen.parse_citizen_orgs,
+                              self.standin.citizen_orgs_page('org7_12'))
+
+    def test_skus(self):
+        self.assertSameAsFull(pledge_store, 'SKU_STRAINER', pledge_store.parse_skus,
+                              self.standin.skus({'page': 1})['data']['html'])